@@ -8,8 +8,8 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
 import logging
-import json
 import time
+import orjson
 
 from app.db.session import get_db
 from app.db.crud.upload import get_upload
@@ -35,6 +35,11 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _sse_event(event_type: str, data) -> str:
+    """Serialize a stream event as an SSE data frame."""
+    return f"data: {orjson.dumps({'type': event_type, 'data': data}).decode()}\n\n"
+
+
 # ============== Conversation Management ==============
 
 @router.post("/conversations", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
@@ -376,12 +381,12 @@ async def chat_with_rag_stream(
                 for src in context_chunks[:5]
             ]
             
-            yield f"data: {json.dumps({'type': 'sources', 'data': sources_data})}\n\n"
+            yield _sse_event('sources', sources_data)
             
             if not context_chunks:
                 no_context_msg = "I don't have relevant information in the uploaded documents to answer this question."
-                yield f"data: {json.dumps({'type': 'content', 'data': no_context_msg})}\n\n"
-                yield f"data: {json.dumps({'type': 'done', 'data': {'confidence': 'low', 'retrieved_chunks': 0}})}\n\n"
+                yield _sse_event('content', no_context_msg)
+                yield _sse_event('done', {'confidence': 'low', 'retrieved_chunks': 0})
                 return
             
             # Generate answer using enhanced service
@@ -397,7 +402,7 @@ async def chat_with_rag_stream(
             for i, word in enumerate(words):
                 word_with_space = word + (' ' if i < len(words) - 1 else '')
                 full_response += word_with_space
-                yield f"data: {json.dumps({'type': 'content', 'data': word_with_space})}\n\n"
+                yield _sse_event('content', word_with_space)
             
             # Calculate metrics
             response_time_ms = int((time.time() - start_time) * 1000)
@@ -413,7 +418,7 @@ async def chat_with_rag_stream(
                 follow_ups = []
             
             # Send completion event
-            yield f"data: {json.dumps({'type': 'done', 'data': {'confidence': confidence, 'retrieved_chunks': len(context_chunks), 'response_time_ms': response_time_ms, 'follow_up_suggestions': follow_ups}})}\n\n"
+            yield _sse_event('done', {'confidence': confidence, 'retrieved_chunks': len(context_chunks), 'response_time_ms': response_time_ms, 'follow_up_suggestions': follow_ups})
             
             # Log interaction
             log_ai_interaction(
@@ -431,7 +436,7 @@ async def chat_with_rag_stream(
             
         except Exception as e:
             logger.error(f"Streaming error: {str(e)}")
-            yield f"data: {json.dumps({'type': 'error', 'data': str(e)})}\n\n"
+            yield _sse_event('error', str(e))
     
     return StreamingResponse(
         generate_stream(),
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
 from fastapi.responses import StreamingResponse, FileResponse
 from sqlalchemy.orm import Session
 from typing import List
+import asyncio
 import mimetypes
 from pathlib import Path
 import json
@@ -159,8 +160,8 @@ async def upload_file(
     # Start text extraction and indexing (async, don't block response)
     if file_type in [FileType.PDF, FileType.DOCX, FileType.TXT]:
         try:
-            # Extract text synchronously
-            extraction_success = extract_and_save_text(db, db_upload.id)
+            # Extract text (CPU-bound parsing and chunking) off the event loop
+            extraction_success = await asyncio.to_thread(extract_and_save_text, db, db_upload.id)
             logger.info(f"Extraction result for {db_upload.id}: {extraction_success}")
             
             # If extraction succeeded, index to Pinecone
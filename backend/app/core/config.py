@@ -19,6 +19,7 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
+    WORKERS: int = 0  # Server processes when DEBUG is off; 0 = one per CPU
     
     # Security
     SECRET_KEY: str
@@ -38,11 +39,41 @@ class Settings(BaseSettings):
     # OpenRouter - Optimized for Legal Industry (No Hallucinations)
     OPENROUTER_API_KEY: str
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    OPENROUTER_VERIFY_SSL: bool = True  # Only disable behind an intercepting proxy
     
     # Embedding Model - Must match Pinecone index dimension (1536)
     # Using text-embedding-3-small which produces 1536 dimensions
     OPENROUTER_EMBEDDING_MODEL: str = "openai/text-embedding-3-small"  # 1536 dimensions
     
+    # Embedding cache - reuses vectors for identical chunk text (empty path disables)
+    EMBED_CACHE_PATH: str = "./data/cache/embeddings.sqlite3"
+    EMBED_CACHE_TTL_DAYS: int = 30
+    
+    # Embedding request limits shared by all concurrent indexing jobs
+    EMBED_MAX_IN_FLIGHT: int = 16
+    EMBED_REQUESTS_PER_MINUTE: int = 0  # 0 disables the rate limit
+    
+    # Pinecone query result cache (max size 0 disables); near-duplicate query
+    # vectors at or above the similarity threshold share results. Index
+    # changes are signalled to every process through REDIS_URL; while Redis
+    # is unreachable the cache is bypassed
+    QUERY_CACHE_MAX_SIZE: int = 2000
+    QUERY_CACHE_TTL_SECONDS: int = 600
+    QUERY_CACHE_SIMILARITY: float = 0.97
+    
+    # Enhanced RAG cache for retrieved chunks and grounded answers of repeated
+    # requests (max size 0 disables); retrievals share the query cache's
+    # Redis-backed invalidation
+    RAG_RESULT_CACHE_MAX_SIZE: int = 1024
+    RAG_RESULT_CACHE_TTL_SECONDS: int = 60
+    
+    # Cross-encoder reranker (bge-reranker-v2-m3 exported to ONNX); the model
+    # directory holds model.onnx and tokenizer.json. Falls back to the
+    # heuristic reranker when disabled or when the model can't be loaded
+    RERANKER_ENABLED: bool = False
+    RERANKER_MODEL_DIR: str = "./data/models/bge-reranker-v2-m3"
+    RERANKER_MAX_CANDIDATES: int = 50
+    
     # Primary Chat Model - Claude 3.5 Sonnet: Best balance of speed, accuracy, and grounding
     # Excellent for RAG with strong instruction following and factual responses
     OPENROUTER_CHAT_MODEL: str = "anthropic/claude-3.5-sonnet"
@@ -4,6 +4,7 @@ Provides JSON logging for production and human-readable logs for development.
 """
 import logging
 import sys
+from contextvars import ContextVar
 from datetime import datetime
 from typing import Optional
 import json
@@ -11,6 +12,21 @@ from pythonjsonlogger import jsonlogger
 from app.core.config import settings
 
 
+# Request-scoped fields (request_id, method, path) bound once per request by
+# the HTTP middleware and merged into every record logged while handling it
+request_context: ContextVar[dict] = ContextVar("request_context", default={})
+
+
+class RequestContextFilter(logging.Filter):
+    """Merge the current request context into each log record."""
+    
+    def filter(self, record):
+        ctx = request_context.get()
+        if ctx:
+            record.__dict__.update(ctx)
+        return True
+
+
 class CustomJsonFormatter(jsonlogger.JsonFormatter):
     """Custom JSON formatter for structured logging."""
     
@@ -68,6 +84,7 @@ def setup_logging():
         )
     
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(RequestContextFilter())
     root_logger.addHandler(console_handler)
     
     # Suppress noisy loggers
@@ -115,6 +115,34 @@ def update_extraction_status(
     return db_upload
 
 
+def set_indexed_chunk_count(
+    db: Session,
+    upload_id: UUID,
+    chunk_count: int
+) -> Optional[Upload]:
+    """
+    Record how many chunk indexes an upload may have vectors for.
+    
+    Stored as custom_metadata["indexed_chunks"]; re-indexing reads it to
+    find the previous version's vectors to delete.
+    
+    Args:
+        db: Database session
+        upload_id: Upload ID
+        chunk_count: Chunk indexes written to the vector store
+    """
+    db_upload = get_upload(db, upload_id)
+    if not db_upload:
+        return None
+    
+    # Assign a new dict so the JSONB change is detected
+    db_upload.custom_metadata = {**(db_upload.custom_metadata or {}), "indexed_chunks": chunk_count}
+    
+    db.commit()
+    db.refresh(db_upload)
+    return db_upload
+
+
 def delete_upload(db: Session, upload_id: UUID) -> bool:
     """
     Delete an upload and its associated files.
@@ -12,7 +12,7 @@ from app.db.session import Base
 
 
 
-class AuditAction(str, enum.Enum):
+class AuditAction(enum.StrEnum):
     """Audit action types."""
     # Authentication
     LOGIN = "login"
@@ -10,7 +10,7 @@ import enum
 from app.db.session import Base
 
 
-class ContractStatus(str, enum.Enum):
+class ContractStatus(enum.StrEnum):
     """Contract status enumeration."""
     DRAFT = "draft"
     PENDING_REVIEW = "pending_review"
@@ -11,14 +11,14 @@ import enum
 from app.db.session import Base
 
 
-class ConversationStatus(str, enum.Enum):
+class ConversationStatus(enum.StrEnum):
     """Conversation status enumeration."""
     ACTIVE = "active"
     ARCHIVED = "archived"
     DELETED = "deleted"
 
 
-class MessageRole(str, enum.Enum):
+class MessageRole(enum.StrEnum):
     """Message role enumeration."""
     USER = "user"
     ASSISTANT = "assistant"
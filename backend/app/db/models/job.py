@@ -10,7 +10,7 @@ import enum
 from app.db.session import Base
 
 
-class JobStatus(str, enum.Enum):
+class JobStatus(enum.StrEnum):
     """Job status enumeration."""
     QUEUED = "queued"
     RUNNING = "running"
@@ -19,7 +19,7 @@ class JobStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
-class JobType(str, enum.Enum):
+class JobType(enum.StrEnum):
     """Job type enumeration."""
     VALIDATION = "validation"
     FILE_PROCESSING = "file_processing"
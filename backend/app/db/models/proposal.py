@@ -10,7 +10,7 @@ import enum
 from app.db.session import Base
 
 
-class ValidationStatus(str, enum.Enum):
+class ValidationStatus(enum.StrEnum):
     """Validation status enumeration."""
     PENDING = "pending"
     IN_PROGRESS = "in_progress"
@@ -18,7 +18,7 @@ class ValidationStatus(str, enum.Enum):
     FAILED = "failed"
 
 
-class RiskLevel(str, enum.Enum):
+class RiskLevel(enum.StrEnum):
     """Risk level enumeration."""
     LOW = "low"
     MEDIUM = "medium"
@@ -10,7 +10,7 @@ import enum
 from app.db.session import Base
 
 
-class FileType(str, enum.Enum):
+class FileType(enum.StrEnum):
     """File type enumeration."""
     PDF = "pdf"
     DOCX = "docx"
@@ -18,7 +18,7 @@ class FileType(str, enum.Enum):
     OTHER = "other"
 
 
-class ExtractionStatus(str, enum.Enum):
+class ExtractionStatus(enum.StrEnum):
     """Text extraction status."""
     PENDING = "pending"
     PROCESSING = "processing"
@@ -9,7 +9,7 @@ import enum
 from app.db.session import Base
 
 
-class UserRole(str, enum.Enum):
+class UserRole(enum.StrEnum):
     """User role enumeration."""
     REGULAR = "regular"
     REVIEWER = "reviewer"
@@ -2,19 +2,26 @@
 FastAPI application entry point.
 Contract Agent - Enterprise Contract Management Platform
 """
+import asyncio
 import time
 import uuid
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from app.core.config import settings
-from app.core.logging import setup_logging, get_logger
+from app.core.logging import setup_logging, get_logger, request_context
 from app.api.v1 import router as api_router
 
 # Setup logging
 setup_logging()
 logger = get_logger(__name__)
 
+# Body of the generic 500 response, serialized once
+_ERROR_BODY = b'{"detail":"Internal server error"}'
+
+# Probe endpoints that bypass request tracking (hit constantly by load balancers)
+_SKIP_PATHS = frozenset({"/health", "/"})
+
 # Create FastAPI application
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -22,17 +29,8 @@ app = FastAPI(
     description="Enterprise-grade contract lifecycle management with AI-powered validation and RAG chat",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url=f"{settings.API_V1_STR}/docs",
-    redoc_url=f"{settings.API_V1_STR}/redoc"
-)
-
-# Configure CORS middleware - MUST be first middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
+    redoc_url=f"{settings.API_V1_STR}/redoc",
+    default_response_class=ORJSONResponse
 )
 
 
@@ -41,25 +39,22 @@ async def request_middleware(request: Request, call_next):
     """
     Middleware for request tracking and logging.
     Adds request ID, timing, and rate limit headers.
-    Handles CORS preflight requests.
+    CORS (including preflight) is handled by CORSMiddleware, which wraps this.
     """
-    # Handle CORS preflight
-    if request.method == "OPTIONS":
-        origin = request.headers.get("origin")
-        if origin in settings.CORS_ORIGINS:
-            return JSONResponse(
-                content={},
-                headers={
-                    "Access-Control-Allow-Origin": origin,
-                    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                    "Access-Control-Allow-Headers": "*",
-                    "Access-Control-Allow-Credentials": "true",
-                }
-            )
+    path = request.url.path
+    if path in _SKIP_PATHS:
+        return await call_next(request)
+    
+    # Bind hot attributes once; they are read several times below
+    method = request.method
+    state = request.state
     
     # Generate request ID
     request_id = str(uuid.uuid4())[:8]
-    request.state.request_id = request_id
+    state.request_id = request_id
+    
+    # Bind request fields for every log record emitted while handling it
+    ctx_token = request_context.set({"request_id": request_id, "method": method, "path": path})
     
     # Start timing
     start_time = time.time()
@@ -69,33 +64,25 @@ async def request_middleware(request: Request, call_next):
         
         # Calculate duration
         duration_ms = (time.time() - start_time) * 1000
-        
-        # Add CORS headers to all responses
-        origin = request.headers.get("origin")
-        if origin in settings.CORS_ORIGINS:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
+        status_code = response.status_code
         
         # Add headers
-        response.headers["X-Request-ID"] = request_id
-        response.headers["X-Response-Time"] = f"{duration_ms:.2f}ms"
+        rh = response.headers
+        rh["X-Request-ID"] = request_id
+        rh["X-Response-Time"] = f"{duration_ms:.2f}ms"
         
         # Add rate limit headers if available
-        if hasattr(request.state, "rate_limit_remaining"):
-            response.headers["X-RateLimit-Remaining"] = str(request.state.rate_limit_remaining)
-        if hasattr(request.state, "rate_limit_reset"):
-            response.headers["X-RateLimit-Reset"] = str(request.state.rate_limit_reset)
+        remaining = getattr(state, "rate_limit_remaining", None)
+        if remaining is not None:
+            rh["X-RateLimit-Remaining"] = str(remaining)
+        reset = getattr(state, "rate_limit_reset", None)
+        if reset is not None:
+            rh["X-RateLimit-Reset"] = str(reset)
         
         # Log request
         logger.info(
-            f"{request.method} {request.url.path} - {response.status_code} ({duration_ms:.2f}ms)",
-            extra={
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "duration_ms": round(duration_ms, 2)
-            }
+            f"{method} {path} - {status_code} ({duration_ms:.2f}ms)",
+            extra={"status_code": status_code, "duration_ms": round(duration_ms, 2)}
         )
         
         return response
@@ -103,28 +90,32 @@ async def request_middleware(request: Request, call_next):
     except Exception as e:
         duration_ms = (time.time() - start_time) * 1000
         logger.error(
-            f"{request.method} {request.url.path} - Error: {str(e)} ({duration_ms:.2f}ms)",
-            extra={
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "duration_ms": round(duration_ms, 2)
-            },
+            f"{method} {path} - Error: {str(e)} ({duration_ms:.2f}ms)",
+            extra={"duration_ms": round(duration_ms, 2)},
             exc_info=True
         )
         
-        # Add CORS headers even to error responses
-        origin = request.headers.get("origin")
-        error_response = JSONResponse(
+        return Response(
+            content=_ERROR_BODY,
             status_code=500,
-            content={"detail": "Internal server error"},
+            media_type="application/json",
             headers={"X-Request-ID": request_id}
         )
-        if origin in settings.CORS_ORIGINS:
-            error_response.headers["Access-Control-Allow-Origin"] = origin
-            error_response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-        return error_response
+    finally:
+        request_context.reset(ctx_token)
+
+
+# Configure CORS middleware - added last so it is the outermost layer and
+# also covers preflight requests and error responses from request_middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.CORS_ORIGINS,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["*"],
+    max_age=86400,
+)
 
 
 @app.on_event("startup")
@@ -134,13 +125,14 @@ async def startup_event():
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Debug mode: {settings.DEBUG}")
     
-    # Initialize Pinecone connection
+    # Initialize Pinecone connection up front so the first request doesn't
+    # pay for it; the SDK calls block, so keep them off the event loop
     try:
         from app.services.pinecone_client import pinecone_client
-        connected = pinecone_client.connect()
+        connected = await asyncio.to_thread(pinecone_client.connect)
         if connected:
             logger.info("✅ Pinecone connected successfully")
-            stats = pinecone_client.get_index_stats()
+            stats = await asyncio.to_thread(pinecone_client.get_index_stats)
             logger.info(f"Pinecone index stats: {stats}")
         else:
             logger.warning("⚠️ Pinecone connection failed - RAG features may not work")
@@ -152,6 +144,14 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown event."""
     logger.info("Shutting down application...")
+    
+    # Close pooled OpenRouter connections
+    from app.services.openrouter import openrouter_client
+    await openrouter_client.aclose()
+    
+    # Stop Pinecone background workers
+    from app.services.pinecone_client import pinecone_client
+    pinecone_client.close()
 
 
 @app.get("/health")
@@ -180,10 +180,19 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
 if __name__ == "__main__":
+    import os
+    import sys
     import uvicorn
+    # uvloop + httptools come with uvicorn[standard]; uvloop has no Windows build
     uvicorn.run(
         "app.main:app",
         host=settings.API_HOST,
         port=settings.API_PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        # Rate limits, embedding limits and caches are per worker process
+        workers=1 if settings.DEBUG else (settings.WORKERS or os.cpu_count() or 1),
+        log_config=None,  # Keep the handlers installed by setup_logging()
+        access_log=False  # request_middleware already logs every request
     )
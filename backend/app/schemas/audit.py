@@ -1,7 +1,7 @@
 """
 Audit Log Pydantic schemas for request/response validation.
 """
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, Field, UUID4, SkipValidation
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from app.db.models.audit import AuditAction
@@ -15,13 +15,14 @@ class AuditLogEntry(BaseModel):
     action: AuditAction
     resource_type: str
     resource_id: Optional[UUID4] = None
-    details: Dict[str, Any] = {}
+    details: SkipValidation[Dict[str, Any]] = {}
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
+        use_enum_values = True
 
 
 # Schema for audit log list item (lighter version)
@@ -36,6 +37,7 @@ class AuditLogListItem(BaseModel):
     
     class Config:
         from_attributes = True
+        use_enum_values = True
 
 
 # Schema for filtering audit logs
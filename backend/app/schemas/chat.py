@@ -1,7 +1,7 @@
 """
 Pydantic schemas for chat operations.
 """
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, Field, UUID4, SkipValidation
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -74,8 +74,8 @@ class ChatResponse(BaseModel):
     model_used: Optional[str] = None
     tokens_used: Optional[int] = None
     follow_up_suggestions: List[str] = []
-    extracted_clauses: List[Dict[str, Any]] = []
-    risk_highlights: List[Dict[str, Any]] = []
+    extracted_clauses: SkipValidation[List[Dict[str, Any]]] = []
+    risk_highlights: SkipValidation[List[Dict[str, Any]]] = []
     conversation_id: Optional[str] = None
     response_time_ms: Optional[int] = None
 
@@ -86,12 +86,12 @@ class MessageResponse(BaseModel):
     conversation_id: UUID4
     role: str
     content: str
-    sources: List[Dict[str, Any]] = []
+    sources: SkipValidation[List[Dict[str, Any]]] = []
     confidence: Optional[str] = None
     retrieved_chunks: int = 0
     follow_up_suggestions: List[str] = []
-    extracted_clauses: List[Dict[str, Any]] = []
-    risk_highlights: List[Dict[str, Any]] = []
+    extracted_clauses: SkipValidation[List[Dict[str, Any]]] = []
+    risk_highlights: SkipValidation[List[Dict[str, Any]]] = []
     tokens_used: int = 0
     model_used: Optional[str] = None
     user_rating: Optional[int] = None
@@ -1,7 +1,7 @@
 """
 Contract Pydantic schemas for request/response validation.
 """
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, Field, UUID4, SkipValidation
 from typing import Optional, Dict, Any
 from datetime import datetime
 from app.db.models.contract import ContractStatus
@@ -40,7 +40,7 @@ class Contract(ContractBase):
     is_latest_version: bool
     parent_contract_id: Optional[UUID4] = None
     template_id: Optional[UUID4] = None
-    metadata: Dict[str, Any] = {}
+    metadata: SkipValidation[Dict[str, Any]] = Field(default_factory=dict, validation_alias="custom_metadata")
     created_by: UUID4
     reviewed_by: Optional[UUID4] = None
     approved_by: Optional[UUID4] = None
@@ -54,6 +54,7 @@ class Contract(ContractBase):
     
     class Config:
         from_attributes = True
+        use_enum_values = True
 
 
 # Schema for contract list item (lighter version)
@@ -70,6 +71,7 @@ class ContractListItem(BaseModel):
     
     class Config:
         from_attributes = True
+        use_enum_values = True
 
 
 # Schema for contract approval/rejection
@@ -1,7 +1,7 @@
 """
 Proposal Pydantic schemas for request/response validation.
 """
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, Field, UUID4, SkipValidation
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from app.db.models.proposal import ValidationStatus, RiskLevel
@@ -21,16 +21,16 @@ class ProposalCreate(ProposalBase):
 
 class Proposal(ProposalBase):
     """Schema for proposal response."""
-    model_config = {"from_attributes": True}
+    model_config = {"from_attributes": True, "use_enum_values": True}
     
     id: UUID4
     contract_id: Optional[UUID4] = None
     validation_status: ValidationStatus
     risk_level: Optional[RiskLevel] = None
     risk_score: Optional[float] = None
-    validation_report: Dict[str, Any] = {}
-    detected_clauses: List[Dict[str, Any]] = []
-    compliance_checks: Dict[str, Any] = {}
+    validation_report: SkipValidation[Dict[str, Any]] = {}
+    detected_clauses: SkipValidation[List[Dict[str, Any]]] = []
+    compliance_checks: SkipValidation[Dict[str, Any]] = {}
     created_by: UUID4
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -39,7 +39,7 @@ class Proposal(ProposalBase):
 
 class ProposalListItem(BaseModel):
     """Schema for proposal list item."""
-    model_config = {"from_attributes": True}
+    model_config = {"from_attributes": True, "use_enum_values": True}
     
     id: UUID4
     title: str
@@ -91,5 +91,5 @@ class ValidationReport(BaseModel):
     issues: List[ValidationIssue] = []
     suggestions: List[str] = []
     clauses: List[DetectedClause] = []
-    compliance: Dict[str, Any] = {}
+    compliance: SkipValidation[Dict[str, Any]] = {}
     raw_analysis: Optional[str] = None
@@ -1,7 +1,7 @@
 """
 Template Pydantic schemas for request/response validation.
 """
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, Field, UUID4, SkipValidation
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
@@ -48,9 +48,9 @@ class TemplateUpdate(BaseModel):
 class Template(TemplateBase):
     """Schema for template response."""
     id: UUID4
-    placeholders: List[Dict[str, Any]] = []
+    placeholders: SkipValidation[List[Dict[str, Any]]] = []
     is_active: bool
-    metadata: Dict[str, Any] = {}
+    metadata: SkipValidation[Dict[str, Any]] = Field(default_factory=dict, validation_alias="custom_metadata")
     created_by: UUID4
     created_at: datetime
     updated_at: Optional[datetime] = None
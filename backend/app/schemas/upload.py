@@ -1,7 +1,7 @@
 """
 Upload Pydantic schemas for request/response validation.
 """
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, Field, UUID4, SkipValidation
 from typing import Optional, Dict, Any
 from datetime import datetime
 from app.db.models.upload import FileType, ExtractionStatus
@@ -23,13 +23,14 @@ class Upload(UploadBase):
     path: str
     text_extraction_status: ExtractionStatus
     pages_count: Optional[int] = None
-    metadata: Dict[str, Any] = Field(default_factory=dict, alias="custom_metadata")
+    metadata: SkipValidation[Dict[str, Any]] = Field(default_factory=dict, alias="custom_metadata")
     uploaded_by: UUID4
     uploaded_at: datetime
     updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
+        use_enum_values = True
         populate_by_name = True  # Allow both alias and field name
 
 
@@ -46,6 +47,7 @@ class UploadListItem(BaseModel):
     
     class Config:
         from_attributes = True
+        use_enum_values = True
 
 
 # Schema for extracted text response
@@ -33,7 +33,7 @@ class UserUpdate(BaseModel):
 # Schema for user in database (response)
 class User(UserBase):
     """Schema for user response."""
-    model_config = {"from_attributes": True}  # Pydantic v2 (was orm_mode in v1)
+    model_config = {"from_attributes": True, "use_enum_values": True}  # Pydantic v2 (was orm_mode in v1)
     
     id: UUID4
     role: UserRole
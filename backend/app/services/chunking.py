@@ -6,6 +6,10 @@ from typing import List, Dict
 import re
 
 
+# Sentence boundary used to split oversized paragraphs
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+
 class ChunkingService:
     """Service for splitting text into overlapping chunks."""
     
@@ -34,7 +38,7 @@ class ChunkingService:
         Args:
             text: Text to chunk
             metadata: Optional metadata to include with each chunk
-            
+        
         Returns:
             List of chunk dictionaries with text and metadata
         """
@@ -45,8 +49,14 @@ class ChunkingService:
         sections = text.split(self.separator)
         
         chunks = []
-        current_chunk = ""
         chunk_index = 0
+        # Invariant: current_chunk always ends with exactly one separator of
+        # length tail_len, so flushing only needs a slice and an lstrip. It can
+        # start with a separator: when the overlap window holds no text the
+        # new chunk still gets the joining separator, which counts toward
+        # chunk_size
+        current_chunk = ""
+        tail_len = 0
         
         for section in sections:
             section = section.strip()
@@ -55,51 +65,57 @@ class ChunkingService:
             
             # If section itself is larger than chunk_size, split it further
             if len(section) > self.chunk_size:
-                # Split by sentences
-                sentences = re.split(r'(?<=[.!?])\s+', section)
+                # Split by sentences (pieces of a stripped section are stripped)
+                sentences = _SENTENCE_SPLIT_RE.split(section)
                 
                 for sentence in sentences:
                     if len(current_chunk) + len(sentence) + 1 <= self.chunk_size:
                         current_chunk += (sentence + " ")
+                        tail_len = 1
                     else:
+                        overlap_text = ""
                         if current_chunk:
-                            chunks.append(self._create_chunk(
-                                current_chunk.strip(),
-                                chunk_index,
-                                metadata
-                            ))
+                            chunk_text = current_chunk[:-tail_len]
+                            chunks.append(self._create_chunk(chunk_text.lstrip(), chunk_index, metadata))
                             chunk_index += 1
+                            # The overlap window includes the trailing separator;
+                            # the right end is already clean so only lstrip the cut
+                            keep = self.overlap - tail_len
+                            if keep > 0:
+                                overlap_text = chunk_text[-keep:].lstrip()
                         
                         # Start new chunk with overlap from previous
                         if chunks and self.overlap > 0:
-                            overlap_text = current_chunk[-self.overlap:].strip()
                             current_chunk = overlap_text + " " + sentence + " "
                         else:
                             current_chunk = sentence + " "
+                        tail_len = 1
             else:
                 # Section fits, add to current chunk
                 if len(current_chunk) + len(section) + 2 <= self.chunk_size:
                     current_chunk += (section + "\n\n")
+                    tail_len = 2
                 else:
+                    overlap_text = ""
                     if current_chunk:
-                        chunks.append(self._create_chunk(
-                            current_chunk.strip(),
-                            chunk_index,
-                            metadata
-                        ))
+                        chunk_text = current_chunk[:-tail_len]
+                        chunks.append(self._create_chunk(chunk_text.lstrip(), chunk_index, metadata))
                         chunk_index += 1
+                        keep = self.overlap - tail_len
+                        if keep > 0:
+                            overlap_text = chunk_text[-keep:].lstrip()
                     
                     # Start new chunk with overlap
                     if chunks and self.overlap > 0:
-                        overlap_text = current_chunk[-self.overlap:].strip()
                         current_chunk = overlap_text + "\n\n" + section + "\n\n"
                     else:
                         current_chunk = section + "\n\n"
+                    tail_len = 2
         
         # Add final chunk
-        if current_chunk.strip():
+        if current_chunk:
             chunks.append(self._create_chunk(
-                current_chunk.strip(),
+                current_chunk[:-tail_len].lstrip(),
                 chunk_index,
                 metadata
             ))
@@ -114,7 +130,7 @@ class ChunkingService:
             text: Chunk text
             index: Chunk index
             metadata: Optional metadata
-            
+        
         Returns:
             Chunk dictionary
         """
@@ -141,7 +157,7 @@ class ChunkingService:
         Args:
             pages: List of page dictionaries with 'page_number' and 'text'
             file_id: Optional file ID for metadata
-            
+        
         Returns:
             List of chunk dictionaries with page metadata
         """
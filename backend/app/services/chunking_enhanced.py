@@ -2,12 +2,99 @@
 Enhanced hierarchical chunking service for legal documents.
 Preserves document structure, sections, headings, and metadata.
 """
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import get_context
 from typing import List, Dict, Optional, Tuple
+import os
 import re
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Sentence boundary followed by a capitalized word
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
+# Below this many pages handing pages to the process pool costs more than it saves
+PARALLEL_MIN_PAGES = 16
+
+# Chunking processes per server/worker process, shared by all uploads
+PARALLEL_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Legal section heading patterns
+SECTION_PATTERNS = [
+    r'^SECTION\s+\d+[\.:]?\s*[A-Z]',  # SECTION 1: Title
+    r'^Article\s+\d+[\.:]?\s*[A-Z]',    # Article 1: Title
+    r'^\d+\.\s+[A-Z][A-Z\s]{10,}',    # 1. TITLE IN CAPS
+    r'^[A-Z][A-Z\s]{15,}$',           # ALL CAPS HEADING
+    r'^[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*:\s*$',  # Title Case Heading:
+]
+
+# Legal clause patterns
+CLAUSE_PATTERNS = [
+    r'^\d+\.\d+\.?\s+[A-Z]',          # 1.1. Clause
+    r'^\([a-z]\)\s+[A-Z]',            # (a) Clause
+    r'^\([ivx]+\)\s+[A-Z]',           # (i) Clause
+]
+
+# Heading level implied by each SECTION_PATTERNS entry (same order)
+SECTION_LEVELS = (1, 1, 2, 2, 2)
+
+# Each family fused into one alternation compiled once at import, so a line
+# costs one regex call per family; the named group (s0, s1, ...) tells
+# which pattern fired
+_SECTION_RX = re.compile(
+    "|".join(f"(?P<s{i}>{p})" for i, p in enumerate(SECTION_PATTERNS)),
+    re.IGNORECASE
+)
+_CLAUSE_RX = re.compile("|".join(f"(?:{p})" for p in CLAUSE_PATTERNS))
+
+# Keywords that flag a clause type inside a chunk (substring match)
+CLAUSE_KEYWORDS = {
+    "payment": ["payment", "compensation", "fee", "invoice", "billing", "price"],
+    "termination": ["termination", "terminate", "cancel", "expire", "end of agreement"],
+    "liability": ["liability", "liable", "damage", "loss"],
+    "indemnification": ["indemnif", "hold harmless", "defend"],
+    "confidentiality": ["confidential", "non-disclosure", "nda", "proprietary"],
+    "scope": ["scope of work", "services", "deliverables", "work to be performed"],
+    "warranty": ["warranty", "warrant", "guarantee"],
+    "insurance": ["insurance", "coverage", "policy"],
+    "dispute": ["dispute", "arbitration", "mediation", "jurisdiction"],
+}
+
+# Flattened once at import so detection does not rebuild the table
+_CLAUSE_KEYWORD_TABLE = tuple(
+    (clause_type, tuple(keywords)) for clause_type, keywords in CLAUSE_KEYWORDS.items()
+)
+
+
+@lru_cache(maxsize=1024)
+def _clause_types(text: str) -> Tuple[str, ...]:
+    """
+    Clause types whose keywords appear in text.
+    
+    Cached because re-uploaded and templated documents produce identical
+    chunks; the bound keeps the cache around a megabyte of chunk text.
+    """
+    # Plain substring checks: CPython's str search beats a regex
+    # alternation over these keywords by several times. One lower() copy
+    # of the chunk is also far cheaper than re.IGNORECASE case folding.
+    text_lower = text.lower()
+    detected = []
+    
+    for clause_type, keywords in _CLAUSE_KEYWORD_TABLE:
+        for keyword in keywords:
+            if keyword in text_lower:
+                detected.append(clause_type)
+                break
+    
+    return tuple(detected)
+
 
 class EnhancedChunkingService:
     """
@@ -21,30 +108,6 @@ class EnhancedChunkingService:
     - Section title attachment to chunks
     """
     
-    # Legal section heading patterns
-    SECTION_PATTERNS = [
-        r'^SECTION\s+\d+[\.:]?\s*[A-Z]',  # SECTION 1: Title
-        r'^Article\s+\d+[\.:]?\s*[A-Z]',    # Article 1: Title
-        r'^\d+\.\s+[A-Z][A-Z\s]{10,}',    # 1. TITLE IN CAPS
-        r'^[A-Z][A-Z\s]{15,}$',           # ALL CAPS HEADING
-        r'^[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*:\s*$',  # Title Case Heading:
-    ]
-    
-    # Legal clause patterns
-    CLAUSE_PATTERNS = [
-        r'^\d+\.\d+\.?\s+[A-Z]',          # 1.1. Clause
-        r'^\([a-z]\)\s+[A-Z]',            # (a) Clause
-        r'^\([ivx]+\)\s+[A-Z]',           # (i) Clause
-    ]
-    
-    # Exhibit/Attachment patterns
-    EXHIBIT_PATTERNS = [
-        r'EXHIBIT\s+[A-Z]',
-        r'ATTACHMENT\s+[A-Z]',
-        r'APPENDIX\s+[A-Z]',
-        r'SCHEDULE\s+[A-Z]',
-    ]
-    
     def __init__(
         self,
         chunk_size: int = 800,  # Smaller chunks for better precision
@@ -83,13 +146,10 @@ class EnhancedChunkingService:
         if not text or not text.strip():
             return []
         
-        # Step 1: Identify document structure (sections, headings, exhibits)
-        structure = self._identify_structure(text)
+        # Step 1: Find headings and split into sections in one line scan
+        sections = self._parse_and_split(text)
         
-        # Step 2: Split into sections
-        sections = self._split_into_sections(text, structure)
-        
-        # Step 3: Chunk each section while preserving context
+        # Step 2: Chunk each section while preserving context
         all_chunks = []
         chunk_index = 0
         
@@ -106,141 +166,69 @@ class EnhancedChunkingService:
         logger.info(f"Created {len(all_chunks)} chunks from document structure")
         return all_chunks
     
-    def _identify_structure(self, text: str) -> Dict:
-        """Identify document structure: sections, headings, exhibits."""
-        lines = text.split('\n')
-        structure = {
-            'sections': [],
-            'headings': [],
-            'exhibits': [],
-            'tables': []
-        }
-        
-        current_section = None
-        current_heading = None
-        
-        for i, line in enumerate(lines):
-            line_stripped = line.strip()
-            if not line_stripped:
-                continue
-            
-            # Check for section heading
-            for pattern in self.SECTION_PATTERNS:
-                if re.match(pattern, line_stripped, re.IGNORECASE):
-                    current_section = {
-                        'type': 'section',
-                        'title': line_stripped,
-                        'line_number': i,
-                        'level': self._detect_heading_level(line_stripped)
-                    }
-                    structure['sections'].append(current_section)
-                    current_heading = current_section
-                    break
-            
-            # Check for clause
-            for pattern in self.CLAUSE_PATTERNS:
-                if re.match(pattern, line_stripped):
-                    clause = {
-                        'type': 'clause',
-                        'title': line_stripped,
-                        'line_number': i,
-                        'parent_section': current_section
-                    }
-                    structure['headings'].append(clause)
-                    current_heading = clause
-                    break
-            
-            # Check for exhibit
-            for pattern in self.EXHIBIT_PATTERNS:
-                if re.search(pattern, line_stripped, re.IGNORECASE):
-                    exhibit = {
-                        'type': 'exhibit',
-                        'title': line_stripped,
-                        'line_number': i
-                    }
-                    structure['exhibits'].append(exhibit)
-                    break
-        
-        return structure
-    
-    def _detect_heading_level(self, heading: str) -> int:
-        """Detect heading hierarchy level."""
-        if re.match(r'^SECTION\s+\d+', heading, re.IGNORECASE):
-            return 1
-        elif re.match(r'^Article\s+\d+', heading, re.IGNORECASE):
-            return 1
-        elif re.match(r'^\d+\.\s+[A-Z]', heading):
-            return 2
-        elif re.match(r'^\d+\.\d+\.', heading):
-            return 3
-        else:
-            return 2
-    
-    def _split_into_sections(self, text: str, structure: Dict) -> List[Dict]:
-        """Split text into sections based on identified structure."""
-        if not structure['sections'] and not structure['headings']:
-            # No clear structure - split by double newlines
-            return [{'type': 'paragraph', 'title': None, 'text': text}]
+    def _parse_and_split(self, text: str) -> List[Dict]:
+        """
+        Detect section and clause headings and split text into sections.
         
-        lines = text.split('\n')
+        Headings close the section being collected as soon as they are seen,
+        so the lines are split and walked only once.
+        """
         sections = []
-        current_section = None
-        current_text = []
+        current_level = None  # None until the first heading is seen
         current_title = None
+        current_text = []
         
-        for i, line in enumerate(lines):
-            is_heading = False
-            
-            # Check if this line is a section heading
-            for section in structure['sections']:
-                if section['line_number'] == i:
-                    # Save previous section
-                    if current_section:
+        for line in text.split('\n'):
+            # Every heading pattern starts with a letter, digit or "(" once
+            # stripped; other lines (blank, bullets, quotes, ...) skip the
+            # strip and the regex calls
+            first = line[:1]
+            if first.isspace():
+                first = line.lstrip()[:1]
+            if first.isalnum() or first == '(':
+                line_stripped = line.strip()
+                # Section heading: always closes the previous section
+                m = _SECTION_RX.match(line_stripped)
+                if m:
+                    if current_level is not None:
                         sections.append({
                             'type': 'section',
                             'title': current_title,
                             'text': '\n'.join(current_text),
-                            'level': current_section.get('level', 2)
+                            'level': current_level
                         })
-                    # Start new section
-                    current_section = section
-                    current_title = section['title']
+                    current_level = SECTION_LEVELS[int(m.lastgroup[1:])]
+                    current_title = line_stripped
                     current_text = []
-                    is_heading = True
-                    break
-            
-            # Check if this line is a clause heading
-            if not is_heading:
-                for heading in structure['headings']:
-                    if heading['line_number'] == i:
-                        # Save previous section if it exists
-                        if current_section and current_text:
-                            sections.append({
-                                'type': 'section',
-                                'title': current_title,
-                                'text': '\n'.join(current_text),
-                                'level': current_section.get('level', 2)
-                            })
-                        # Start new subsection
-                        current_section = heading
-                        current_title = heading['title']
-                        current_text = []
-                        is_heading = True
-                        break
+                    continue
+                
+                # Clause heading: closes the previous section if it has text
+                if _CLAUSE_RX.match(line_stripped):
+                    if current_level is not None and current_text:
+                        sections.append({
+                            'type': 'section',
+                            'title': current_title,
+                            'text': '\n'.join(current_text),
+                            'level': current_level
+                        })
+                    # Clauses carry no level of their own
+                    current_level = 2
+                    current_title = line_stripped
+                    current_text = []
+                    continue
             
-            if not is_heading:
-                current_text.append(line)
+            current_text.append(line)
         
         # Add final section
-        if current_section and current_text:
+        if current_level is not None and current_text:
             sections.append({
                 'type': 'section',
                 'title': current_title,
                 'text': '\n'.join(current_text),
-                'level': current_section.get('level', 2)
+                'level': current_level
             })
         
-        # If no sections were created, return full text as one section
+        # No headings, or nothing under them - return full text as one section
         if not sections:
             sections.append({
                 'type': 'paragraph',
@@ -265,20 +253,29 @@ class EnhancedChunkingService:
         paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
         
         chunks = []
-        current_chunk = ""
         chunk_index = start_index
+        # Pieces of the chunk being built; joined only when it is emitted.
+        # Every piece is stripped and followed by one separator, whose
+        # length is tail_len for the last piece.
+        buf: List[str] = []
+        buf_len = 0
+        tail_len = 0
         
         for para in paragraphs:
             # If paragraph is too large, split by sentences
             if len(para) > self.chunk_size:
                 sentences = self._split_sentences(para)
                 for sentence in sentences:
-                    if len(current_chunk) + len(sentence) + 2 <= self.chunk_size:
-                        current_chunk += sentence + " "
+                    if buf_len + len(sentence) + 2 <= self.chunk_size:
+                        buf.append(sentence)
+                        buf.append(" ")
+                        buf_len += len(sentence) + 1
+                        tail_len = 1
                     else:
-                        if current_chunk.strip() and len(current_chunk.strip()) >= self.min_chunk_size:
+                        chunk_text = "".join(buf).strip()
+                        if chunk_text and len(chunk_text) >= self.min_chunk_size:
                             chunks.append(self._create_enhanced_chunk(
-                                current_chunk.strip(),
+                                chunk_text,
                                 chunk_index,
                                 section_title,
                                 base_metadata,
@@ -288,19 +285,28 @@ class EnhancedChunkingService:
                         
                         # Start new chunk with overlap
                         if chunks and self.overlap > 0:
-                            overlap_text = current_chunk[-self.overlap:].strip()
-                            current_chunk = overlap_text + " " + sentence + " "
+                            # Same as the old tail slice of the joined buffer, minus separator
+                            keep = self.overlap - tail_len
+                            overlap_text = chunk_text[-keep:].lstrip() if keep > 0 else ""
+                            buf = [overlap_text, " ", sentence, " "]
+                            buf_len = len(overlap_text) + len(sentence) + 2
                         else:
-                            current_chunk = sentence + " "
+                            buf = [sentence, " "]
+                            buf_len = len(sentence) + 1
+                        tail_len = 1
             else:
                 # Paragraph fits - add to current chunk
-                if len(current_chunk) + len(para) + 2 <= self.chunk_size:
-                    current_chunk += para + "\n\n"
+                if buf_len + len(para) + 2 <= self.chunk_size:
+                    buf.append(para)
+                    buf.append("\n\n")
+                    buf_len += len(para) + 2
+                    tail_len = 2
                 else:
                     # Save current chunk
-                    if current_chunk.strip() and len(current_chunk.strip()) >= self.min_chunk_size:
+                    chunk_text = "".join(buf).strip()
+                    if chunk_text and len(chunk_text) >= self.min_chunk_size:
                         chunks.append(self._create_enhanced_chunk(
-                            current_chunk.strip(),
+                            chunk_text,
                             chunk_index,
                             section_title,
                             base_metadata,
@@ -310,15 +316,21 @@ class EnhancedChunkingService:
                     
                     # Start new chunk with overlap
                     if chunks and self.overlap > 0:
-                        overlap_text = current_chunk[-self.overlap:].strip()
-                        current_chunk = overlap_text + "\n\n" + para + "\n\n"
+                        # Same as the old tail slice of the joined buffer, minus separator
+                        keep = self.overlap - tail_len
+                        overlap_text = chunk_text[-keep:].lstrip() if keep > 0 else ""
+                        buf = [overlap_text, "\n\n", para, "\n\n"]
+                        buf_len = len(overlap_text) + len(para) + 4
                     else:
-                        current_chunk = para + "\n\n"
+                        buf = [para, "\n\n"]
+                        buf_len = len(para) + 2
+                    tail_len = 2
         
         # Add final chunk
-        if current_chunk.strip() and len(current_chunk.strip()) >= self.min_chunk_size:
+        chunk_text = "".join(buf).strip()
+        if chunk_text and len(chunk_text) >= self.min_chunk_size:
             chunks.append(self._create_enhanced_chunk(
-                current_chunk.strip(),
+                chunk_text,
                 chunk_index,
                 section_title,
                 base_metadata,
@@ -329,9 +341,11 @@ class EnhancedChunkingService:
     
     def _split_sentences(self, text: str) -> List[str]:
         """Split text into sentences, preserving legal numbering."""
-        # Split by sentence endings, but preserve legal numbering
-        sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])', text)
-        return [s.strip() for s in sentences if s.strip()]
+        # Split by sentence endings, but preserve legal numbering. The
+        # lookbehind is fixed-width, so this stays one linear pass in C; a
+        # character loop in Python measured several times slower.
+        sentences = _SENTENCE_SPLIT_RE.split(text)
+        return [s for s in map(str.strip, sentences) if s]
     
     def _create_enhanced_chunk(
         self,
@@ -366,26 +380,7 @@ class EnhancedChunkingService:
     
     def _detect_clause_types(self, text: str) -> List[str]:
         """Detect what types of legal clauses are in this chunk."""
-        text_lower = text.lower()
-        detected = []
-        
-        clause_keywords = {
-            "payment": ["payment", "compensation", "fee", "invoice", "billing", "price"],
-            "termination": ["termination", "terminate", "cancel", "expire", "end of agreement"],
-            "liability": ["liability", "liable", "damage", "loss"],
-            "indemnification": ["indemnif", "hold harmless", "defend"],
-            "confidentiality": ["confidential", "non-disclosure", "nda", "proprietary"],
-            "scope": ["scope of work", "services", "deliverables", "work to be performed"],
-            "warranty": ["warranty", "warrant", "guarantee"],
-            "insurance": ["insurance", "coverage", "policy"],
-            "dispute": ["dispute", "arbitration", "mediation", "jurisdiction"],
-        }
-        
-        for clause_type, keywords in clause_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                detected.append(clause_type)
-        
-        return detected
+        return list(_clause_types(text))
     
     def chunk_by_pages(
         self,
@@ -402,27 +397,76 @@ class EnhancedChunkingService:
         Returns:
             List of chunks with enhanced metadata
         """
-        all_chunks = []
         base_metadata = {"file_id": file_id} if file_id else {}
+        settings = (self.chunk_size, self.overlap, self.min_chunk_size)
+        jobs = [
+            (settings, page.get("text", ""), base_metadata, page.get("page_number", 0))
+            for page in pages
+            if page.get("text", "").strip()
+        ]
         
-        for page in pages:
-            page_num = page.get("page_number", 0)
-            page_text = page.get("text", "")
-            
-            if not page_text.strip():
-                continue
-            
-            # Use enhanced chunking for each page
-            page_chunks = self.chunk_document(
-                page_text,
-                metadata=base_metadata,
-                page_number=page_num
-            )
+        results = None
+        if len(jobs) >= PARALLEL_MIN_PAGES:
+            # Pages are independent and chunking is CPU-bound, so fan out
+            # across processes; map() keeps the page order
+            try:
+                results = list(_get_pool().map(
+                    _chunk_one_page,
+                    jobs,
+                    chunksize=max(1, len(jobs) // (PARALLEL_MAX_WORKERS * 4))
+                ))
+            except BrokenProcessPool as e:
+                logger.warning(f"Chunking process pool failed, chunking serially: {str(e)}")
+                _reset_pool()
+        if results is None:
+            results = map(_chunk_one_page, jobs)
+        
+        all_chunks = []
+        for page_chunks in results:
             all_chunks.extend(page_chunks)
         
         return all_chunks
 
 
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Process pool shared by every upload in this process, created on first use.
+    
+    Workers are spawned rather than forked: the parent has running threads
+    (Pinecone's pool, the query executor) and open sockets and SQLite
+    handles, none of which may be copied into a child mid-use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=PARALLEL_MAX_WORKERS,
+                    mp_context=get_context("spawn")
+                )
+    return _pool
+
+
+def _reset_pool():
+    """Drop a broken pool so the next large document starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _chunk_one_page(job: Tuple) -> List[Dict]:
+    """Chunk one page; module-level so process pool workers can pickle it."""
+    settings, page_text, base_metadata, page_num = job
+    service = EnhancedChunkingService(*settings)
+    return service.chunk_document(
+        page_text,
+        metadata=base_metadata,
+        page_number=page_num
+    )
+
+
 # Global enhanced chunking service instance
 enhanced_chunking_service = EnhancedChunkingService(
     chunk_size=800,
@@ -0,0 +1,169 @@
+"""
+Content-addressed cache for text embeddings.
+Stores vectors in a local SQLite file so identical chunk text is only
+embedded once, across re-uploads and re-indexing.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import hashlib
+import logging
+import numpy as np
+import os
+import sqlite3
+import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbedCache:
+    """
+    Embedding cache keyed by a hash of (model, text).
+    
+    Vectors are stored as packed float32 bytes (6 KB for 1536 dimensions)
+    rather than JSON lists. Entries older than the TTL are treated as misses.
+    
+    The connection is opened lazily by the process that uses it: SQLite
+    connections must not cross fork(), and RQ work-horses and uvicorn
+    workers are forked after this module is imported. Calls block on disk,
+    so async callers go through asyncio.to_thread.
+    """
+    
+    def __init__(self, path: str, ttl_seconds: int):
+        """
+        Initialize embedding cache.
+        
+        Args:
+            path: SQLite file path; an empty string disables the cache
+            ttl_seconds: Maximum age of a cached vector
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Process that opened _conn (or failed to); None before first use
+        self._pid: Optional[int] = None
+        # Connections inherited through fork; kept referenced so they are
+        # never closed (closing releases the parent's file locks)
+        self._inherited: List[sqlite3.Connection] = []
+    
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """This process's connection, opened on first use."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._conn
+        
+        # A lock copied by fork may be held by a thread that doesn't exist here
+        if self._pid is not None:
+            self._lock = threading.Lock()
+        
+        with self._lock:
+            if self._pid == pid:
+                return self._conn
+            if self._conn is not None:
+                self._inherited.append(self._conn)
+            self._conn = None
+            
+            if self.path:
+                try:
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS embeddings ("
+                        "key BLOB PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+                    )
+                    conn.commit()
+                    self._conn = conn
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"Embedding cache disabled: {str(e)}")
+            
+            self._pid = pid
+            return self._conn
+    
+    @staticmethod
+    def _key(model: str, text: str) -> bytes:
+        """Content address for a model/text pair."""
+        return hashlib.blake2b(f"{model}\0{text}".encode("utf-8"), digest_size=16).digest()
+    
+    def get_many(self, model: str, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Look up cached vectors.
+        
+        Args:
+            model: Embedding model name
+            texts: Texts to look up
+        
+        Returns:
+            Mapping of position in texts to cached float32 vector (hits only)
+        """
+        if not texts:
+            return {}
+        conn = self._connection()
+        if conn is None:
+            return {}
+        
+        keys = [self._key(model, text) for text in texts]
+        cutoff = time.time() - self.ttl_seconds
+        found = {}
+        
+        try:
+            with self._lock:
+                # Stay well under SQLite's bound-parameter limit
+                for i in range(0, len(keys), 500):
+                    part = keys[i:i + 500]
+                    rows = conn.execute(
+                        "SELECT key, vector FROM embeddings "
+                        f"WHERE created_at >= ? AND key IN ({','.join('?' * len(part))})",
+                        [cutoff, *part]
+                    ).fetchall()
+                    found.update(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache read error: {str(e)}")
+            return {}
+        
+        hits = {}
+        for i, key in enumerate(keys):
+            blob = found.get(key)
+            if blob is not None:
+                hits[i] = np.frombuffer(blob, dtype=np.float32)
+        return hits
+    
+    def put_many(self, model: str, texts: List[str], vectors: Sequence[Sequence[float]]):
+        """
+        Store vectors for texts.
+        
+        Args:
+            model: Embedding model name
+            texts: Texts that were embedded
+            vectors: Their embeddings, in the same order
+        """
+        if not texts:
+            return
+        conn = self._connection()
+        if conn is None:
+            return
+        
+        now = time.time()
+        rows = [
+            (self._key(model, text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        
+        try:
+            with self._lock:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write error: {str(e)}")
+
+
+# Global embedding cache instance
+embed_cache = EmbedCache(
+    settings.EMBED_CACHE_PATH,
+    ttl_seconds=settings.EMBED_CACHE_TTL_DAYS * 86400
+)
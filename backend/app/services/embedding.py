@@ -4,6 +4,7 @@ Integrates with OpenRouter for embedding generation.
 """
 from typing import List, Dict, Optional
 import logging
+import numpy as np
 from app.services.openrouter import openrouter_client
 
 logger = logging.getLogger(__name__)
@@ -40,7 +41,7 @@ class EmbeddingService:
     async def generate_embeddings_batch(
         self,
         texts: List[str]
-    ) -> List[Optional[List[float]]]:
+    ) -> List[Optional[np.ndarray]]:
         """
         Generate embeddings for multiple texts.
         
@@ -48,22 +49,42 @@ class EmbeddingService:
             texts: List of texts to embed
             
         Returns:
-            List of embedding vectors (None for failed embeddings)
+            List of float32 embedding vectors (None for failed embeddings)
         """
         if not texts:
             return []
         
-        # Filter out empty texts
-        valid_texts = [t for t in texts if t and t.strip()]
-        if not valid_texts:
+        # Filter out empty texts and collapse repeats (boilerplate, signature
+        # blocks), remembering which unique text each input maps to
+        slots: Dict[str, int] = {}
+        slot_of: Dict[int, int] = {}
+        for i, text in enumerate(texts):
+            if text and text.strip():
+                slot_of[i] = slots.setdefault(text, len(slots))
+        if not slots:
             return [None] * len(texts)
+        valid_texts = list(slots)
+        if len(valid_texts) < len(slot_of):
+            logger.info(f"Embedding {len(valid_texts)} unique texts for {len(slot_of)} inputs")
         
+        # The client splits the texts into concurrent sub-batches itself
         try:
-            embeddings = await self.client.get_embeddings_batch(valid_texts)
-            return embeddings
+            unique_embeddings = await self.client.get_embeddings_batch(valid_texts)
         except Exception as e:
             logger.error(f"Batch embedding generation error: {str(e)}")
             return [None] * len(texts)
+        if len(unique_embeddings) != len(valid_texts):
+            logger.error(
+                f"Embedding count mismatch: got {len(unique_embeddings)} for {len(valid_texts)} texts"
+            )
+            return [None] * len(texts)
+        
+        # Scatter back to input positions; empty inputs stay None
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        for i, slot in slot_of.items():
+            results[i] = unique_embeddings[slot]
+        
+        return results
     
     async def embed_chunks(
         self,
@@ -72,11 +93,13 @@ class EmbeddingService:
         """
         Generate embeddings for text chunks.
         
+        Chunks are updated in place; the caller owns them.
+        
         Args:
             chunks: List of chunk dictionaries with 'text' field
             
         Returns:
-            List of chunks with added 'embedding' field
+            The same chunks with added 'embedding' field
         """
         if not chunks:
             return []
@@ -84,24 +107,22 @@ class EmbeddingService:
         # Extract texts
         texts = [chunk.get("text", "") for chunk in chunks]
         
-        # Generate embeddings
+        # Generate embeddings (aligned with texts, None where it failed)
         embeddings = await self.generate_embeddings_batch(texts)
         
         # Add embeddings to chunks
-        enriched_chunks = []
+        success_count = 0
         for chunk, embedding in zip(chunks, embeddings):
-            enriched_chunk = chunk.copy()
-            enriched_chunk["embedding"] = embedding
-            enriched_chunk["has_embedding"] = embedding is not None
-            enriched_chunks.append(enriched_chunk)
+            chunk["embedding"] = embedding
+            chunk["has_embedding"] = embedding is not None
+            success_count += embedding is not None
         
         # Log statistics
-        success_count = sum(1 for c in enriched_chunks if c["has_embedding"])
         logger.info(
             f"Generated embeddings for {success_count}/{len(chunks)} chunks"
         )
         
-        return enriched_chunks
+        return chunks
 
 
 # Global embedding service instance
@@ -0,0 +1,138 @@
+"""
+Micro-batching for query embeddings.
+Concurrent requests that each need one query embedded are coalesced into a
+single embeddings API call instead of one HTTPS round trip per request.
+"""
+from typing import List, Optional, Set, Tuple
+import asyncio
+import logging
+from app.services.embedding import EmbeddingService, embedding_service
+
+logger = logging.getLogger(__name__)
+
+# Queries per coalesced request, and how long the first one waits for others
+QUERY_BATCH_MAX_SIZE = 16
+QUERY_BATCH_WINDOW_SECONDS = 0.005
+
+
+def _resolve_none(future: asyncio.Future):
+    """Resolve a future with None unless it is already done."""
+    if not future.done():
+        future.set_result(None)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embed() calls on the event loop.
+    
+    The first queued text starts a short timer; when it fires, or as soon as
+    max_batch texts are waiting, the queue is embedded with one
+    generate_embeddings_batch call (which also collapses duplicate texts)
+    and each caller's future is resolved with its own vector.
+    
+    Queue and timer belong to one event loop; if embed() is called from a
+    different loop (e.g. RQ's per-job loops) they are reset first.
+    """
+    
+    def __init__(
+        self,
+        embedder: EmbeddingService,
+        max_batch: int = QUERY_BATCH_MAX_SIZE,
+        max_wait: float = QUERY_BATCH_WINDOW_SECONDS
+    ):
+        """
+        Initialize embedding batcher.
+        
+        Args:
+            embedder: Service that embeds a list of texts in one call
+            max_batch: Flush as soon as this many texts are queued
+            max_wait: Seconds the first queued text waits for others
+        """
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Keep flush tasks referenced until they finish
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """
+        Embed one text as part of the next batch.
+        
+        Args:
+            text: Text to embed
+        
+        Returns:
+            Embedding vector or None if failed
+        """
+        if not text or not text.strip():
+            logger.warning("Empty text provided for embedding")
+            return None
+        
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._bind(loop)
+        
+        future = loop.create_future()
+        self._pending.append((text, future))
+        
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        
+        return await future
+    
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        """Drop state left by a previous event loop and adopt this one."""
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._pending:
+            logger.warning(f"Dropping {len(self._pending)} queued embeddings from a previous event loop")
+            for _, future in self._pending:
+                # Wake any caller still waiting there with a failed (None) result
+                if not future.get_loop().is_closed():
+                    future.get_loop().call_soon_threadsafe(_resolve_none, future)
+        self._loop = loop
+        self._pending = []
+        self._timer = None
+    
+    def _flush(self):
+        """Hand everything queued so far to a background embedding call."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._embed_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Embed a batch and resolve each caller's future."""
+        try:
+            embeddings = await self.embedder.generate_embeddings_batch([text for text, _ in batch])
+            if len(embeddings) != len(batch):
+                logger.error(f"Coalesced embedding returned {len(embeddings)} vectors for {len(batch)} queries")
+            elif len(batch) > 1:
+                logger.info(f"Embedded {len(batch)} coalesced queries in one request")
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                # The caller may have gone away (e.g. a cancelled request)
+                if not future.done():
+                    future.set_result(None if embedding is None else embedding.tolist())
+        except Exception as e:
+            logger.error(f"Coalesced embedding error: {str(e)}")
+        finally:
+            # Nobody may be left waiting: failures, short results and our own
+            # cancellation all resolve to None
+            for _, future in batch:
+                _resolve_none(future)
+
+
+# Global embedding batcher instance
+embedding_batcher = EmbeddingBatcher(embedding_service)
@@ -3,12 +3,36 @@ Text extraction service for PDF and DOCX files.
 """
 import fitz  # PyMuPDF
 from docx import Document
+from docx.oxml.ns import qn
 from pathlib import Path
 from typing import List, Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# WordprocessingML tags read during DOCX extraction
+_W_P = qn("w:p")
+_W_R = qn("w:r")
+_W_HYPERLINK = qn("w:hyperlink")
+# Run children with a text equivalent (same set python-docx uses for Run.text)
+_W_RUN_TEXT = frozenset(
+    qn(tag) for tag in ("w:br", "w:cr", "w:noBreakHyphen", "w:ptab", "w:t", "w:tab")
+)
+
+
+def _docx_paragraph_text(p) -> str:
+    """Text of a <w:p> element, read straight from the XML."""
+    parts = []
+    for child in p.iterchildren(_W_R, _W_HYPERLINK):
+        runs = child.iterchildren(_W_R) if child.tag == _W_HYPERLINK else (child,)
+        for run in runs:
+            for el in run.iterchildren():
+                if el.tag in _W_RUN_TEXT:
+                    # oxml elements render their text equivalent: tab -> "\t",
+                    # line break -> "\n", page/column break -> ""
+                    parts.append(str(el))
+    return "".join(parts)
+
 
 class TextExtractionService:
     """Service for extracting text from various document formats."""
@@ -25,21 +49,21 @@ class TextExtractionService:
             Dictionary with extracted text, page count, and metadata
         """
         try:
-            doc = fitz.open(file_path)
             pages = []
             full_text = []
+            total_chars = 0
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                
-                pages.append({
-                    "page_number": page_num + 1,
-                    "text": text.strip()
-                })
-                full_text.append(text)
-            
-            doc.close()
+            with fitz.open(file_path) as doc:
+                for page in doc:
+                    # Plain-text flags: no image blocks are built for the page
+                    text = page.get_text("text", flags=fitz.TEXTFLAGS_TEXT)
+                    
+                    pages.append({
+                        "page_number": page.number + 1,
+                        "text": text.strip()
+                    })
+                    full_text.append(text)
+                    total_chars += len(text)
             
             return {
                 "success": True,
@@ -48,7 +72,7 @@ class TextExtractionService:
                 "full_text": "\n\n".join(full_text),
                 "metadata": {
                     "format": "pdf",
-                    "total_chars": len("".join(full_text))
+                    "total_chars": total_chars
                 }
             }
         
@@ -74,22 +98,24 @@ class TextExtractionService:
         try:
             doc = Document(file_path)
             paragraphs = []
-            full_text = []
+            total_chars = 0
             
-            for para in doc.paragraphs:
-                text = para.text.strip()
+            # Walk body paragraphs in the XML directly; building Paragraph
+            # and Run wrappers for every element dominates on large files
+            for p in doc.element.body.iterchildren(_W_P):
+                text = _docx_paragraph_text(p).strip()
                 if text:
                     paragraphs.append(text)
-                    full_text.append(text)
+                    total_chars += len(text)
             
             return {
                 "success": True,
                 "paragraphs_count": len(paragraphs),
                 "paragraphs": paragraphs,
-                "full_text": "\n\n".join(full_text),
+                "full_text": "\n\n".join(paragraphs),
                 "metadata": {
                     "format": "docx",
-                    "total_chars": len("".join(full_text))
+                    "total_chars": total_chars
                 }
             }
         
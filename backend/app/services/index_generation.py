@@ -0,0 +1,91 @@
+"""
+Index generation counter shared by every process.
+Bumped in Redis whenever Pinecone contents change, so the in-process caches
+of every API worker and RQ worker can tell that their entries are stale.
+"""
+from typing import Optional, Tuple
+import logging
+import threading
+import time
+import redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "contract-agent:index-generation"
+
+# After a Redis error, report no generation (so callers skip their caches)
+# for this long instead of paying a connect timeout on every lookup
+RETRY_AFTER_SECONDS = 5.0
+
+
+class IndexGeneration:
+    """
+    Cross-process "index changed" signal.
+    
+    current() returns a token that only grows within a process; caches key
+    their entries on it and treat a newer token as a full invalidation. The
+    token also carries a local epoch that moves whenever Redis can't be
+    reached (bumps made by other processes during the outage are lost) or
+    the counter goes backwards (Redis was flushed), so entries from before
+    either are never served after it.
+    """
+    
+    def __init__(self, redis_url: str, key: str = GENERATION_KEY):
+        """
+        Initialize index generation.
+        
+        Args:
+            redis_url: Redis shared by the API and RQ workers
+            key: Counter key
+        """
+        self.key = key
+        # redis-py reconnects after fork, so the client can be built at import
+        self._redis = redis.Redis.from_url(
+            redis_url,
+            socket_timeout=0.25,
+            socket_connect_timeout=0.25
+        )
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._last_value = 0
+        self._retry_at = 0.0
+    
+    def current(self) -> Optional[Tuple[int, int]]:
+        """
+        Current generation token, or None if Redis is unavailable (callers
+        must not cache anything then).
+        """
+        if time.monotonic() < self._retry_at:
+            return None
+        try:
+            value = self._redis.get(self.key)
+        except redis.RedisError as e:
+            self._unavailable(e)
+            return None
+        value = int(value or 0)
+        with self._lock:
+            if value < self._last_value:
+                self._epoch += 1
+            self._last_value = value
+            return (self._epoch, value)
+    
+    def bump(self):
+        """Mark the index as changed for every process."""
+        try:
+            self._redis.incr(self.key)
+        except redis.RedisError as e:
+            logger.error(f"Could not publish index change; other workers may serve stale cache entries: {str(e)}")
+            self._unavailable(e)
+    
+    def _unavailable(self, error: Exception):
+        """Back off from Redis and retire every token handed out so far."""
+        with self._lock:
+            if time.monotonic() >= self._retry_at:
+                logger.warning(f"Index generation unavailable, caches bypassed for {RETRY_AFTER_SECONDS:.0f}s: {str(error)}")
+            self._epoch += 1
+            self._retry_at = time.monotonic() + RETRY_AFTER_SECONDS
+
+
+# Global index generation instance
+index_generation = IndexGeneration(settings.REDIS_URL)
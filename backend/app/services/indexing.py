@@ -3,18 +3,184 @@ Helper functions for indexing uploaded files into Pinecone vector store.
 This connects the upload pipeline with the RAG system.
 """
 from sqlalchemy.orm import Session
+from types import MappingProxyType
+from typing import Dict, List, Optional
 from uuid import UUID
-import json
+import asyncio
+import ijson
 import logging
+import numpy as np
+import orjson
 
-from app.db.crud.upload import get_upload
+from app.db.crud.upload import get_upload, set_indexed_chunk_count
 from app.services.storage import storage
 from app.services.embedding import embedding_service
+from app.services.openrouter import EMBED_BATCH_SIZE, EMBED_MAX_CONCURRENCY
 from app.services.pinecone_client import pinecone_client
 from app.db.models.upload import ExtractionStatus
 
 logger = logging.getLogger(__name__)
 
+# Dimension of the Pinecone index (text-embedding-3-small)
+EMBEDDING_DIM = 1536
+
+# Vectors per Pinecone upsert request; requests are sent concurrently
+UPSERT_BATCH_SIZE = 100
+
+# Characters of chunk text stored in vector metadata; retrieval reads
+# this as the chunk text. At most 4 KB of UTF-8, well inside Pinecone's
+# 40 KB metadata limit
+METADATA_TEXT_CHARS = 1000
+
+# Extracted-text files above this size are stream-parsed for their chunks
+# instead of loading the whole document (full text, pages) into memory
+STREAM_PARSE_MIN_BYTES = 1024 * 1024
+
+# Chunks embedded per pipeline step (enough to keep every embedding
+# sub-batch busy), and windows buffered between pipeline stages
+INDEX_WINDOW_SIZE = EMBED_BATCH_SIZE * EMBED_MAX_CONCURRENCY
+PIPELINE_QUEUE_SIZE = 4
+
+# Shared stand-in for chunks without a metadata dict; never mutated
+_EMPTY_METADATA = MappingProxyType({})
+
+# Ends the vector stream early when an indexing pipeline stage fails
+_PIPELINE_FAILED = object()
+
+
+def _load_chunks(path: str) -> Optional[List[Dict]]:
+    """
+    Load the chunk list from an extracted-text JSON file.
+    
+    Small files are parsed in one go; large ones are streamed so only the
+    chunks are ever materialized.
+        
+    Returns:
+        Chunk dictionaries, or None if the file can't be read
+    """
+    size = storage.get_file_size(path)
+    if size is None:
+        return None
+    
+    if size < STREAM_PARSE_MIN_BYTES:
+        text_content = storage.read_file(path)
+        if not text_content:
+            return None
+        return orjson.loads(text_content).get("chunks", [])
+    
+    f = storage.open_file(path)
+    if f is None:
+        return None
+    with f:
+        return list(ijson.items(f, "chunks.item", use_float=True))
+
+
+def _build_vectors(
+    upload_id: UUID,
+    filename: str,
+    chunks: List[Dict],
+    start: int
+) -> List[Dict]:
+    """
+    Validate embedded chunks and build their Pinecone vectors.
+    
+    Args:
+        upload_id: Upload ID the chunks belong to
+        filename: Original filename stored in metadata
+        chunks: Embedded chunks, a window of the document's chunk list
+        start: Position of the first chunk in the document
+        
+    Returns:
+        Vector dictionaries with id, values, and metadata
+    """
+    # Stack embeddings into one float32 matrix, truncated or zero-padded
+    # to the index dimension, so the checks below are array passes
+    # rather than Python loops over every float
+    matrix = np.zeros((len(chunks), EMBEDDING_DIM), dtype=np.float32)
+    has_embedding = np.zeros(len(chunks), dtype=bool)
+    for i, chunk in enumerate(chunks):
+        if not chunk.get("has_embedding"):
+            logger.warning(f"Chunk {start + i} for upload {upload_id} has no embedding, skipping")
+            continue
+        
+        embedding = chunk["embedding"]
+        
+        # Skip if embedding is None or empty
+        if embedding is None or len(embedding) == 0:
+            logger.error(f"Chunk {start + i} has no embedding, skipping")
+            continue
+        
+        # The embedding service already returns float32 rows; plain lists
+        # are converted here
+        embedding = np.asarray(embedding, dtype=np.float32)
+        
+        # All-zero embedding indicates generation failed
+        if not embedding.any():
+            logger.error(f"Chunk {start + i} has zero embedding (embedding generation likely failed), skipping")
+            continue
+        
+        # Verify embedding dimension matches index (should be 1536)
+        if len(embedding) != EMBEDDING_DIM:
+            logger.warning(f"Chunk {start + i} has unexpected embedding dimension: {len(embedding)} (expected {EMBEDDING_DIM})")
+            if len(embedding) > EMBEDDING_DIM:
+                # For larger embeddings, take first 1536 (simple truncation)
+                logger.warning(f"Truncated embedding to {EMBEDDING_DIM} dimensions")
+            else:
+                # For smaller embeddings, pad with zeros (not ideal but prevents errors)
+                logger.warning(f"Padded embedding to {EMBEDDING_DIM} dimensions")
+        
+        width = min(len(embedding), EMBEDDING_DIM)
+        matrix[i, :width] = embedding[:width]
+        has_embedding[i] = True
+    
+    # Backstop for rows that became all-zero through truncation
+    nonzero = matrix.any(axis=1)
+    for i in np.flatnonzero(has_embedding & ~nonzero):
+        logger.error(f"Chunk {start + i} has zero embedding (embedding generation likely failed), skipping")
+    
+    # Prepare vectors for Pinecone
+    file_id = str(upload_id)
+    vectors = []
+    for i in np.flatnonzero(has_embedding & nonzero).tolist():
+        chunk = chunks[i]
+        text = chunk["text"]
+        page = (chunk.get("metadata") or _EMPTY_METADATA).get("page")
+        section_title = chunk.get("section_title")
+        detected_clauses = chunk.get("detected_clauses")
+        
+        # Create vector ID
+        chunk_index = start + i
+        vector_id = f"{upload_id}_chunk_{chunk_index}"
+        
+        # Prepare metadata with enhanced information
+        metadata = {
+            "file_id": file_id,
+            "filename": filename,
+            "text": text[:METADATA_TEXT_CHARS],  # Limit text size for metadata
+            "chunk_index": chunk_index,
+            "char_count": chunk.get("char_count") or len(text)
+        }
+        
+        # Add page info if available
+        if page:
+            metadata["page"] = page
+        
+        # Add section title if available (from enhanced chunking)
+        if section_title:
+            metadata["section_title"] = section_title
+        
+        # Add detected clauses if available
+        if detected_clauses:
+            metadata["detected_clauses"] = detected_clauses
+        
+        vectors.append({
+            "id": vector_id,
+            "values": matrix[i].tolist(),
+            "metadata": metadata
+        })
+    
+    return vectors
+
 
 async def index_file_to_pinecone(
     db: Session,
@@ -52,23 +218,23 @@ async def index_file_to_pinecone(
         return False
     
     try:
-        # Load extracted text JSON
-        text_content = storage.read_file(upload.extracted_text_path)
-        if not text_content:
+        # Load chunks from the extracted text JSON
+        chunks = _load_chunks(upload.extracted_text_path)
+        if chunks is None:
             logger.error(f"Could not read extracted text for upload {upload_id}")
             return False
         
-        extraction_data = json.loads(text_content.decode("utf-8"))
-        chunks = extraction_data.get("chunks", [])
-        
         if not chunks:
             logger.warning(f"No chunks found for upload {upload_id}")
             return False
         
         logger.info(f"Indexing {len(chunks)} chunks for upload {upload_id}")
         
-        # Generate embeddings for all chunks
-        enriched_chunks = await embedding_service.embed_chunks(chunks)
+        # Chunk indexes a previous run may have left vectors for; 0 for a
+        # first index, which then has nothing stale to delete
+        previous_count = (upload.custom_metadata or {}).get("indexed_chunks", 0)
+        # Until a run succeeds, vectors may exist for either version
+        pending_count = max(previous_count, len(chunks))
         
         # Get index dimension to ensure compatibility
         try:
@@ -79,79 +245,84 @@ async def index_file_to_pinecone(
         except:
             pass
         
-        # Prepare vectors for Pinecone
-        vectors = []
-        for i, chunk in enumerate(enriched_chunks):
-            if not chunk.get("has_embedding"):
-                logger.warning(f"Chunk {i} for upload {upload_id} has no embedding, skipping")
-                continue
-            
-            embedding = chunk["embedding"]
-            
-            # Skip if embedding is None or empty
-            if not embedding or len(embedding) == 0:
-                logger.error(f"Chunk {i} has no embedding, skipping")
-                continue
-            
-            # Check if embedding is all zeros (indicates failure)
-            if all(v == 0.0 for v in embedding):
-                logger.error(f"Chunk {i} has zero embedding (embedding generation likely failed), skipping")
-                continue
-            
-            # Verify embedding dimension matches index (should be 1536)
-            if len(embedding) != 1536:
-                logger.warning(f"Chunk {i} has unexpected embedding dimension: {len(embedding)} (expected 1536)")
-                if len(embedding) > 1536:
-                    # For larger embeddings, take first 1536 (simple truncation)
-                    embedding = embedding[:1536]
-                    logger.warning(f"Truncated embedding to 1536 dimensions")
-                elif len(embedding) < 1536:
-                    # For smaller embeddings, pad with zeros (not ideal but prevents errors)
-                    embedding = embedding + [0.0] * (1536 - len(embedding))
-                    logger.warning(f"Padded embedding to 1536 dimensions")
-            
-            # Create vector ID
-            vector_id = f"{upload_id}_chunk_{i}"
-            
-            # Prepare metadata with enhanced information
-            metadata = {
-                "file_id": str(upload_id),
-                "filename": upload.filename,
-                "text": chunk["text"][:1000],  # Limit text length for metadata
-                "chunk_index": i,
-                "char_count": chunk.get("char_count", len(chunk.get("text", "")))
-            }
-            
-            # Add page info if available
-            if chunk.get("metadata", {}).get("page"):
-                metadata["page"] = chunk["metadata"]["page"]
-            
-            # Add section title if available (from enhanced chunking)
-            if chunk.get("section_title"):
-                metadata["section_title"] = chunk["section_title"]
-            
-            # Add detected clauses if available
-            if chunk.get("detected_clauses"):
-                metadata["detected_clauses"] = chunk["detected_clauses"]
-            
-            vectors.append({
-                "id": vector_id,
-                "values": embedding,
-                "metadata": metadata
-            })
-        
-        # Upsert to Pinecone
-        if vectors:
-            success = pinecone_client.upsert_vectors(vectors)
-            if success:
-                logger.info(f"Successfully indexed {len(vectors)} vectors for upload {upload_id}")
-                return True
-            else:
-                logger.error(f"Failed to upsert vectors for upload {upload_id}")
-                return False
-        else:
+        # Embed, validate and upsert as a pipeline over windows of chunks, so
+        # one window's upsert overlaps the next window's embedding requests.
+        # Bounded queues keep at most a few windows in memory; None ends a stage.
+        embedded_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        vector_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        totals = {"vectors": 0, "failed_upserts": 0}
+        loop = asyncio.get_running_loop()
+        
+        async def embed_stage():
+            for start in range(0, len(chunks), INDEX_WINDOW_SIZE):
+                window = chunks[start:start + INDEX_WINDOW_SIZE]
+                await embedding_service.embed_chunks(window)
+                await embedded_queue.put((start, window))
+            await embedded_queue.put(None)
+        
+        async def build_stage():
+            while (item := await embedded_queue.get()) is not None:
+                start, window = item
+                vectors = _build_vectors(upload_id, upload.filename, window, start)
+                if vectors:
+                    await vector_queue.put(vectors)
+            await vector_queue.put(None)
+        
+        def queued_vectors():
+            # Runs in the upsert's worker thread, taking each window from
+            # the event loop's queue as the upsert is ready for it
+            while True:
+                vectors = asyncio.run_coroutine_threadsafe(vector_queue.get(), loop).result()
+                if vectors is None:
+                    return
+                if vectors is _PIPELINE_FAILED:
+                    raise RuntimeError("indexing pipeline failed")
+                totals["vectors"] += len(vectors)
+                yield from vectors
+        
+        async def upsert_stage():
+            # Re-indexing overwrites the file's vectors and drops the chunks
+            # the new version no longer has, in the client's thread pool
+            replaced = await asyncio.to_thread(
+                pinecone_client.replace_document,
+                str(upload_id),
+                queued_vectors(),
+                len(chunks),
+                previous_count=previous_count,
+                batch_size=UPSERT_BATCH_SIZE
+            )
+            if not replaced:
+                totals["failed_upserts"] += 1
+        
+        stages = [
+            asyncio.create_task(embed_stage()),
+            asyncio.create_task(build_stage()),
+            asyncio.create_task(upsert_stage())
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except Exception:
+            # Don't leave the other stages blocked on a queue
+            for task in stages:
+                task.cancel()
+            # Cancelling doesn't stop the upsert thread, so end its stream
+            while not vector_queue.empty():
+                vector_queue.get_nowait()
+            vector_queue.put_nowait(_PIPELINE_FAILED)
+            set_indexed_chunk_count(db, upload_id, pending_count)
+            raise
+        
+        indexed = totals["vectors"] and not totals["failed_upserts"]
+        set_indexed_chunk_count(db, upload_id, len(chunks) if indexed else pending_count)
+        
+        if not totals["vectors"]:
             logger.warning(f"No valid vectors to index for upload {upload_id}")
             return False
+        if totals["failed_upserts"]:
+            logger.error(f"Failed to upsert vectors for upload {upload_id}")
+            return False
+        logger.info(f"Successfully indexed {totals['vectors']} vectors for upload {upload_id}")
+        return True
             
     except Exception as e:
         logger.error(f"Error indexing upload {upload_id}: {str(e)}")
@@ -169,12 +340,18 @@ async def delete_file_from_pinecone(upload_id: UUID) -> bool:
         True if successful
     """
     try:
-        # Generate all possible vector IDs for this file
-        # This is a simplified approach - in production, you might query first
-        # For now, we'll delete up to 1000 possible chunks
-        vector_ids = [f"{upload_id}_chunk_{i}" for i in range(1000)]
+        if not pinecone_client.index:
+            pinecone_client.connect()
+        
+        if pinecone_client.supports_filtered_delete:
+            # Every chunk vector carries its file_id in metadata
+            success = pinecone_client.delete_by_filter({"file_id": {"$eq": str(upload_id)}})
+        else:
+            # Serverless indexes can't delete by filter, so fall back to
+            # deleting up to 1000 possible chunk IDs
+            vector_ids = [f"{upload_id}_chunk_{i}" for i in range(1000)]
+            success = pinecone_client.delete_vectors(vector_ids)
         
-        success = pinecone_client.delete_vectors(vector_ids)
         if success:
             logger.info(f"Deleted vectors for upload {upload_id}")
         return success
@@ -5,13 +5,191 @@ Optimized for legal industry with fallback models and streaming support.
 """
 from typing import List, Dict, Optional, AsyncGenerator, Any
 import httpx
-import json
 import logging
+import numpy as np
+import orjson
 import asyncio
+import time
 from app.core.config import settings
+from app.services.embed_cache import embed_cache
 
 logger = logging.getLogger(__name__)
 
+# Default system prompt for chat calls that do not bring their own; shared
+# by the plain and streaming paths and never mutated
+LEGAL_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": (
+        "You are a precise legal document assistant. "
+        "CRITICAL: Only state facts that are explicitly present in the provided context. "
+        "If information is not available, clearly state 'This information is not present in the provided documents.' "
+        "Never make assumptions or inferences beyond what is explicitly stated. "
+        "Always cite sources when making claims."
+    )
+}
+
+# Request headers for bodies serialized ahead of time with orjson
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Texts per embeddings request, and how many of one call's requests may be
+# in flight at once (get_embeddings_batch defaults)
+EMBED_BATCH_SIZE = 96
+EMBED_MAX_CONCURRENCY = 8
+
+# TLS settings are loaded (CA bundle, ALPN for HTTP/2) once per process and
+# shared by every client, instead of rebuilt whenever a client is created
+_SSL_CONTEXT = httpx.create_ssl_context(verify=settings.OPENROUTER_VERIFY_SSL, http2=True)
+
+# Instructions and per-type prompts for analyze_legal_document, built once.
+# Templates are str.format strings (literal JSON braces are doubled) filled
+# with {document} and {contract_type} per call.
+ANALYSIS_SYSTEM_PROMPT = """You are an expert legal analyst specializing in contract review.
+You MUST provide analysis in valid JSON format ONLY. No explanatory text outside JSON.
+
+CRITICAL RULES:
+1. ONLY analyze what is explicitly present in the document
+2. NEVER infer or assume information not stated
+3. Rate confidence for each finding (high/medium/low)
+4. Cite specific text for every claim
+5. Flag any ambiguous or unclear language
+"""
+
+_ANALYSIS_TEMPLATES = {
+    "full": """Analyze this contract comprehensively. Return JSON with this exact structure:
+{{
+    "summary": "Brief executive summary (2-3 sentences)",
+    "contract_type": "Detected contract type",
+    "parties": ["List of parties identified"],
+    "key_dates": [{{"description": "...", "date": "...", "confidence": "high/medium/low"}}],
+    "key_clauses": [
+        {{
+            "name": "Clause name",
+            "content_summary": "What it says",
+            "risk_level": "low/medium/high/critical",
+            "location": "Where in document",
+            "concerns": ["Any issues"],
+            "confidence": "high/medium/low"
+        }}
+    ],
+    "risks": [
+        {{
+            "severity": "low/medium/high/critical",
+            "description": "Risk description",
+            "affected_clause": "Which clause",
+            "recommendation": "How to address",
+            "confidence": "high/medium/low"
+        }}
+    ],
+    "missing_elements": ["Standard elements not found"],
+    "compliance_status": {{
+        "overall": "compliant/needs_review/non_compliant",
+        "checks": {{"element": "status"}}
+    }},
+    "recommendations": ["Actionable recommendations"],
+    "overall_risk_score": 0.0-1.0,
+    "confidence_level": "high/medium/low"
+}}
+
+Contract Type Hint: {contract_type}
+
+DOCUMENT:
+{document}""",
+
+    "risks": """Identify ALL risks in this contract. Return JSON:
+{{
+    "risks": [
+        {{
+            "severity": "low/medium/high/critical",
+            "category": "financial/legal/operational/compliance/reputational",
+            "description": "Detailed risk description",
+            "source_text": "Exact quote from document",
+            "location": "Section/paragraph reference",
+            "impact": "Potential consequences",
+            "likelihood": "low/medium/high",
+            "recommendation": "Mitigation suggestion",
+            "confidence": "high/medium/low"
+        }}
+    ],
+    "overall_risk_level": "low/medium/high/critical",
+    "risk_score": 0.0-1.0,
+    "priority_actions": ["Top 3 actions needed"]
+}}
+
+DOCUMENT:
+{document}""",
+
+    "clauses": """Extract and analyze ALL clauses. Return JSON:
+{{
+    "clauses": [
+        {{
+            "name": "Standard clause name",
+            "category": "payment/termination/liability/confidentiality/ip/dispute/indemnification/warranty/force_majeure/other",
+            "content": "Full clause text",
+            "summary": "Plain language summary",
+            "is_standard": true/false,
+            "deviations": "How it differs from standard",
+            "risk_level": "low/medium/high/critical",
+            "negotiability": "non_negotiable/negotiable/highly_negotiable",
+            "related_clauses": ["Other related clauses"],
+            "confidence": "high/medium/low"
+        }}
+    ],
+    "clause_coverage": {{
+        "present": ["Standard clauses found"],
+        "missing": ["Expected but not found"],
+        "unusual": ["Non-standard clauses"]
+    }}
+}}
+
+DOCUMENT:
+{document}""",
+
+    "summary": """Provide executive summary. Return JSON:
+{{
+    "title": "Contract title/name",
+    "type": "Contract type",
+    "parties": [{{"name": "...", "role": "..."}}],
+    "effective_date": "Date or null",
+    "term": "Duration/term",
+    "value": "Financial value if stated",
+    "purpose": "Main purpose in 1-2 sentences",
+    "key_obligations": [
+        {{"party": "...", "obligation": "..."}}
+    ],
+    "critical_dates": [{{"event": "...", "date": "..."}}],
+    "special_conditions": ["Notable conditions"],
+    "executive_summary": "3-5 sentence summary for executives",
+    "confidence": "high/medium/low"
+}}
+
+DOCUMENT:
+{document}"""
+}
+
+# Characters of document text sent per analysis type (default 50000)
+_ANALYSIS_DOCUMENT_LIMITS = {"summary": 30000}
+
+
+class _TokenBucket:
+    """Requests-per-minute limiter, refilled from the clock on each acquire."""
+    
+    def __init__(self, requests_per_minute: int, capacity: int):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+    
+    async def acquire(self):
+        """Wait until a request may be sent."""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
 
 class OpenRouterClient:
     """Client for OpenRouter API with fallback support and streaming."""
@@ -47,6 +225,81 @@ class OpenRouterClient:
             "HTTP-Referer": "http://localhost:8000",
             "X-Title": "Contract Agent - Legal Document AI"
         }
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Embedding limits are shared by every caller in the process, so
+        # concurrent indexing jobs don't each fire their own bursts. The
+        # bucket only reads the clock and sleeps, so it survives loop changes
+        self._embed_semaphore: Optional[asyncio.Semaphore] = None
+        self._embed_bucket: Optional[_TokenBucket] = None
+        if settings.EMBED_REQUESTS_PER_MINUTE > 0:
+            self._embed_bucket = _TokenBucket(
+                settings.EMBED_REQUESTS_PER_MINUTE,
+                capacity=settings.EMBED_MAX_IN_FLIGHT
+            )
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Shared HTTP client for the running event loop.
+        
+        Keeps connections alive between calls instead of paying a TCP and
+        TLS handshake per request. A client cannot outlive the loop its
+        connections belong to, so if the loop changes (RQ runs each job on
+        a new loop) the old client is closed and a new one is made.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client_loop is not loop:
+            if self._client_loop is not None:
+                logger.info("Event loop changed; rebinding OpenRouter HTTP client and embedding semaphore")
+            if self._client is not None:
+                self._close_detached_client(self._client, self._client_loop)
+                self._client = None
+            self._client_loop = loop
+            # Semaphores bind to the loop that first waits on them
+            self._embed_semaphore = asyncio.Semaphore(settings.EMBED_MAX_IN_FLIGHT)
+        
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=120.0,
+                limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100),
+                # Concurrent requests multiplex over one TLS connection
+                http2=True,
+                verify=_SSL_CONTEXT
+            )
+        return self._client
+    
+    @staticmethod
+    def _close_detached_client(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        """
+        Close a client on the loop its connections belong to.
+        
+        Only a loop that is still running can be handed the close; a stopped
+        loop is never driven from here, since it isn't ours to run.
+        """
+        if client.is_closed:
+            return
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            # Callers should aclose() before their loop ends
+            logger.warning("Previous event loop is not running; dropping its HTTP client without a clean shutdown")
+    
+    async def _post_embeddings(self, payload: Dict, timeout: float) -> httpx.Response:
+        """POST to /embeddings within the process-wide concurrency and rate limits."""
+        client = self._get_client()
+        async with self._embed_semaphore:
+            if self._embed_bucket is not None:
+                await self._embed_bucket.acquire()
+            return await client.post("/embeddings", json=payload, timeout=timeout)
+    
+    async def aclose(self):
+        """Close the shared HTTP client (call before the event loop ends)."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
     
     async def chat_completion(
         self,
@@ -55,7 +308,8 @@ class OpenRouterClient:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         stream: bool = False,
-        model_type: str = "chat"
+        model_type: str = "chat",
+        response_format: Optional[Dict] = None
     ) -> Dict:
         """
         Get chat completion from OpenRouter with automatic fallback.
@@ -67,7 +321,9 @@ class OpenRouterClient:
             max_tokens: Maximum tokens to generate
             stream: Whether to stream the response
             model_type: Type of model to use ('chat', 'reasoning', 'generation')
-            
+            response_format: Structured output request, e.g. {"type": "json_object"};
+                OpenRouter drops it for models that don't support it
+        
         Returns:
             Completion response dictionary
         """
@@ -85,42 +341,37 @@ class OpenRouterClient:
         if max_tokens:
             payload["max_tokens"] = max_tokens
         
+        if response_format:
+            payload["response_format"] = response_format
+        
         # Add legal-focused system instructions if not already present
         if not any(m.get("role") == "system" for m in messages):
-            legal_system = {
-                "role": "system",
-                "content": (
-                    "You are a precise legal document assistant. "
-                    "CRITICAL: Only state facts that are explicitly present in the provided context. "
-                    "If information is not available, clearly state 'This information is not present in the provided documents.' "
-                    "Never make assumptions or inferences beyond what is explicitly stated. "
-                    "Always cite sources when making claims."
-                )
-            }
-            payload["messages"] = [legal_system] + messages
+            payload["messages"] = [LEGAL_SYSTEM_MESSAGE] + messages
         
         # Try primary model first, then fallback
         models_to_try = [model]
         if model == config["primary"] and config.get("fallback"):
             models_to_try.append(config["fallback"])
         
+        client = self._get_client()
         last_error = None
         for attempt_model in models_to_try:
+            # Serialize once per model; retries resend the same body
             payload["model"] = attempt_model
+            body = orjson.dumps(payload)
             
             for attempt in range(config.get("max_retries", 2)):
                 try:
-                    async with httpx.AsyncClient(timeout=120.0, verify=False) as client:
-                        response = await client.post(
-                            f"{self.base_url}/chat/completions",
-                            headers=self.headers,
-                            json=payload
-                        )
-                        response.raise_for_status()
-                        result = response.json()
-                        result["model_used"] = attempt_model
-                        return result
-                        
+                    response = await client.post(
+                        "/chat/completions",
+                        content=body,
+                        headers=JSON_HEADERS
+                    )
+                    response.raise_for_status()
+                    result = orjson.loads(response.content)
+                    result["model_used"] = attempt_model
+                    return result
+                
                 except httpx.HTTPStatusError as e:
                     last_error = e
                     if e.response.status_code == 429:  # Rate limit
@@ -132,11 +383,11 @@ class OpenRouterClient:
                         await asyncio.sleep(1)
                     else:
                         break  # Don't retry on client errors
-                        
+                
                 except httpx.TimeoutException as e:
                     last_error = e
                     logger.warning(f"Timeout on attempt {attempt + 1}")
-                    
+                
                 except Exception as e:
                     last_error = e
                     logger.error(f"Unexpected error: {str(e)}")
@@ -165,7 +416,7 @@ class OpenRouterClient:
             temperature: Sampling temperature
             max_tokens: Maximum tokens
             model_type: Type of model
-            
+        
         Yields:
             Streamed text chunks
         """
@@ -175,17 +426,7 @@ class OpenRouterClient:
         
         # Add legal system prompt if needed
         if not any(m.get("role") == "system" for m in messages):
-            legal_system = {
-                "role": "system",
-                "content": (
-                    "You are a precise legal document assistant. "
-                    "CRITICAL: Only state facts that are explicitly present in the provided context. "
-                    "If information is not available, clearly state 'This information is not present in the provided documents.' "
-                    "Never make assumptions or inferences beyond what is explicitly stated. "
-                    "Always cite sources when making claims."
-                )
-            }
-            messages = [legal_system] + messages
+            messages = [LEGAL_SYSTEM_MESSAGE] + messages
         
         payload = {
             "model": model,
@@ -199,30 +440,26 @@ class OpenRouterClient:
             payload["max_tokens"] = max_tokens
         
         try:
-            async with httpx.AsyncClient(timeout=120.0, verify=False) as client:
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    response.raise_for_status()
-                    
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            data = line[6:]
-                            if data == "[DONE]":
-                                break
-                            try:
-                                chunk = json.loads(data)
-                                if chunk.get("choices"):
-                                    delta = chunk["choices"][0].get("delta", {})
-                                    content = delta.get("content", "")
-                                    if content:
-                                        yield content
-                            except json.JSONDecodeError:
-                                continue
-                                
+            async with self._get_client().stream(
+                "POST",
+                "/chat/completions",
+                json=payload
+            ) as response:
+                response.raise_for_status()
+                
+                async for data in _iter_sse_data(response):
+                    if data == b"[DONE]":
+                        break
+                    try:
+                        chunk = orjson.loads(data)
+                    except orjson.JSONDecodeError:
+                        continue
+                    if chunk.get("choices"):
+                        delta = chunk["choices"][0].get("delta", {})
+                        content = delta.get("content", "")
+                        if content:
+                            yield content
+        
         except Exception as e:
             logger.error(f"Streaming error: {str(e)}")
             yield f"\n\n[Error: {str(e)}]"
@@ -238,7 +475,7 @@ class OpenRouterClient:
         Args:
             text: Text to embed
             model: Embedding model (defaults to settings.OPENROUTER_EMBEDDING_MODEL)
-            
+        
         Returns:
             Embedding vector (list of floats)
         """
@@ -257,6 +494,10 @@ class OpenRouterClient:
             text = text[:max_chars]
             logger.warning(f"Text truncated to {max_chars} chars for embedding")
         
+        cached = await asyncio.to_thread(embed_cache.get_many, model, [text])
+        if cached:
+            return cached[0].tolist()
+        
         payload = {
             "model": model,
             "input": text
@@ -264,18 +505,14 @@ class OpenRouterClient:
         
         for attempt in range(3):
             try:
-                async with httpx.AsyncClient(timeout=60.0, verify=False) as client:
-                    response = await client.post(
-                        f"{self.base_url}/embeddings",
-                        headers=self.headers,
-                        json=payload
-                    )
-                    response.raise_for_status()
-                    result = response.json()
-                    
-                    embedding = result["data"][0]["embedding"]
-                    return embedding
-                    
+                response = await self._post_embeddings(payload, timeout=60.0)
+                response.raise_for_status()
+                result = orjson.loads(response.content)
+                
+                embedding = result["data"][0]["embedding"]
+                await asyncio.to_thread(embed_cache.put_many, model, [text], [embedding])
+                return embedding
+            
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == 429:
                     wait_time = 2 ** attempt
@@ -283,7 +520,7 @@ class OpenRouterClient:
                     await asyncio.sleep(wait_time)
                 else:
                     raise
-                    
+            
             except Exception as e:
                 logger.error(f"Embedding error (attempt {attempt + 1}): {str(e)}")
                 if attempt == 2:
@@ -295,75 +532,103 @@ class OpenRouterClient:
     async def get_embeddings_batch(
         self,
         texts: List[str],
-        model: Optional[str] = None
-    ) -> List[List[float]]:
+        model: Optional[str] = None,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY
+    ) -> np.ndarray:
         """
         Get embeddings for multiple texts with batching.
         
+        Batches are sent concurrently, at most max_concurrency at a time.
+        Vectors are kept as float32 arrays rather than lists of Python floats
+        (4 bytes per value instead of a boxed float each).
+        
         Args:
             texts: List of texts to embed
             model: Embedding model
-            
+            batch_size: Texts per embeddings request
+            max_concurrency: Maximum requests in flight
+        
         Returns:
-            List of embedding vectors
+            float32 array with one embedding row per text
         """
         model = model or settings.OPENROUTER_EMBEDDING_MODEL
         
         if not texts:
-            return []
+            return np.empty((0, 0), dtype=np.float32)
         
-        embeddings = []
-        batch_size = 10  # Smaller batches for reliability
+        # Clean texts
+        clean_texts = []
+        for text in texts:
+            text = text.strip() if text else ""
+            if len(text) > 30000:
+                text = text[:30000]
+            clean_texts.append(text if text else " ")  # Replace empty with space
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            
-            # Clean batch texts
-            clean_batch = []
-            for text in batch:
-                text = text.strip() if text else ""
-                if len(text) > 30000:
-                    text = text[:30000]
-                clean_batch.append(text if text else " ")  # Replace empty with space
-            
+        # Only texts without a cached vector go to the API
+        embeddings = await asyncio.to_thread(embed_cache.get_many, model, clean_texts)
+        misses = [i for i in range(len(clean_texts)) if i not in embeddings]
+        if embeddings:
+            logger.info(f"Embedding cache hits: {len(embeddings)}/{len(clean_texts)}")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def embed_batch(batch_indices: List[int]):
+            clean_batch = [clean_texts[j] for j in batch_indices]
             payload = {
                 "model": model,
                 "input": clean_batch
             }
             
-            for attempt in range(3):
-                try:
-                    async with httpx.AsyncClient(timeout=90.0, verify=False) as client:
-                        response = await client.post(
-                            f"{self.base_url}/embeddings",
-                            headers=self.headers,
-                            json=payload
-                        )
+            async with semaphore:
+                for attempt in range(3):
+                    try:
+                        response = await self._post_embeddings(payload, timeout=90.0)
                         response.raise_for_status()
-                        result = response.json()
+                        result = orjson.loads(response.content)
                         
-                        batch_embeddings = [item["embedding"] for item in result["data"]]
-                        embeddings.extend(batch_embeddings)
+                        batch_embeddings = np.asarray(
+                            [item["embedding"] for item in result["data"]],
+                            dtype=np.float32
+                        )
+                        embeddings.update(zip(batch_indices, batch_embeddings))
+                        await asyncio.to_thread(embed_cache.put_many, model, clean_batch, batch_embeddings)
                         break
-                        
-                except httpx.HTTPStatusError as e:
-                    if e.response.status_code == 429:
-                        wait_time = 2 ** attempt
-                        logger.warning(f"Batch embedding rate limited, waiting {wait_time}s")
-                        await asyncio.sleep(wait_time)
-                    else:
-                        logger.error(f"Batch embedding error: {e.response.text}")
-                        # Don't add zero vectors - let the caller handle None
-                        raise
-                        
-                except Exception as e:
-                    logger.error(f"Batch embedding error: {str(e)}")
-                    if attempt == 2:
-                        # Don't add zero vectors on final failure - raise instead
-                        raise
-                    await asyncio.sleep(1)
+                    
+                    except httpx.HTTPStatusError as e:
+                        if e.response.status_code == 429:
+                            wait_time = 2 ** attempt
+                            logger.warning(f"Batch embedding rate limited, waiting {wait_time}s")
+                            await asyncio.sleep(wait_time)
+                        else:
+                            logger.error(f"Batch embedding error: {e.response.text}")
+                            # Don't add zero vectors - let the caller handle None
+                            raise
+                    
+                    except Exception as e:
+                        logger.error(f"Batch embedding error: {str(e)}")
+                        if attempt == 2:
+                            # Don't add zero vectors on final failure - raise instead
+                            raise
+                        await asyncio.sleep(1)
+            
+            if any(j not in embeddings for j in batch_indices):
+                raise Exception("Failed to get batch embeddings after all retries")
         
-        return embeddings
+        tasks = [
+            asyncio.create_task(embed_batch(misses[i:i + batch_size]))
+            for i in range(0, len(misses), batch_size)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            # The call has failed; stop the other batches spending requests
+            # and rate-limit tokens on it
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        return np.vstack([embeddings[i] for i in range(len(clean_texts))])
     
     async def analyze_legal_document(
         self,
@@ -378,137 +643,19 @@ class OpenRouterClient:
             document_text: Full document text
             analysis_type: Type of analysis ('full', 'risks', 'clauses', 'summary')
             contract_type: Optional contract type for specialized analysis
-            
+        
         Returns:
             Structured analysis results
         """
-        system_prompt = """You are an expert legal analyst specializing in contract review.
-You MUST provide analysis in valid JSON format ONLY. No explanatory text outside JSON.
-
-CRITICAL RULES:
-1. ONLY analyze what is explicitly present in the document
-2. NEVER infer or assume information not stated
-3. Rate confidence for each finding (high/medium/low)
-4. Cite specific text for every claim
-5. Flag any ambiguous or unclear language
-"""
-
-        analysis_prompts = {
-            "full": f"""Analyze this contract comprehensively. Return JSON with this exact structure:
-{{
-    "summary": "Brief executive summary (2-3 sentences)",
-    "contract_type": "Detected contract type",
-    "parties": ["List of parties identified"],
-    "key_dates": [{{"description": "...", "date": "...", "confidence": "high/medium/low"}}],
-    "key_clauses": [
-        {{
-            "name": "Clause name",
-            "content_summary": "What it says",
-            "risk_level": "low/medium/high/critical",
-            "location": "Where in document",
-            "concerns": ["Any issues"],
-            "confidence": "high/medium/low"
-        }}
-    ],
-    "risks": [
-        {{
-            "severity": "low/medium/high/critical",
-            "description": "Risk description",
-            "affected_clause": "Which clause",
-            "recommendation": "How to address",
-            "confidence": "high/medium/low"
-        }}
-    ],
-    "missing_elements": ["Standard elements not found"],
-    "compliance_status": {{
-        "overall": "compliant/needs_review/non_compliant",
-        "checks": {{"element": "status"}}
-    }},
-    "recommendations": ["Actionable recommendations"],
-    "overall_risk_score": 0.0-1.0,
-    "confidence_level": "high/medium/low"
-}}
-
-Contract Type Hint: {contract_type or 'Unknown'}
-
-DOCUMENT:
-{document_text[:50000]}""",
-
-            "risks": f"""Identify ALL risks in this contract. Return JSON:
-{{
-    "risks": [
-        {{
-            "severity": "low/medium/high/critical",
-            "category": "financial/legal/operational/compliance/reputational",
-            "description": "Detailed risk description",
-            "source_text": "Exact quote from document",
-            "location": "Section/paragraph reference",
-            "impact": "Potential consequences",
-            "likelihood": "low/medium/high",
-            "recommendation": "Mitigation suggestion",
-            "confidence": "high/medium/low"
-        }}
-    ],
-    "overall_risk_level": "low/medium/high/critical",
-    "risk_score": 0.0-1.0,
-    "priority_actions": ["Top 3 actions needed"]
-}}
-
-DOCUMENT:
-{document_text[:50000]}""",
-
-            "clauses": f"""Extract and analyze ALL clauses. Return JSON:
-{{
-    "clauses": [
-        {{
-            "name": "Standard clause name",
-            "category": "payment/termination/liability/confidentiality/ip/dispute/indemnification/warranty/force_majeure/other",
-            "content": "Full clause text",
-            "summary": "Plain language summary",
-            "is_standard": true/false,
-            "deviations": "How it differs from standard",
-            "risk_level": "low/medium/high/critical",
-            "negotiability": "non_negotiable/negotiable/highly_negotiable",
-            "related_clauses": ["Other related clauses"],
-            "confidence": "high/medium/low"
-        }}
-    ],
-    "clause_coverage": {{
-        "present": ["Standard clauses found"],
-        "missing": ["Expected but not found"],
-        "unusual": ["Non-standard clauses"]
-    }}
-}}
-
-DOCUMENT:
-{document_text[:50000]}""",
-
-            "summary": f"""Provide executive summary. Return JSON:
-{{
-    "title": "Contract title/name",
-    "type": "Contract type",
-    "parties": [{{"name": "...", "role": "..."}}],
-    "effective_date": "Date or null",
-    "term": "Duration/term",
-    "value": "Financial value if stated",
-    "purpose": "Main purpose in 1-2 sentences",
-    "key_obligations": [
-        {{"party": "...", "obligation": "..."}}
-    ],
-    "critical_dates": [{{"event": "...", "date": "..."}}],
-    "special_conditions": ["Notable conditions"],
-    "executive_summary": "3-5 sentence summary for executives",
-    "confidence": "high/medium/low"
-}}
-
-DOCUMENT:
-{document_text[:30000]}"""
-        }
-        
-        prompt = analysis_prompts.get(analysis_type, analysis_prompts["full"])
+        template = _ANALYSIS_TEMPLATES.get(analysis_type, _ANALYSIS_TEMPLATES["full"])
+        limit = _ANALYSIS_DOCUMENT_LIMITS.get(analysis_type, 50000)
+        prompt = template.format(
+            document=document_text[:limit],
+            contract_type=contract_type or "Unknown"
+        )
         
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
         
@@ -524,27 +671,19 @@ DOCUMENT:
             
             # Extract JSON from response
             try:
-                # Try to find JSON in the response
-                if "```json" in content:
-                    json_str = content.split("```json")[1].split("```")[0]
-                elif "```" in content:
-                    json_str = content.split("```")[1].split("```")[0]
-                else:
-                    json_str = content
-                
-                result = json.loads(json_str.strip())
+                result = orjson.loads(_extract_json(content))
                 result["model_used"] = response.get("model_used", "unknown")
                 result["analysis_type"] = analysis_type
                 return result
-                
-            except json.JSONDecodeError as e:
+            
+            except orjson.JSONDecodeError as e:
                 logger.error(f"Failed to parse analysis JSON: {str(e)}")
                 return {
                     "error": "Failed to parse analysis",
                     "raw_response": content,
                     "analysis_type": analysis_type
                 }
-                
+        
         except Exception as e:
             logger.error(f"Legal analysis error: {str(e)}")
             return {
@@ -553,5 +692,59 @@ DOCUMENT:
             }
 
 
+def _extract_json(text: str) -> str:
+    """
+    Return the first balanced {...} object in a model response.
+    
+    One scan with a depth counter that skips braces inside JSON strings, so
+    code fences, stray backticks or prose around the object don't matter.
+    Returns the input unchanged if there is no complete object.
+    """
+    start = text.find("{")
+    if start == -1:
+        return text
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text
+
+
+async def _iter_sse_data(response: httpx.Response) -> AsyncGenerator[bytes, None]:
+    """
+    Yield the payload of each "data: " line of a server-sent event stream.
+    
+    Works on raw bytes so lines are never decoded to str; the JSON parser
+    takes bytes directly.
+    """
+    buffer = b""
+    async for raw in response.aiter_bytes():
+        buffer += raw
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()  # Incomplete last line waits for more bytes
+        for line in lines:
+            if line.startswith(b"data: "):
+                yield line[6:].rstrip(b"\r")
+    if buffer.startswith(b"data: "):
+        yield buffer[6:].rstrip(b"\r")
+
+
 # Global OpenRouter client instance
 openrouter_client = OpenRouterClient()
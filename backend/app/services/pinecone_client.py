@@ -2,26 +2,67 @@
 Pinecone vector store client for document embeddings.
 Handles connection, indexing, and querying operations.
 """
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pinecone import Pinecone, ServerlessSpec
-from typing import List, Dict, Optional, Any
+from typing import Iterable, List, Dict, Optional, Any
 import logging
+import threading
 from app.core.config import settings
+from app.services.query_cache import query_cache
 
 logger = logging.getLogger(__name__)
 
+# Worker threads behind the index's HTTP client, so upsert batches sent
+# from different threads go out in parallel
+POOL_THREADS = 30
+
+# Embedding dimension of the index (OpenAI text-embedding-ada-002,
+# text-embedding-3-small)
+INDEX_DIMENSION = 1536
+
+# Most IDs Pinecone accepts in one delete request
+DELETE_BATCH_SIZE = 1000
+
+# Worker threads for deletes that run alongside an upsert (see
+# replace_document)
+BACKGROUND_THREADS = 4
+
 
 class PineconeClient:
     """Client for interacting with Pinecone vector database."""
     
     def __init__(self):
         """Initialize Pinecone client."""
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY, pool_threads=POOL_THREADS)
         self.index_name = settings.PINECONE_INDEX_NAME
         self.namespace = settings.PINECONE_NAMESPACE
         self.index = None
+        # Serverless and starter indexes reject delete-by-metadata-filter;
+        # detected once in connect()
+        self.supports_filtered_delete = False
+        self._executor = ThreadPoolExecutor(max_workers=BACKGROUND_THREADS, thread_name_prefix="pinecone")
+        self._connect_lock = threading.Lock()
         
     def connect(self):
-        """Connect to Pinecone index."""
+        """
+        Connect to Pinecone index.
+        
+        Idempotent: the startup event connects once and later calls reuse
+        the index handle. The lock keeps concurrent first calls (from
+        worker threads) from each listing, describing and opening the index.
+        """
+        if self.index:
+            return True
+        
+        with self._connect_lock:
+            if self.index:
+                return True
+            return self._connect()
+    
+    def _connect(self) -> bool:
+        """Open the index, creating it first if it does not exist."""
         try:
             # Check if index exists
             existing_indexes = self.pc.list_indexes()
@@ -31,14 +72,18 @@ class PineconeClient:
                 # Create index if it doesn't exist
                 self.pc.create_index(
                     name=self.index_name,
-                    dimension=1536,  # OpenAI embedding dimension (text-embedding-ada-002, text-embedding-3-small)
+                    dimension=INDEX_DIMENSION,
                     metric="cosine",
                     spec=ServerlessSpec(
                         cloud="aws",
                         region=settings.PINECONE_ENVIRONMENT
                     )
                 )
-                logger.info(f"Index {self.index_name} created successfully with 1536 dimensions")
+                logger.info(f"Index {self.index_name} created successfully with {INDEX_DIMENSION} dimensions")
+            
+            # Only pod-based indexes support deleting by metadata filter
+            description = self.pc.describe_index(self.index_name)
+            self.supports_filtered_delete = getattr(description.spec, "pod", None) is not None
             
             # Connect to index
             self.index = self.pc.Index(self.index_name)
@@ -49,38 +94,116 @@ class PineconeClient:
             logger.error(f"Pinecone connection error: {str(e)}")
             return False
     
+    def _ensure_connected(self):
+        """Connect lazily if the startup warmup didn't (or failed to)."""
+        if not self.index:
+            logger.warning("Pinecone index not connected at startup, connecting on first use")
+            self.connect()
+    
     def upsert_vectors(
         self,
-        vectors: List[Dict[str, Any]],
-        namespace: Optional[str] = None
+        vectors: Iterable[Dict[str, Any]],
+        namespace: Optional[str] = None,
+        batch_size: int = 100
     ) -> bool:
         """
         Upsert vectors to Pinecone.
         
+        Batches are sent in parallel on the client's thread pool
+        (POOL_THREADS); see bulk_upsert.
+        
         Args:
-            vectors: List of vector dictionaries with id, values, and metadata
+            vectors: Vector dictionaries with id, values, and metadata; any
+                iterable, so callers can stream them from a generator
             namespace: Optional namespace (defaults to configured namespace)
+            batch_size: Vectors per upsert request
             
         Returns:
-            True if successful, False otherwise
+            True if every batch succeeded, False otherwise
         """
-        if not self.index:
-            self.connect()
+        return self.bulk_upsert(vectors, namespace=namespace, batch_size=batch_size)
+    
+    def bulk_upsert(
+        self,
+        vectors: Iterable[Dict[str, Any]],
+        namespace: Optional[str] = None,
+        batch_size: int = 100,
+        max_in_flight: int = POOL_THREADS
+    ) -> bool:
+        """
+        Upsert vectors from an iterable (e.g. a generator) as they are produced.
         
-        try:
-            ns = namespace or self.namespace
-            
-            # Upsert in batches of 100
-            batch_size = 100
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                self.index.upsert(vectors=batch, namespace=ns)
+        Batches are sent on the client's thread pool while the next batch is
+        being produced; once max_in_flight batches are pending, the oldest is
+        awaited first. Memory is bounded by max_in_flight * batch_size vectors
+        rather than the whole input.
+        
+        Args:
+            vectors: Vector dictionaries with id, values, and metadata
+            namespace: Optional namespace (defaults to configured namespace)
+            batch_size: Vectors per upsert request
+            max_in_flight: Most upsert requests pending at once
             
-            logger.info(f"Upserted {len(vectors)} vectors to namespace '{ns}'")
-            return True
+        Returns:
+            True if every batch succeeded, False otherwise
+        """
+        ns = namespace or self.namespace
+        pending = deque()
+        batches = failed = upserted = 0
+        complete = True
+        
+        try:
+            it = iter(vectors)
+            batch = list(islice(it, batch_size))
+            # Nothing to send, so don't connect on a cold start either
+            if not batch:
+                return True
             
+            self._ensure_connected()
+            while batch:
+                if len(pending) >= max_in_flight:
+                    result, count = pending.popleft()
+                    if self._await_upsert(result):
+                        upserted += count
+                    else:
+                        failed += 1
+                pending.append((
+                    self.index.upsert(vectors=batch, namespace=ns, async_req=True),
+                    len(batch)
+                ))
+                batches += 1
+                batch = list(islice(it, batch_size))
         except Exception as e:
+            complete = False
             logger.error(f"Pinecone upsert error: {str(e)}")
+        
+        # Let already-sent batches land even if producing more failed
+        while pending:
+            result, count = pending.popleft()
+            if self._await_upsert(result):
+                upserted += count
+            else:
+                failed += 1
+        
+        # Even a partial upsert changes what queries return
+        query_cache.invalidate()
+        
+        if failed:
+            logger.error(f"{failed}/{batches} upsert batches failed in namespace '{ns}'")
+        if failed or not complete:
+            return False
+        
+        logger.info(f"Upserted {upserted} vectors to namespace '{ns}'")
+        return True
+    
+    @staticmethod
+    def _await_upsert(result) -> bool:
+        """Wait for an async upsert batch, logging its error if it failed."""
+        try:
+            result.get()
+            return True
+        except Exception as e:
+            logger.error(f"Pinecone upsert batch error: {str(e)}")
             return False
     
     def query_vectors(
@@ -104,28 +227,47 @@ class PineconeClient:
         Returns:
             List of matching vectors with scores and metadata
         """
-        if not self.index:
-            self.connect()
+        # Catch empty or wrong-sized vectors before a network round trip
+        if len(query_vector) != INDEX_DIMENSION:
+            logger.error(f"Query vector has {len(query_vector)} dimensions, expected {INDEX_DIMENSION}")
+            return []
+        
+        self._ensure_connected()
         
         try:
             ns = namespace or self.namespace
             
-            results = self.index.query(
-                vector=query_vector,
-                top_k=top_k,
-                filter=filter_dict,
-                namespace=ns,
-                include_metadata=include_metadata
-            )
-            
-            matches = []
-            for match in results.matches:
-                matches.append({
-                    "id": match.id,
-                    "score": match.score,
-                    "metadata": match.metadata if include_metadata else None
-                })
+            cache_scope = query_cache.scope(top_k, filter_dict, ns, include_metadata)
+            cached = query_cache.get(query_vector, cache_scope)
+            if cached is not None:
+                logger.info(f"Query served {len(cached)} cached results from namespace '{ns}'")
+                return cached
+            
+            query_kwargs = {
+                "vector": query_vector,
+                "top_k": top_k,
+                "namespace": ns,
+                "include_metadata": include_metadata
+            }
+            # Leave the filter out entirely rather than sending an empty one
+            if filter_dict:
+                query_kwargs["filter"] = filter_dict
+            
+            results = self.index.query(**query_kwargs)
             
+            if include_metadata:
+                matches = [
+                    {"id": m.id, "score": m.score, "metadata": m.metadata}
+                    for m in results.matches
+                ]
+            else:
+                # Keep the key so every match has the same shape
+                matches = [
+                    {"id": m.id, "score": m.score, "metadata": None}
+                    for m in results.matches
+                ]
+            
+            query_cache.put(query_vector, cache_scope, matches)
             logger.info(f"Query returned {len(matches)} results from namespace '{ns}'")
             return matches
             
@@ -141,6 +283,8 @@ class PineconeClient:
         """
         Delete vectors by IDs.
         
+        IDs are sent DELETE_BATCH_SIZE at a time, Pinecone's per-request limit.
+        
         Args:
             ids: List of vector IDs to delete
             namespace: Optional namespace
@@ -148,12 +292,19 @@ class PineconeClient:
         Returns:
             True if successful
         """
-        if not self.index:
-            self.connect()
+        if not ids:
+            return True
+        
+        self._ensure_connected()
         
         try:
             ns = namespace or self.namespace
-            self.index.delete(ids=ids, namespace=ns)
+            try:
+                for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                    self.index.delete(ids=ids[start:start + DELETE_BATCH_SIZE], namespace=ns)
+            finally:
+                # Even a partial delete changes what queries return
+                query_cache.invalidate()
             logger.info(f"Deleted {len(ids)} vectors from namespace '{ns}'")
             return True
             
@@ -161,10 +312,108 @@ class PineconeClient:
             logger.error(f"Pinecone delete error: {str(e)}")
             return False
     
+    def delete_by_filter(
+        self,
+        filter_dict: Dict,
+        namespace: Optional[str] = None
+    ) -> bool:
+        """
+        Delete all vectors matching a metadata filter.
+        
+        Args:
+            filter_dict: Metadata filter, e.g. {"file_id": {"$eq": "..."}}
+            namespace: Optional namespace
+            
+        Returns:
+            True if successful
+        """
+        self._ensure_connected()
+        
+        try:
+            ns = namespace or self.namespace
+            self.index.delete(filter=filter_dict, namespace=ns)
+            query_cache.invalidate()
+            logger.info(f"Deleted vectors matching {filter_dict} from namespace '{ns}'")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Pinecone delete error: {str(e)}")
+            return False
+    
+    def replace_document(
+        self,
+        file_id: str,
+        vectors: Iterable[Dict[str, Any]],
+        chunk_count: int,
+        previous_count: int = 0,
+        namespace: Optional[str] = None,
+        batch_size: int = 100
+    ) -> bool:
+        """
+        Replace every vector of a file with a new set.
+        
+        Vector IDs are "{file_id}_chunk_{index}", so new vectors overwrite the
+        old ones at the same index. The previous version's vectors at or past
+        the new chunk count are deleted concurrently with the upsert instead
+        of delete-then-upsert; the two ID sets are disjoint, so they can't
+        race. Previous indexes inside the new range that the new set skipped
+        (e.g. chunks whose embedding failed) are deleted once the upsert has
+        finished. A file indexed for the first time deletes nothing.
+        
+        Args:
+            file_id: File whose vectors are replaced
+            vectors: New vectors with id, values, and metadata; any iterable,
+                streamed through bulk_upsert
+            chunk_count: Number of chunks in the new version of the file
+            previous_count: Number of chunks the file was last indexed with
+                (0 if it never was)
+            namespace: Optional namespace
+            batch_size: Vectors per upsert request
+            
+        Returns:
+            True if both the upsert and the deletes succeeded
+        """
+        self._ensure_connected()
+        
+        delete_future = None
+        if previous_count > chunk_count:
+            if self.supports_filtered_delete:
+                stale_filter = {"file_id": {"$eq": file_id}, "chunk_index": {"$gte": chunk_count}}
+                delete_future = self._executor.submit(self.delete_by_filter, stale_filter, namespace)
+            else:
+                # Serverless indexes can't delete by filter
+                stale_ids = [f"{file_id}_chunk_{i}" for i in range(chunk_count, previous_count)]
+                delete_future = self._executor.submit(self.delete_vectors, stale_ids, namespace)
+        
+        upserted_ids = set()
+        
+        def tracked(vectors):
+            for vector in vectors:
+                upserted_ids.add(vector["id"])
+                yield vector
+        
+        upserted = self.bulk_upsert(tracked(vectors), namespace=namespace, batch_size=batch_size)
+        deleted = delete_future.result() if delete_future is not None else True
+        
+        # Only after a complete upsert, so a failed run never deletes the
+        # previous version of chunks it didn't get to
+        if upserted and upserted_ids:
+            skipped_ids = [
+                vector_id
+                for vector_id in (f"{file_id}_chunk_{i}" for i in range(min(chunk_count, previous_count)))
+                if vector_id not in upserted_ids
+            ]
+            if skipped_ids:
+                deleted = self.delete_vectors(skipped_ids, namespace) and deleted
+        
+        # A query between the two operations may have cached a mix of old
+        # and new chunks
+        query_cache.invalidate()
+        return upserted and deleted
+    
     def get_index_stats(self) -> Dict:
         """Get index statistics."""
-        if not self.index:
-            self.connect()
+        self._ensure_connected()
         
         try:
             stats = self.index.describe_index_stats()
@@ -175,6 +424,10 @@ class PineconeClient:
         except Exception as e:
             logger.error(f"Error getting index stats: {str(e)}")
             return {}
+    
+    def close(self):
+        """Shut down the background executor."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
 
 # Global Pinecone client instance
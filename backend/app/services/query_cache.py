@@ -0,0 +1,212 @@
+"""
+In-process cache for Pinecone query results.
+Repeated and near-identical queries are answered locally instead of
+paying a Pinecone round trip.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import threading
+import time
+import numpy as np
+import orjson
+from app.core.config import settings
+from app.services.index_generation import IndexGeneration, index_generation
+
+
+class QueryCache:
+    """
+    LRU cache of query matches with TTL expiry and a semantic fallback.
+    
+    Entries are keyed by the int8-quantized query direction plus everything
+    else that shapes the result (top_k, filter, namespace, metadata flag).
+    On an exact miss, a cached query with the same shape whose vector has
+    cosine similarity of at least similarity_threshold is served instead.
+    Only the int8 vectors are kept for that check (1.5 KB each for 1536
+    dimensions instead of 6 KB).
+    
+    Every scope carries the shared index generation, read before Pinecone
+    is queried: once any process changes the index, results fetched under
+    the old generation are never served again, in this or any other worker.
+    """
+    
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: int,
+        similarity_threshold: float,
+        generation: IndexGeneration
+    ):
+        """
+        Initialize query cache.
+        
+        Args:
+            max_size: Maximum number of cached queries; 0 disables the cache
+            ttl_seconds: Maximum age of a cached result
+            similarity_threshold: Cosine similarity for a semantic hit
+            generation: Cross-process index change counter
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.generation = generation
+        self._lock = threading.RLock()
+        # Generation the stored entries belong to
+        self._generation: Any = None
+        # key -> (expires_at, scope, int8 query vector, its norm, matches)
+        self._entries: "OrderedDict[Tuple, Tuple[float, Tuple, np.ndarray, float, List[Dict]]]" = OrderedDict()
+    
+    def scope(
+        self,
+        top_k: int,
+        filter_dict: Optional[Dict],
+        namespace: str,
+        include_metadata: bool
+    ) -> Optional[Tuple]:
+        """
+        Non-vector part of a cache key, or None when the index generation
+        can't be read (get and put then bypass the cache).
+        """
+        if self.max_size <= 0:
+            return None
+        generation = self.generation.current()
+        if generation is None:
+            return None
+        filter_key = orjson.dumps(filter_dict, option=orjson.OPT_SORT_KEYS) if filter_dict else b""
+        return (generation, top_k, filter_key, namespace, include_metadata)
+    
+    @staticmethod
+    def _quantize(query_vector: List[float]) -> np.ndarray:
+        """
+        Scale a query vector so its largest component is +-127 and round to
+        int8. Scaling doesn't change cosine similarity, so vectors pointing
+        the same way share a key.
+        """
+        vector = np.asarray(query_vector, dtype=np.float32)
+        peak = np.abs(vector).max() if vector.size else 0.0
+        if not peak:
+            return np.zeros(vector.shape, dtype=np.int8)
+        return np.round(vector * (127.0 / peak)).astype(np.int8)
+    
+    @staticmethod
+    def _vector_key(quantized: np.ndarray) -> bytes:
+        """Digest of an int8-quantized query vector."""
+        return hashlib.blake2b(quantized.tobytes(), digest_size=16).digest()
+    
+    def get(self, query_vector: List[float], scope: Optional[Tuple]) -> Optional[List[Dict]]:
+        """
+        Look up cached matches for a query.
+        
+        Args:
+            query_vector: Query embedding vector
+            scope: Result shape from scope()
+        
+        Returns:
+            Copies of the cached matches, or None on a miss
+        """
+        if scope is None:
+            return None
+        
+        quantized = self._quantize(query_vector)
+        key = (self._vector_key(quantized), scope)
+        now = time.monotonic()
+        
+        with self._lock:
+            if self._generation is None or scope[0] > self._generation:
+                # The index changed (possibly in another process): nothing
+                # stored so far can be served again
+                self._entries.clear()
+                self._generation = scope[0]
+            elif scope[0] < self._generation:
+                # Read before a change another thread has already seen
+                return None
+            
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            
+            if entry is None:
+                key = self._nearest(quantized, scope, now)
+                if key is None:
+                    return None
+                entry = self._entries[key]
+            
+            self._entries.move_to_end(key)
+            # Callers rescore matches in place, so hand out copies
+            return [dict(match) for match in entry[4]]
+    
+    def _nearest(self, quantized: np.ndarray, scope: Tuple, now: float) -> Optional[Tuple]:
+        """Key of the most similar live cached query with the same scope."""
+        norm = np.linalg.norm(quantized.astype(np.float32))
+        if not norm:
+            return None
+        
+        keys = []
+        vectors = []
+        norms = []
+        for key, (expires_at, entry_scope, entry_vector, entry_norm, _) in self._entries.items():
+            if entry_scope == scope and expires_at > now and entry_norm:
+                keys.append(key)
+                vectors.append(entry_vector)
+                norms.append(entry_norm)
+        if not keys:
+            return None
+        
+        # Integer dot products can't overflow int32 (1536 * 127^2 < 2^31)
+        dots = np.stack(vectors).astype(np.int32) @ quantized.astype(np.int32)
+        similarities = dots / (np.asarray(norms) * norm)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return keys[best]
+        return None
+    
+    def put(self, query_vector: List[float], scope: Optional[Tuple], matches: List[Dict]):
+        """
+        Store matches for a query.
+        
+        Args:
+            query_vector: Query embedding vector
+            scope: Result shape from scope(), taken before the query was sent
+            matches: Query results to cache
+        """
+        if scope is None:
+            return
+        
+        quantized = self._quantize(query_vector)
+        key = (self._vector_key(quantized), scope)
+        entry = (
+            time.monotonic() + self.ttl_seconds,
+            scope,
+            quantized,
+            float(np.linalg.norm(quantized.astype(np.float32))),
+            [dict(match) for match in matches]
+        )
+        
+        with self._lock:
+            if scope[0] != self._generation:
+                # Fetched under a generation that is no longer current (or
+                # not yet seen by get); don't keep it
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self):
+        """
+        Drop every cached result (the index contents changed) here and, via
+        the shared generation, in every other process.
+        """
+        with self._lock:
+            self._entries.clear()
+        self.generation.bump()
+
+
+# Global query cache instance
+query_cache = QueryCache(
+    max_size=settings.QUERY_CACHE_MAX_SIZE,
+    ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+    similarity_threshold=settings.QUERY_CACHE_SIMILARITY,
+    generation=index_generation
+)
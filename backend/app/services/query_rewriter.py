@@ -2,12 +2,54 @@
 Query rewriting and intent detection for legal document queries.
 Enhances queries to improve retrieval accuracy.
 """
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+import functools
 import re
 import logging
 
+try:
+    import ahocorasick
+except ImportError:  # Optional; detect_intent falls back to substring checks
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
+# Distinct queries whose rewrites are kept in memory
+REWRITE_CACHE_SIZE = 4096
+
+# Common question shapes and the retrieval terms they imply, compiled once;
+# the first matching pattern wins
+_QUESTION_PATTERNS = [
+    (re.compile(pattern, re.IGNORECASE), addition)
+    for pattern, addition in (
+        (r"what (is|are) (the )?(payment|fee|cost)", "payment terms compensation fee"),
+        (r"how (much|many)", "amount quantity number"),
+        (r"when (is|are|can|do)", "time date schedule deadline"),
+        (r"who (is|are)", "party person entity responsible"),
+        (r"where (is|are)", "location place section"),
+    )
+]
+
+# Every question pattern contains one of these, so queries without them
+# skip the regex scans
+_QUESTION_HINTS = ("wh", "how")
+
+# Words ignored when extracting key terms
+_STOP_WORDS = frozenset({
+    "the", "a", "an", "is", "are", "was", "were", "be", "been", "being",
+    "have", "has", "had", "do", "does", "did", "will", "would", "should",
+    "could", "may", "might", "can", "this", "that", "these", "those",
+    "what", "where", "when", "who", "why", "how", "which"
+})
+
+_WORD_RE = re.compile(r'\b\w+\b')
+
+# Context terms appended to interrogative queries, in order
+_LEGAL_CONTEXT = ("clause", "provision", "section", "term", "agreement")
+
+# Substrings that mark a query as a question for _LEGAL_CONTEXT
+_INTERROGATIVES = ("what", "where", "how", "when")
+
 
 class QueryRewriter:
     """
@@ -61,12 +103,71 @@ class QueryRewriter:
     
     # Query expansion terms
     EXPANSION_TERMS = {
-        "payment": ["compensation", "remuneration", "fee", "invoice"],
-        "termination": ["cancellation", "expiration", "ending"],
-        "liability": ["responsibility", "accountability"],
-        "scope": ["work", "services", "deliverables"],
+        "payment": ("compensation", "remuneration", "fee", "invoice"),
+        "termination": ("cancellation", "expiration", "ending"),
+        "liability": ("responsibility", "accountability"),
+        "scope": ("work", "services", "deliverables"),
     }
     
+    def __init__(self):
+        """Initialize query rewriter."""
+        # INTENT_PATTERNS flattened into tuples aligned by intent index
+        self._intent_names = tuple(self.INTENT_PATTERNS)
+        self._intent_keywords = tuple(tuple(p["keywords"]) for p in self.INTENT_PATTERNS.values())
+        self._intent_questions = tuple(tuple(p["questions"]) for p in self.INTENT_PATTERNS.values())
+        self._intent_automaton = self._build_intent_automaton()
+        # Per instance; lru_cache on the method would pin rewriters in a class-level cache
+        self._rewrite_cached = functools.lru_cache(maxsize=REWRITE_CACHE_SIZE)(self._rewrite)
+    
+    def _build_intent_automaton(self):
+        """
+        Build one Aho-Corasick automaton over every intent keyword and
+        question phrase, so a query is scanned once instead of once per term.
+        
+        Each term maps to the (intent index, is_question) slots it counts toward;
+        a term listed twice counts twice, as with the substring checks.
+        Returns None when pyahocorasick is not installed.
+        """
+        if ahocorasick is None:
+            return None
+        
+        slots: Dict[str, List[Tuple[int, bool]]] = {}
+        for i, (keywords, questions) in enumerate(zip(self._intent_keywords, self._intent_questions)):
+            for kw in keywords:
+                slots.setdefault(kw, []).append((i, False))
+            for q in questions:
+                slots.setdefault(q, []).append((i, True))
+        
+        automaton = ahocorasick.Automaton()
+        for term, term_slots in slots.items():
+            automaton.add_word(term, (term, tuple(term_slots)))
+        automaton.make_automaton()
+        return automaton
+    
+    def _count_intent_matches(self, query_lower: str) -> Iterator[Tuple[str, int, int]]:
+        """
+        Yield (intent, keyword_matches, question_matches) in INTENT_PATTERNS
+        order. Without the automaton each intent is only scanned when the
+        caller asks for it.
+        """
+        if self._intent_automaton is None:
+            for intent, keywords, questions in zip(self._intent_names, self._intent_keywords, self._intent_questions):
+                yield (
+                    intent,
+                    sum(1 for kw in keywords if kw in query_lower),
+                    sum(1 for q in questions if q in query_lower)
+                )
+            return
+        
+        # counts[is_question][intent index]
+        counts = ([0] * len(self._intent_names), [0] * len(self._intent_names))
+        # A term counts once however often it occurs
+        matched = {value for _, value in self._intent_automaton.iter(query_lower)}
+        for _, term_slots in matched:
+            for i, is_question in term_slots:
+                counts[is_question][i] += 1
+        yield from zip(self._intent_names, *counts)
+    
     def detect_intent(self, query: str) -> Tuple[Optional[str], float]:
         """
         Detect the legal intent of a query.
@@ -74,19 +175,20 @@ class QueryRewriter:
         Returns:
             Tuple of (intent_type, confidence)
         """
-        query_lower = query.lower()
+        return self._detect_intent_lower(query.lower())
+    
+    def _detect_intent_lower(self, query_lower: str) -> Tuple[Optional[str], float]:
+        """detect_intent for an already lowercased query."""
         best_intent = None
         best_score = 0.0
         
-        for intent, patterns in self.INTENT_PATTERNS.items():
+        for intent, keyword_matches, question_matches in self._count_intent_matches(query_lower):
             score = 0.0
             
-            # Check keyword matches
-            keyword_matches = sum(1 for kw in patterns["keywords"] if kw in query_lower)
+            # Keyword matches
             score += keyword_matches * 0.3
             
-            # Check question pattern matches
-            question_matches = sum(1 for q in patterns["questions"] if q in query_lower)
+            # Question pattern matches
             score += question_matches * 0.5
             
             # Normalize score
@@ -95,6 +197,9 @@ class QueryRewriter:
             if score > best_score:
                 best_score = score
                 best_intent = intent
+                # Scores are capped at 1.0, so no later intent can win
+                if best_score >= 1.0:
+                    break
         
         return (best_intent, best_score) if best_score > 0.3 else (None, 0.0)
     
@@ -109,11 +214,15 @@ class QueryRewriter:
         Returns:
             Expanded query
         """
+        query_lower = query.lower()
         if not intent:
-            intent, _ = self.detect_intent(query)
+            intent, _ = self._detect_intent_lower(query_lower)
         
+        return self._expand_query(query, query_lower, intent)
+    
+    def _expand_query(self, query: str, query_lower: str, intent: Optional[str]) -> str:
+        """expand_query for a known intent and lowercased query."""
         expanded_terms = []
-        query_lower = query.lower()
         
         # Add expansion terms based on intent
         if intent and intent in self.EXPANSION_TERMS:
@@ -122,10 +231,10 @@ class QueryRewriter:
                     expanded_terms.append(term)
         
         # Add legal context terms
-        legal_context = ["clause", "provision", "section", "term", "agreement"]
-        for term in legal_context:
-            if term not in query_lower and any(legal_word in query_lower for legal_word in ["what", "where", "how", "when"]):
-                expanded_terms.append(term)
+        if any(legal_word in query_lower for legal_word in _INTERROGATIVES):
+            for term in _LEGAL_CONTEXT:
+                if term not in query_lower:
+                    expanded_terms.append(term)
         
         if expanded_terms:
             expanded_query = f"{query} {' '.join(expanded_terms)}"
@@ -145,14 +254,12 @@ class QueryRewriter:
         Returns:
             Dictionary with original, expanded, and rewritten queries
         """
-        # Detect intent
-        intent, confidence = self.detect_intent(query)
-        
-        # Expand query
-        expanded_query = self.expand_query(query, intent)
-        
-        # Rewrite for better retrieval
-        rewritten_query = self._rewrite_for_retrieval(query, intent, chat_history)
+        # Rewrites are deterministic in the query; only history-free calls
+        # are cached so history-aware rewriting can't be served stale
+        if chat_history:
+            expanded_query, rewritten_query, intent, confidence = self._rewrite(query, chat_history)
+        else:
+            expanded_query, rewritten_query, intent, confidence = self._rewrite_cached(query)
         
         return {
             "original": query,
@@ -162,28 +269,46 @@ class QueryRewriter:
             "intent_confidence": confidence
         }
     
-    def _rewrite_for_retrieval(self, query: str, intent: Optional[str], chat_history: Optional[List[Dict]]) -> str:
+    def _rewrite(
+        self,
+        query: str,
+        chat_history: Optional[List[Dict]] = None
+    ) -> Tuple[str, str, Optional[str], float]:
+        """Compute (expanded, rewritten, intent, confidence) for a query."""
+        # Lowercase once for every step
+        query_lower = query.lower()
+        
+        # Detect intent
+        intent, confidence = self._detect_intent_lower(query_lower)
+        
+        # Expand query
+        expanded_query = self._expand_query(query, query_lower, intent)
+        
+        # Rewrite for better retrieval
+        rewritten_query = self._rewrite_for_retrieval(query, query_lower, intent, chat_history)
+        
+        return expanded_query, rewritten_query, intent, confidence
+    
+    def _rewrite_for_retrieval(
+        self,
+        query: str,
+        query_lower: str,
+        intent: Optional[str],
+        chat_history: Optional[List[Dict]]
+    ) -> str:
         """Rewrite query specifically for vector retrieval."""
         # Handle common question patterns
-        question_patterns = {
-            r"what (is|are) (the )?(payment|fee|cost)": "payment terms compensation fee",
-            r"how (much|many)": "amount quantity number",
-            r"when (is|are|can|do)": "time date schedule deadline",
-            r"who (is|are)": "party person entity responsible",
-            r"where (is|are)": "location place section",
-        }
-        
         rewritten = query
-        for pattern, addition in question_patterns.items():
-            if re.search(pattern, query, re.IGNORECASE):
-                rewritten = f"{query} {addition}"
-                break
+        if any(hint in query_lower for hint in _QUESTION_HINTS):
+            for pattern, addition in _QUESTION_PATTERNS:
+                if pattern.search(query):
+                    rewritten = f"{query} {addition}"
+                    break
         
         # Add intent-specific terms
         if intent:
             intent_keywords = self.INTENT_PATTERNS[intent]["keywords"]
             # Add 1-2 most relevant keywords if not already present
-            query_lower = query.lower()
             for keyword in intent_keywords[:2]:
                 if keyword not in query_lower:
                     rewritten = f"{rewritten} {keyword}"
@@ -193,17 +318,11 @@ class QueryRewriter:
     
     def extract_key_terms(self, query: str) -> List[str]:
         """Extract key terms from query for keyword matching."""
-        # Remove common stop words
-        stop_words = {"the", "a", "an", "is", "are", "was", "were", "be", "been", "being",
-                     "have", "has", "had", "do", "does", "did", "will", "would", "should",
-                     "could", "may", "might", "can", "this", "that", "these", "those",
-                     "what", "where", "when", "who", "why", "how", "which"}
-        
         # Extract words
-        words = re.findall(r'\b\w+\b', query.lower())
+        words = _WORD_RE.findall(query.lower())
         
         # Filter stop words and short words
-        key_terms = [w for w in words if w not in stop_words and len(w) > 2]
+        key_terms = [w for w in words if w not in _STOP_WORDS and len(w) > 2]
         
         return key_terms
 
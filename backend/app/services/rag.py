@@ -3,17 +3,81 @@ Enhanced RAG (Retrieval-Augmented Generation) service.
 Combines vector search with LLM generation for context-aware, legally accurate responses.
 Features: Streaming, follow-up suggestions, clause extraction, risk highlighting.
 """
-from typing import List, Dict, Optional, Any, AsyncGenerator
+from bisect import bisect_right
+from collections import OrderedDict
+from operator import itemgetter
+from statistics import fmean
+from typing import List, Dict, Optional, Any, AsyncGenerator, Tuple
+import asyncio
 import logging
 import json
 import re
 import time
-from app.services.pinecone_client import pinecone_client
+import numpy as np
+from app.services.pinecone_client import pinecone_client, INDEX_DIMENSION
 from app.services.openrouter import openrouter_client
 from app.services.embedding import embedding_service
+from app.services.embedding_batch import embedding_batcher
 
 logger = logging.getLogger(__name__)
 
+# Outermost [...] in a model reply that ignored the JSON object format
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+# Recent query embeddings kept in memory, so a repeated question skips the
+# embedding call (and the persistent cache lookup behind it)
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Answer confidence by average chunk score: below 0.70 is low, from 0.70
+# medium, from 0.85 high
+CONFIDENCE_THRESHOLDS = (0.70, 0.85)
+CONFIDENCE_LEVELS = ("low", "medium", "high")
+
+# System prompts for grounded answers; the formatted context is appended
+ANSWER_SYSTEM_PROMPT = """You are an expert legal document analyst. Your responses must be:
+
+CRITICAL RULES - FOLLOW EXACTLY:
+1. ONLY use information explicitly present in the provided context documents
+2. ALWAYS cite sources using [Source X] format for every factual claim
+3. If information is NOT in the context, say: "This information is not present in the provided documents."
+4. NEVER assume, infer, or make up information
+5. Quote relevant text when helpful (use "quotation marks")
+6. If confidence is low, explicitly state: "Note: This interpretation has limited context support."
+7. Use precise legal language appropriate for the document type
+
+RESPONSE FORMAT:
+- Start with a direct answer to the question
+- Support with specific citations [Source X]
+- Highlight any ambiguities or areas needing clarification
+- End with any relevant caveats
+
+Context Documents:
+"""
+
+STREAM_SYSTEM_PROMPT = """You are an expert legal document analyst. Your responses must be:
+
+CRITICAL RULES:
+1. ONLY use information explicitly present in the context documents
+2. ALWAYS cite sources using [Source X] format for every claim
+3. If information is NOT in the context, say: "This information is not present in the provided documents."
+4. NEVER assume or make up information
+5. Quote relevant text when helpful
+
+Context Documents:
+"""
+
+# Terms that earn a rerank boost when both the query and a chunk contain one
+_LEGAL_TERMS = ("clause", "section", "article", "paragraph", "provision", "term")
+
+# Most chunk text sent to the model as context (~3K tokens); chunks past
+# the budget are left out
+CONTEXT_CHAR_BUDGET = 12_000
+
+# Source text returned with an answer by default: text is cut to what
+# SourceCitation shows, text_preview to a short snippet
+SOURCE_TEXT_CHARS = 300
+SOURCE_PREVIEW_CHARS = 200
+
 
 class EnhancedRAGService:
     """Service for RAG-powered question answering with legal focus."""
@@ -52,11 +116,41 @@ class EnhancedRAGService:
         ]
     }
     
+    # Clause patterns compiled once; IGNORECASE replaces lowercasing the text
+    _CLAUSE_RES = {
+        clause_type: re.compile(pattern, re.IGNORECASE)
+        for clause_type, pattern in CLAUSE_PATTERNS.items()
+    }
+    
     def __init__(self):
         """Initialize enhanced RAG service."""
         self.pinecone = pinecone_client
         self.llm = openrouter_client
         self.embedder = embedding_service
+        self._query_embeddings: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        # (severity, compiled pattern, recommendation) per risk pattern, so
+        # matches don't look up their recommendation one by one
+        self._risk_rules = [
+            (severity, re.compile(pattern, re.IGNORECASE), self._get_risk_recommendation(pattern))
+            for severity, patterns in self.RISK_PATTERNS.items()
+            for pattern in patterns
+        ]
+    
+    async def _embed_query(self, query: str) -> Optional[List[float]]:
+        """Embed a query, serving recent repeats from an in-memory LRU."""
+        # The embedding client strips the text too, so this is the same input
+        key = query.strip()
+        cached = self._query_embeddings.get(key)
+        if cached is not None:
+            self._query_embeddings.move_to_end(key)
+            return list(cached)
+        
+        embedding = await embedding_batcher.embed(query)
+        if embedding:
+            self._query_embeddings[key] = tuple(embedding)
+            if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        return embedding
     
     async def retrieve_context(
         self,
@@ -64,7 +158,8 @@ class EnhancedRAGService:
         file_ids: Optional[List[str]] = None,
         top_k: int = 10,
         min_score: float = 0.4,  # Lowered from 0.65 to 0.4 for better retrieval
-        rerank: bool = True
+        rerank: bool = True,
+        allow_unfiltered_fallback: bool = False
     ) -> List[Dict]:
         """
         Retrieve relevant context chunks with reranking.
@@ -75,6 +170,8 @@ class EnhancedRAGService:
             top_k: Number of chunks to retrieve
             min_score: Minimum similarity score threshold (lowered to 0.4 for better retrieval)
             rerank: Whether to rerank results for relevance
+            allow_unfiltered_fallback: If the file filter matches nothing, search
+                all documents instead of returning no chunks
             
         Returns:
             List of relevant chunks with metadata
@@ -82,7 +179,7 @@ class EnhancedRAGService:
         logger.info(f"Retrieving context for query: '{query[:100]}...' (file_ids={file_ids}, top_k={top_k}, min_score={min_score})")
         
         # Generate embedding for query
-        query_embedding = await self.embedder.generate_embedding(query)
+        query_embedding = await self._embed_query(query)
         if not query_embedding:
             logger.error("Failed to generate query embedding")
             return []
@@ -90,15 +187,18 @@ class EnhancedRAGService:
         logger.info(f"Query embedding generated: dimension={len(query_embedding)}")
         
         # Verify embedding dimension (should be 1536 for text-embedding-3-small)
-        if len(query_embedding) != 1536:
-            logger.warning(f"Query embedding has unexpected dimension: {len(query_embedding)} (expected 1536)")
-            if len(query_embedding) > 1536:
-                query_embedding = query_embedding[:1536]
-                logger.warning("Truncated query embedding to 1536 dimensions")
-            elif len(query_embedding) < 1536:
-                # Pad with zeros
-                query_embedding = query_embedding + [0.0] * (1536 - len(query_embedding))
-                logger.warning("Padded query embedding to 1536 dimensions")
+        if len(query_embedding) != INDEX_DIMENSION:
+            logger.warning(f"Query embedding has unexpected dimension: {len(query_embedding)} (expected {INDEX_DIMENSION})")
+            vector = np.zeros(INDEX_DIMENSION, dtype=np.float32)
+            width = min(len(query_embedding), INDEX_DIMENSION)
+            vector[:width] = query_embedding[:width]
+            # Truncation changes the norm; restore unit length so the query
+            # still compares like a normal embedding
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector /= norm
+            query_embedding = vector.tolist()
+            logger.warning(f"Resized query embedding to {INDEX_DIMENSION} dimensions and renormalized it")
         
         # Build filter for specific files
         # Pinecone filter syntax: for multiple values, use $in operator
@@ -120,7 +220,9 @@ class EnhancedRAGService:
         initial_k = top_k * 2 if rerank else top_k
         logger.info(f"Querying Pinecone with top_k={initial_k}, filter={filter_dict}")
         
-        results = self.pinecone.query_vectors(
+        # The Pinecone SDK blocks; keep it off the event loop
+        results = await asyncio.to_thread(
+            self.pinecone.query_vectors,
             query_vector=query_embedding,
             top_k=initial_k,
             filter_dict=filter_dict
@@ -128,10 +230,16 @@ class EnhancedRAGService:
         
         logger.info(f"Pinecone returned {len(results)} results (before filtering by min_score)")
         
-        # If no results, try without filter (in case filter syntax is wrong)
+        # The selected files have no matching chunks; searching everything
+        # would answer from documents the user didn't pick, so only do it
+        # when asked
         if not results and filter_dict:
+            if not allow_unfiltered_fallback:
+                logger.warning(f"No results in the selected files: {file_ids}")
+                return []
             logger.warning("No results with filter, trying without filter...")
-            results = self.pinecone.query_vectors(
+            results = await asyncio.to_thread(
+                self.pinecone.query_vectors,
                 query_vector=query_embedding,
                 top_k=initial_k,
                 filter_dict=None
@@ -139,41 +247,29 @@ class EnhancedRAGService:
             logger.info(f"Query without filter returned {len(results)} results")
         
         # Filter by minimum score (lowered threshold for better retrieval)
-        relevant_chunks = []
-        for result in results:
-            score = result["score"]
-            if score >= min_score:
-                chunk = {
-                    "text": result["metadata"].get("text", ""),
-                    "score": score,
-                    "file_id": result["metadata"].get("file_id"),
-                    "filename": result["metadata"].get("filename"),
-                    "page": result["metadata"].get("page"),
-                    "chunk_index": result["metadata"].get("chunk_index")
-                }
-                relevant_chunks.append(chunk)
-            else:
-                logger.debug(f"Chunk filtered out: score={score:.3f} < min_score={min_score}")
-        
-        logger.info(f"After filtering: {len(relevant_chunks)} chunks with score >= {min_score}")
+        scores = np.fromiter((r["score"] for r in results), dtype=np.float64, count=len(results))
+        keep = scores >= min_score
+        logger.info(f"After filtering: {int(keep.sum())} chunks with score >= {min_score}")
         
         # If still no results, try with even lower threshold (0.3) for general queries
-        if not relevant_chunks and results:
+        if results and not keep.any():
             logger.warning(f"No chunks passed min_score={min_score}, trying with lower threshold (0.3)...")
-            fallback_min_score = 0.3
-            for result in results:
-                score = result["score"]
-                if score >= fallback_min_score:
-                    chunk = {
-                        "text": result["metadata"].get("text", ""),
-                        "score": score,
-                        "file_id": result["metadata"].get("file_id"),
-                        "filename": result["metadata"].get("filename"),
-                        "page": result["metadata"].get("page"),
-                        "chunk_index": result["metadata"].get("chunk_index")
-                    }
-                    relevant_chunks.append(chunk)
-            logger.info(f"Fallback threshold returned {len(relevant_chunks)} chunks")
+            keep = scores >= 0.3
+            logger.info(f"Fallback threshold returned {int(keep.sum())} chunks")
+        
+        # Build chunk dicts only for the results that passed
+        relevant_chunks = [
+            {
+                "text": metadata.get("text", ""),
+                "score": result["score"],
+                "file_id": metadata.get("file_id"),
+                "filename": metadata.get("filename"),
+                "page": metadata.get("page"),
+                "chunk_index": metadata.get("chunk_index")
+            }
+            for result in (results[i] for i in np.flatnonzero(keep).tolist())
+            if (metadata := result["metadata"]) is not None
+        ]
         
         # Rerank by extracting key terms and boosting relevant chunks
         if rerank and relevant_chunks:
@@ -195,7 +291,11 @@ class EnhancedRAGService:
     
     def _rerank_chunks(self, query: str, chunks: List[Dict]) -> List[Dict]:
         """Simple keyword-based reranking."""
-        query_terms = set(query.lower().split())
+        query_lower = query.lower()
+        query_terms = set(query_lower.split())
+        
+        # Whether the query mentions legal terms doesn't depend on the chunk
+        legal_query = any(term in query_lower for term in _LEGAL_TERMS)
         
         for chunk in chunks:
             text_lower = chunk["text"].lower()
@@ -205,55 +305,55 @@ class EnhancedRAGService:
             boost = match_count * 0.05
             
             # Additional boost for legal terms if query contains them
-            legal_terms = ["clause", "section", "article", "paragraph", "provision", "term"]
-            if any(term in query.lower() for term in legal_terms):
-                if any(term in text_lower for term in legal_terms):
-                    boost += 0.1
+            if legal_query and any(term in text_lower for term in _LEGAL_TERMS):
+                boost += 0.1
             
             chunk["reranked_score"] = min(1.0, chunk["score"] + boost)
         
-        return sorted(chunks, key=lambda x: x.get("reranked_score", x["score"]), reverse=True)
+        # Every chunk has a reranked_score by now
+        return sorted(chunks, key=itemgetter("reranked_score"), reverse=True)
     
     def _extract_clauses(self, text: str) -> List[Dict]:
         """Extract legal clauses from text."""
         clauses = []
-        text_lower = text.lower()
-        
-        for clause_type, pattern in self.CLAUSE_PATTERNS.items():
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                # Find the sentence containing the clause
-                sentences = text.split(".")
-                for sentence in sentences:
-                    if re.search(pattern, sentence, re.IGNORECASE):
-                        clauses.append({
-                            "type": clause_type,
-                            "text": sentence.strip()[:200],
-                            "confidence": "high" if len(re.findall(pattern, sentence, re.IGNORECASE)) > 1 else "medium"
-                        })
-                        break
+        
+        for clause_type, pattern in self._CLAUSE_RES.items():
+            match = pattern.search(text)
+            if match:
+                # The first match lies in the first sentence containing the
+                # clause (the patterns never span a '.'), so find that
+                # sentence's bounds instead of splitting the whole text
+                start = text.rfind(".", 0, match.start()) + 1
+                end = text.find(".", match.end())
+                if end == -1:
+                    end = len(text)
+                # High confidence when the sentence has a second match
+                clauses.append({
+                    "type": clause_type,
+                    "text": text[start:end].strip()[:200],
+                    "confidence": "high" if pattern.search(text, match.end(), end) else "medium"
+                })
         
         return clauses
     
     def _highlight_risks(self, text: str) -> List[Dict]:
         """Identify potential risks in text."""
         risks = []
-        text_lower = text.lower()
-        
-        for severity, patterns in self.RISK_PATTERNS.items():
-            for pattern in patterns:
-                matches = re.finditer(pattern, text_lower, re.IGNORECASE)
-                for match in matches:
-                    # Get surrounding context
-                    start = max(0, match.start() - 50)
-                    end = min(len(text), match.end() + 50)
-                    context = text[start:end]
-                    
-                    risks.append({
-                        "severity": severity,
-                        "matched_text": match.group(),
-                        "context": f"...{context}...",
-                        "recommendation": self._get_risk_recommendation(pattern)
-                    })
+        
+        for severity, pattern, recommendation in self._risk_rules:
+            for match in pattern.finditer(text):
+                # Get surrounding context
+                start = max(0, match.start() - 50)
+                end = min(len(text), match.end() + 50)
+                context = text[start:end]
+                
+                risks.append({
+                    "severity": severity,
+                    # Reported lowercase, as when matching on lowered text
+                    "matched_text": match.group().lower(),
+                    "context": f"...{context}...",
+                    "recommendation": recommendation
+                })
         
         return risks
     
@@ -274,6 +374,63 @@ class EnhancedRAGService:
                 return rec
         return "Review with legal counsel"
     
+    @staticmethod
+    def _context_summary(chunks: List[Dict], limit: int) -> str:
+        """First limit characters of the space-joined chunk texts, joining only as many chunks as needed."""
+        parts = []
+        size = -1  # No separator before the first text
+        for chunk in chunks:
+            parts.append(chunk["text"])
+            size += len(chunk["text"]) + 1
+            if size >= limit:
+                break
+        return " ".join(parts)[:limit]
+    
+    @staticmethod
+    def _preview_sources(chunks: List[Dict]) -> List[Dict]:
+        """
+        Chunks for the response with text cut to SOURCE_TEXT_CHARS and a
+        SOURCE_PREVIEW_CHARS text_preview.
+        
+        text stays for consumers that read src["text"] (e.g. SourceCitation
+        in the chat API).
+        """
+        return [
+            {
+                **chunk,
+                "text": chunk["text"][:SOURCE_TEXT_CHARS],
+                "text_preview": chunk["text"][:SOURCE_PREVIEW_CHARS]
+            }
+            for chunk in chunks
+        ]
+    
+    @staticmethod
+    def _format_context(chunks: List[Dict]) -> Tuple[str, List[Dict]]:
+        """
+        Label chunks as [Source N] with filename and page and join them for
+        the prompt.
+        
+        Chunks arrive best first and are taken in order until their text
+        exceeds CONTEXT_CHAR_BUDGET. The first chunk is always included, and
+        only trailing chunks are dropped, so [Source N] matches the position
+        in the kept list.
+        
+        Returns:
+            Tuple of (context_text, kept_chunks); sources, counts and
+            confidence should come from kept_chunks, the chunks the model saw
+        """
+        parts = []
+        used = 0
+        for i, chunk in enumerate(chunks, 1):
+            used += len(chunk["text"])
+            if used > CONTEXT_CHAR_BUDGET and parts:
+                logger.info(f"Context budget reached, left out {len(chunks) - len(parts)} of {len(chunks)} chunks")
+                break
+            filename = f" {chunk['filename']}" if chunk.get("filename") else ""
+            page = f" (Page {chunk['page']})" if chunk.get("page") else ""
+            parts.append(f"[Source {i}]{filename}{page}\n{chunk['text']}")
+        return "\n\n---\n\n".join(parts), chunks[:len(parts)]
+    
     async def generate_follow_up_suggestions(
         self,
         query: str,
@@ -289,26 +446,29 @@ Answer Given: {answer[:500]}
 
 Document Context: {context_summary[:300]}
 
-Return ONLY a JSON array of 3 question strings, no other text:
-["question 1", "question 2", "question 3"]"""
+Return ONLY a JSON object with an array of 3 question strings, no other text:
+{{"suggestions": ["question 1", "question 2", "question 3"]}}"""
         
         try:
             response = await self.llm.chat_completion(
                 messages=[{"role": "user", "content": prompt}],
                 model_type="chat",
                 temperature=0.3,
-                max_tokens=200
+                max_tokens=200,
+                response_format={"type": "json_object"}
             )
             
             content = response["choices"][0]["message"]["content"]
             
-            # Parse JSON array
-            if "[" in content and "]" in content:
-                json_str = content[content.index("["):content.rindex("]")+1]
-                suggestions = json.loads(json_str)
-                return suggestions[:3]
-            
-            return []
+            try:
+                suggestions = json.loads(content)["suggestions"]
+            except (ValueError, KeyError, TypeError):
+                # Model without JSON mode: fall back to the bare array
+                match = _JSON_ARRAY_RE.search(content)
+                if not match:
+                    return []
+                suggestions = json.loads(match.group())
+            return suggestions[:3]
             
         except Exception as e:
             logger.error(f"Failed to generate follow-ups: {str(e)}")
@@ -320,7 +480,8 @@ Return ONLY a JSON array of 3 question strings, no other text:
         context_chunks: List[Dict],
         chat_history: Optional[List[Dict]] = None,
         include_follow_ups: bool = True,
-        include_clause_analysis: bool = True
+        include_clause_analysis: bool = True,
+        include_full_text: bool = False
     ) -> Dict:
         """
         Generate answer using retrieved context with enhanced features.
@@ -331,49 +492,22 @@ Return ONLY a JSON array of 3 question strings, no other text:
             chat_history: Previous messages
             include_follow_ups: Generate follow-up suggestions
             include_clause_analysis: Extract clauses and risks
+            include_full_text: Return each source's full text instead of
+                the cut text and text_preview
             
         Returns:
             Complete response with answer, sources, and metadata
         """
         start_time = time.time()
         
-        # Build context string from chunks
-        context_parts = []
-        for i, chunk in enumerate(context_chunks):
-            source_info = f"[Source {i+1}]"
-            if chunk.get("filename"):
-                source_info += f" {chunk['filename']}"
-            if chunk.get("page"):
-                source_info += f" (Page {chunk['page']})"
-            context_parts.append(f"{source_info}\n{chunk['text']}")
+        # Build context string from chunks; the rest of the answer is based
+        # on the chunks that fit the prompt budget
+        context_text, context_chunks = self._format_context(context_chunks)
         
-        context_text = "\n\n---\n\n".join(context_parts)
-        
-        # Enhanced system prompt for legal accuracy
-        system_prompt = """You are an expert legal document analyst. Your responses must be:
-
-CRITICAL RULES - FOLLOW EXACTLY:
-1. ONLY use information explicitly present in the provided context documents
-2. ALWAYS cite sources using [Source X] format for every factual claim
-3. If information is NOT in the context, say: "This information is not present in the provided documents."
-4. NEVER assume, infer, or make up information
-5. Quote relevant text when helpful (use "quotation marks")
-6. If confidence is low, explicitly state: "Note: This interpretation has limited context support."
-7. Use precise legal language appropriate for the document type
-
-RESPONSE FORMAT:
-- Start with a direct answer to the question
-- Support with specific citations [Source X]
-- Highlight any ambiguities or areas needing clarification
-- End with any relevant caveats
-
-Context Documents:
-{context}"""
-
         messages = [
             {
                 "role": "system",
-                "content": system_prompt.format(context=context_text)
+                "content": ANSWER_SYSTEM_PROMPT + context_text
             }
         ]
         
@@ -399,12 +533,12 @@ Context Documents:
             tokens_used = response.get("usage", {}).get("total_tokens", 0)
             
             # Calculate confidence
-            avg_score = sum(c["score"] for c in context_chunks) / len(context_chunks) if context_chunks else 0
-            confidence = "high" if avg_score >= 0.85 else "medium" if avg_score >= 0.70 else "low"
+            avg_score = fmean(c["score"] for c in context_chunks) if context_chunks else 0.0
+            confidence = CONFIDENCE_LEVELS[bisect_right(CONFIDENCE_THRESHOLDS, avg_score)]
             
             result = {
                 "answer": answer,
-                "sources": context_chunks,
+                "sources": context_chunks if include_full_text else self._preview_sources(context_chunks),
                 "confidence": confidence,
                 "model_used": model_used,
                 "tokens_used": tokens_used,
@@ -412,19 +546,41 @@ Context Documents:
                 "response_time_ms": int((time.time() - start_time) * 1000)
             }
             
-            # Extract clauses and risks from context
+            # Extract clauses and risks from context in worker threads, so
+            # the regex scans overlap the follow-up call and don't block
+            # the event loop
+            analysis = None
             if include_clause_analysis:
                 all_text = " ".join(c["text"] for c in context_chunks)
-                result["extracted_clauses"] = self._extract_clauses(all_text)
-                result["risk_highlights"] = self._highlight_risks(all_text)
-            
-            # Generate follow-up suggestions
-            if include_follow_ups:
-                context_summary = all_text[:500] if context_chunks else ""
-                result["follow_up_suggestions"] = await self.generate_follow_up_suggestions(
-                    query, answer, context_summary
+                analysis = asyncio.gather(
+                    asyncio.to_thread(self._extract_clauses, all_text),
+                    asyncio.to_thread(self._highlight_risks, all_text)
                 )
             
+            try:
+                # Generate follow-up suggestions
+                follow_ups = None
+                if include_follow_ups:
+                    context_summary = self._context_summary(context_chunks, 500)
+                    follow_ups = await self.generate_follow_up_suggestions(
+                        query, answer, context_summary
+                    )
+                
+                if analysis is not None:
+                    result["extracted_clauses"], result["risk_highlights"] = await analysis
+            finally:
+                # If the follow-up await was cancelled (e.g. the client went
+                # away), stop the analysis or retrieve the error it already
+                # hit, so it isn't left unawaited
+                if analysis is not None:
+                    if not analysis.done():
+                        analysis.cancel()
+                    elif not analysis.cancelled():
+                        analysis.exception()
+            
+            if follow_ups is not None:
+                result["follow_up_suggestions"] = follow_ups
+            
             return result
             
         except Exception as e:
@@ -455,31 +611,10 @@ Context Documents:
             Streamed text chunks
         """
         # Build context
-        context_parts = []
-        for i, chunk in enumerate(context_chunks):
-            source_info = f"[Source {i+1}]"
-            if chunk.get("filename"):
-                source_info += f" {chunk['filename']}"
-            if chunk.get("page"):
-                source_info += f" (Page {chunk['page']})"
-            context_parts.append(f"{source_info}\n{chunk['text']}")
-        
-        context_text = "\n\n---\n\n".join(context_parts)
-        
-        system_prompt = """You are an expert legal document analyst. Your responses must be:
-
-CRITICAL RULES:
-1. ONLY use information explicitly present in the context documents
-2. ALWAYS cite sources using [Source X] format for every claim
-3. If information is NOT in the context, say: "This information is not present in the provided documents."
-4. NEVER assume or make up information
-5. Quote relevant text when helpful
-
-Context Documents:
-{context}"""
-
+        context_text, _ = self._format_context(context_chunks)
+        
         messages = [
-            {"role": "system", "content": system_prompt.format(context=context_text)}
+            {"role": "system", "content": STREAM_SYSTEM_PROMPT + context_text}
         ]
         
         if chat_history:
@@ -502,7 +637,8 @@ Context Documents:
         top_k: int = 8,
         stream: bool = False,
         include_follow_ups: bool = True,
-        include_clause_analysis: bool = True
+        include_clause_analysis: bool = True,
+        include_full_text: bool = False
     ) -> Dict:
         """
         Complete RAG chat flow: retrieve context + generate answer.
@@ -515,6 +651,7 @@ Context Documents:
             stream: Whether to stream response (returns generator)
             include_follow_ups: Include follow-up suggestions
             include_clause_analysis: Include clause/risk analysis
+            include_full_text: Return full source text instead of previews
             
         Returns:
             Complete response dict or generator for streaming
@@ -556,10 +693,12 @@ Context Documents:
             context_chunks=context_chunks,
             chat_history=chat_history,
             include_follow_ups=include_follow_ups,
-            include_clause_analysis=include_clause_analysis
+            include_clause_analysis=include_clause_analysis,
+            include_full_text=include_full_text
         )
         
-        result["retrieved_chunks"] = len(context_chunks)
+        # Counts only the chunks that fit the prompt, unless generation failed
+        result.setdefault("retrieved_chunks", len(context_chunks))
         return result
 
 
@@ -3,18 +3,29 @@ Enhanced RAG service with advanced retrieval, reranking, and hallucination preve
 Designed for maximum legal accuracy and grounding.
 """
 from typing import List, Dict, Optional, Any, Tuple
+import asyncio
+import hashlib
 import logging
 import re
 import time
 from collections import defaultdict
+from operator import itemgetter
+import orjson
 
+from app.core.config import settings
 from app.services.pinecone_client import pinecone_client
 from app.services.openrouter import openrouter_client
 from app.services.embedding import embedding_service
+from app.services.embedding_batch import embedding_batcher
+from app.services.index_generation import index_generation
 from app.services.query_rewriter import query_rewriter
+from app.services.reranker import cross_encoder_reranker
+from app.services.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+_TOKEN_RE = re.compile(r'\b\w+\b')
+
 
 class EnhancedRAGService:
     """
@@ -45,6 +56,23 @@ class EnhancedRAGService:
         self.pinecone = pinecone_client
         self.llm = openrouter_client
         self.embedder = embedding_service
+        # Repeated requests within the TTL skip retrieval and generation.
+        # Retrievals are keyed on the shared index generation and answers on
+        # the exact chunks they were built from, so neither outlives a
+        # delete or re-upload in any process
+        self._retrieval_cache = TTLCache(
+            max_items=settings.RAG_RESULT_CACHE_MAX_SIZE,
+            ttl_seconds=settings.RAG_RESULT_CACHE_TTL_SECONDS
+        )
+        self._answer_cache = TTLCache(
+            max_items=settings.RAG_RESULT_CACHE_MAX_SIZE,
+            ttl_seconds=settings.RAG_RESULT_CACHE_TTL_SECONDS
+        )
+    
+    @staticmethod
+    def _digest(data: bytes) -> str:
+        """Short content hash for cache keys."""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
     
     async def retrieve_context_enhanced(
         self,
@@ -65,12 +93,30 @@ class EnhancedRAGService:
             min_score: Minimum similarity score threshold
             use_hybrid: Use keyword boosting in addition to semantic search
             enforce_diversity: Ensure chunks come from different sections
-            
+        
         Returns:
             List of relevant chunks with enhanced metadata
         """
         logger.info(f"Enhanced retrieval for query: '{query[:100]}...'")
         
+        # No generation (Redis unreachable) means no caching
+        generation = await asyncio.to_thread(index_generation.current)
+        cache_key = None
+        if generation is not None:
+            cache_key = (
+                generation,
+                self._digest(query.strip().lower().encode("utf-8")),
+                tuple(sorted(str(fid) for fid in file_ids or ())),
+                top_k,
+                round(min_score, 2),
+                use_hybrid,
+                enforce_diversity
+            )
+            cached = self._retrieval_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Retrieval cache hit: {len(cached)} chunks")
+                return [dict(chunk) for chunk in cached]
+        
         # Step 0: Rewrite query for better retrieval (non-blocking)
         rewritten_query = query
         try:
@@ -82,8 +128,9 @@ class EnhancedRAGService:
             logger.warning(f"Query rewriting failed: {str(e)}, using original query")
             rewritten_query = query
         
-        # Step 1: Generate query embedding (use rewritten query)
-        query_embedding = await self.embedder.generate_embedding(rewritten_query)
+        # Step 1: Generate query embedding (use rewritten query), sharing one
+        # embeddings request with any other queries arriving at the same time
+        query_embedding = await embedding_batcher.embed(rewritten_query)
         if not query_embedding:
             logger.error("Failed to generate query embedding")
             return []
@@ -106,7 +153,10 @@ class EnhancedRAGService:
         
         # Step 3: Retrieve more candidates for reranking
         initial_k = top_k * 3 if enforce_diversity else top_k * 2
-        results = self.pinecone.query_vectors(
+        # The Pinecone SDK (and the query cache's generation check) blocks;
+        # keep it off the event loop
+        results = await asyncio.to_thread(
+            self.pinecone.query_vectors,
             query_vector=query_embedding,
             top_k=initial_k,
             filter_dict=filter_dict
@@ -122,7 +172,8 @@ class EnhancedRAGService:
             # If filter was applied and no results, try without filter
             if filter_dict:
                 logger.info(f"Retrying query without file_id filter...")
-                results = self.pinecone.query_vectors(
+                results = await asyncio.to_thread(
+                    self.pinecone.query_vectors,
                     query_vector=query_embedding,
                     top_k=initial_k,
                     filter_dict=None  # Remove filter
@@ -132,7 +183,7 @@ class EnhancedRAGService:
             # If still no results, check index status
             if not results:
                 try:
-                    stats = self.pinecone.get_index_stats()
+                    stats = await asyncio.to_thread(self.pinecone.get_index_stats)
                     total_vectors = stats.get("total_vector_count", 0)
                     logger.warning(f"Pinecone index has {total_vectors} total vectors")
                     if total_vectors == 0:
@@ -141,9 +192,12 @@ class EnhancedRAGService:
                     logger.error(f"Could not get index stats: {e}")
                 return []
         
+        # Chunk texts are tokenized once and shared by boosting and reranking
+        token_sets: Dict[str, frozenset] = {}
+        
         # Step 4: Apply keyword boosting if hybrid search enabled
         if use_hybrid:
-            results = self._apply_keyword_boosting(query, results)
+            results = self._apply_keyword_boosting(query, results, token_sets)
         
         # Step 5: Filter by minimum score (with adaptive fallback)
         relevant_chunks = []
@@ -152,16 +206,7 @@ class EnhancedRAGService:
             score = result.get("score", 0)
             all_scores.append(score)
             if score >= min_score:
-                chunk = {
-                    "text": result["metadata"].get("text", ""),
-                    "score": score,
-                    "file_id": result["metadata"].get("file_id"),
-                    "filename": result["metadata"].get("filename"),
-                    "page": result["metadata"].get("page"),
-                    "chunk_index": result["metadata"].get("chunk_index"),
-                    "section_title": result["metadata"].get("section_title"),
-                    "detected_clauses": result["metadata"].get("detected_clauses", [])
-                }
+                chunk = self._to_chunk(result, score)
                 relevant_chunks.append(chunk)
         
         # Log score distribution for debugging
@@ -177,16 +222,7 @@ class EnhancedRAGService:
             for result in results:
                 score = result.get("score", 0)
                 if score >= adaptive_threshold:
-                    chunk = {
-                        "text": result["metadata"].get("text", ""),
-                        "score": score,
-                        "file_id": result["metadata"].get("file_id"),
-                        "filename": result["metadata"].get("filename"),
-                        "page": result["metadata"].get("page"),
-                        "chunk_index": result["metadata"].get("chunk_index"),
-                        "section_title": result["metadata"].get("section_title"),
-                        "detected_clauses": result["metadata"].get("detected_clauses", [])
-                    }
+                    chunk = self._to_chunk(result, score)
                     relevant_chunks.append(chunk)
                     if len(relevant_chunks) >= top_k:  # Limit to top_k even with fallback
                         break
@@ -195,28 +231,31 @@ class EnhancedRAGService:
             if not relevant_chunks:
                 logger.warning(f"Taking top {min(top_k, len(results))} results regardless of score")
                 for i, result in enumerate(results[:top_k]):
-                    chunk = {
-                        "text": result["metadata"].get("text", ""),
-                        "score": result.get("score", 0),
-                        "file_id": result["metadata"].get("file_id"),
-                        "filename": result["metadata"].get("filename"),
-                        "page": result["metadata"].get("page"),
-                        "chunk_index": result["metadata"].get("chunk_index"),
-                        "section_title": result["metadata"].get("section_title"),
-                        "detected_clauses": result["metadata"].get("detected_clauses", [])
-                    }
+                    chunk = self._to_chunk(result, result.get("score", 0))
                     relevant_chunks.append(chunk)
             
             logger.info(f"Fallback retrieval: {len(relevant_chunks)} chunks using adaptive threshold {adaptive_threshold}")
         
-        # Step 6: Enforce diversity (avoid too many chunks from same section)
+        # Step 6: Cross-encoder reranking of the whole candidate list, so the
+        # diversity cut below keeps the model's best chunks
+        cross_encoded = None
+        if relevant_chunks and cross_encoder_reranker.enabled:
+            # Off the event loop: the cross-encoder can take ~100 ms on CPU
+            cross_encoded = await asyncio.to_thread(self._cross_encoder_rerank, query, relevant_chunks)
+            if cross_encoded:
+                relevant_chunks = cross_encoded
+        
+        # Step 7: Enforce diversity (avoid too many chunks from same section)
         if enforce_diversity and relevant_chunks:
             relevant_chunks = self._enforce_diversity(relevant_chunks, top_k)
         
-        # Step 7: Advanced reranking (non-blocking - preserve chunks if reranking fails)
-        if relevant_chunks:
+        # Step 8: Heuristic reranking when the cross-encoder didn't run
+        # (non-blocking - preserve chunks if reranking fails)
+        if cross_encoded:
+            relevant_chunks = relevant_chunks[:top_k]
+        elif relevant_chunks:
             try:
-                reranked = self._advanced_rerank(query, relevant_chunks)
+                reranked = self._advanced_rerank(query, relevant_chunks, token_sets)
                 if reranked and len(reranked) > 0:
                     relevant_chunks = reranked[:top_k]
                 else:
@@ -232,13 +271,50 @@ class EnhancedRAGService:
         if relevant_chunks:
             top_scores = [c.get("reranked_score", c["score"]) for c in relevant_chunks[:5]]
             logger.info(f"Top 5 reranked scores: {top_scores}")
+            # Empty results may be transient (e.g. a Pinecone error), so only cache hits
+            if cache_key is not None:
+                self._retrieval_cache.set(cache_key, [dict(chunk) for chunk in relevant_chunks])
         
         return relevant_chunks
     
-    def _apply_keyword_boosting(self, query: str, results: List[Dict]) -> List[Dict]:
-        """Boost results that contain query keywords."""
+    @staticmethod
+    def _to_chunk(result: Dict, score: float) -> Dict:
+        """Build a context chunk from a Pinecone match."""
+        metadata = result["metadata"]
+        return {
+            "text": metadata.get("text", ""),
+            "score": score,
+            "file_id": metadata.get("file_id"),
+            "filename": metadata.get("filename"),
+            "page": metadata.get("page"),
+            "chunk_index": metadata.get("chunk_index"),
+            "section_title": metadata.get("section_title"),
+            "detected_clauses": metadata.get("detected_clauses", [])
+        }
+    
+    @staticmethod
+    def _token_set(text: str, token_sets: Dict[str, frozenset]) -> frozenset:
+        """Word tokens of text, memoized in token_sets by text."""
+        tokens = token_sets.get(text)
+        if tokens is None:
+            tokens = token_sets[text] = frozenset(_TOKEN_RE.findall(text.lower()))
+        return tokens
+    
+    def _apply_keyword_boosting(
+        self,
+        query: str,
+        results: List[Dict],
+        token_sets: Optional[Dict[str, frozenset]] = None
+    ) -> List[Dict]:
+        """
+        Boost results that contain query keywords.
+        
+        token_sets memoizes chunk tokens across calls in one retrieval.
+        """
+        if token_sets is None:
+            token_sets = {}
         query_lower = query.lower()
-        query_terms = set(re.findall(r'\b\w+\b', query_lower))
+        query_terms = frozenset(_TOKEN_RE.findall(query_lower))
         
         # Detect legal intent
         detected_intent = None
@@ -248,11 +324,11 @@ class EnhancedRAGService:
                 break
         
         for result in results:
-            text_lower = result["metadata"].get("text", "").lower()
+            text_terms = self._token_set(result["metadata"].get("text", ""), token_sets)
             base_score = result.get("score", 0)
             
             # Boost for exact keyword matches
-            keyword_matches = sum(1 for term in query_terms if term in text_lower)
+            keyword_matches = len(query_terms & text_terms)
             keyword_boost = keyword_matches * 0.03
             
             # Boost for legal intent match
@@ -309,17 +385,55 @@ class EnhancedRAGService:
         
         return selected
     
-    def _advanced_rerank(self, query: str, chunks: List[Dict]) -> List[Dict]:
-        """Advanced reranking using multiple signals."""
+    def _cross_encoder_rerank(self, query: str, chunks: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Order the first RERANKER_MAX_CANDIDATES chunks by cross-encoder
+        relevance; the rest keep their retrieval order after them.
+        
+        The model's probability is stored as cross_encoder_score and only
+        used for ordering: score and reranked_score stay on the retrieval
+        similarity scale that confidence and source scores are calibrated to.
+        
+        Returns:
+            Reordered chunks, or None if the cross-encoder is unavailable
+        """
+        candidates = chunks[:settings.RERANKER_MAX_CANDIDATES]
+        try:
+            scores = cross_encoder_reranker.score(query, [chunk["text"] for chunk in candidates])
+        except Exception as e:
+            logger.warning(f"Cross-encoder reranking failed: {str(e)}, using heuristic reranking")
+            return None
+        if scores is None:
+            return None
+        
+        for chunk, score in zip(candidates, scores):
+            chunk["cross_encoder_score"] = score
+        return sorted(candidates, key=itemgetter("cross_encoder_score"), reverse=True) + chunks[len(candidates):]
+    
+    def _advanced_rerank(
+        self,
+        query: str,
+        chunks: List[Dict],
+        token_sets: Optional[Dict[str, frozenset]] = None
+    ) -> List[Dict]:
+        """
+        Rerank chunks with a heuristic mix of term, phrase, section and
+        position signals.
+        
+        token_sets memoizes chunk tokens across calls in one retrieval.
+        """
+        if token_sets is None:
+            token_sets = {}
         query_lower = query.lower()
-        query_terms = set(re.findall(r'\b\w+\b', query_lower))
+        query_terms = frozenset(_TOKEN_RE.findall(query_lower))
         
         for chunk in chunks:
             text_lower = chunk["text"].lower()
+            text_terms = self._token_set(chunk["text"], token_sets)
             base_score = chunk.get("score", 0)
             
             # Signal 1: Exact term matches
-            term_matches = sum(1 for term in query_terms if term in text_lower)
+            term_matches = len(query_terms & text_terms)
             term_score = term_matches / max(len(query_terms), 1) * 0.2
             
             # Signal 2: Legal phrase matches
@@ -334,7 +448,7 @@ class EnhancedRAGService:
             section_title = chunk.get("section_title", "").lower()
             section_score = 0.0
             if section_title:
-                section_words = set(re.findall(r'\b\w+\b', section_title))
+                section_words = set(_TOKEN_RE.findall(section_title))
                 section_overlap = len(query_terms & section_words) / max(len(query_terms), 1)
                 section_score = section_overlap * 0.15
             
@@ -458,12 +572,38 @@ class EnhancedRAGService:
             query: User's question
             context_chunks: Retrieved context chunks
             chat_history: Previous messages
-            
+        
         Returns:
             Complete response with verification
         """
         start_time = time.time()
         
+        # Same question over the same chunk contents and recent history gets
+        # the same answer; everything the prompt, confidence and sources are
+        # built from is part of the key, so re-uploaded text never matches
+        cache_key = (
+            self._digest(query.strip().lower().encode("utf-8")),
+            self._digest(orjson.dumps([
+                (
+                    c.get("file_id"),
+                    c.get("filename"),
+                    c.get("page"),
+                    c.get("chunk_index"),
+                    c.get("section_title"),
+                    c["text"],
+                    c.get("reranked_score", c["score"])
+                )
+                for c in context_chunks
+            ])),
+            self._digest(orjson.dumps(chat_history[-6:] if chat_history else [], option=orjson.OPT_SORT_KEYS))
+        )
+        cached = self._answer_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Grounded answer cache hit")
+            result = dict(cached)
+            result["response_time_ms"] = int((time.time() - start_time) * 1000)
+            return result
+        
         # Build enhanced context
         context_text, context_metadata = self.build_enhanced_context(context_chunks)
         
@@ -510,8 +650,12 @@ class EnhancedRAGService:
                 "missing_exhibits": context_metadata.get("missing_exhibits", [])
             }
             
+            # An answer the verifier gave no verdict on is an unchecked
+            # draft; don't serve it again for every repeat of the question
+            if "verification_status" in result["verification"]:
+                self._answer_cache.set(cache_key, dict(result))
             return result
-            
+        
         except Exception as e:
             logger.error(f"Error generating answer: {str(e)}", exc_info=True)
             return {
@@ -560,7 +704,7 @@ CONTEXT DOCUMENTS:
 {context_text}
 
 Remember: If it's not in the context, it doesn't exist. State "Not found in provided context" rather than inventing."""
-    
+
     async def _verify_answer(
         self,
         draft_answer: str,
@@ -596,7 +740,7 @@ Return a JSON object with:
 }}
 
 If there are ungrounded claims, provide a revised answer that removes or flags them."""
-        
+
         try:
             response = await self.llm.chat_completion(
                 messages=[{"role": "user", "content": verification_prompt}],
@@ -622,7 +766,7 @@ If there are ungrounded claims, provide a revised answer that removes or flags t
             else:
                 # Fallback: return original answer
                 return {"answer": draft_answer, "verification": {"status": "manual_review_needed"}}
-                
+        
         except Exception as e:
             logger.warning(f"Verification failed: {str(e)}, using original answer")
             return {"answer": draft_answer, "verification": {"status": "verification_failed"}}
@@ -671,7 +815,7 @@ If there are ungrounded claims, provide a revised answer that removes or flags t
             stream: Whether to stream response
             include_follow_ups: Include follow-up suggestions
             include_clause_analysis: Include clause/risk analysis
-            
+        
         Returns:
             Complete response dict
         """
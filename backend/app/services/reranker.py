@@ -0,0 +1,121 @@
+"""
+Cross-encoder reranking for retrieved chunks.
+Scores (query, chunk) pairs jointly with bge-reranker-v2-m3 running on
+ONNX Runtime, which is far more precise than bi-encoder similarity alone.
+"""
+from pathlib import Path
+from typing import List, Optional
+import logging
+import threading
+import numpy as np
+from app.core.config import settings
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:  # Optional; reranking falls back to heuristic scoring
+    onnxruntime = None
+    Tokenizer = None
+
+logger = logging.getLogger(__name__)
+
+# Model input limit in tokens, and characters of chunk text sent per pair
+MAX_SEQUENCE_LENGTH = 512
+MAX_TEXT_CHARS = 512
+
+
+class CrossEncoderReranker:
+    """
+    Lazily loaded cross-encoder.
+    
+    The model is loaded on first use and all pairs for a query are scored in
+    a single padded batch. If the dependencies or model files are missing,
+    loading fails once and score() returns None from then on.
+    """
+    
+    def __init__(self, model_dir: str, enabled: bool):
+        """
+        Initialize reranker.
+        
+        Args:
+            model_dir: Directory containing model.onnx and tokenizer.json
+            enabled: Whether to use the model at all
+        """
+        self.model_dir = Path(model_dir)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._session = None
+        self._tokenizer = None
+        self._input_names: List[str] = []
+    
+    def _load(self) -> bool:
+        """Load the tokenizer and ONNX session once; True if usable."""
+        if self._loaded:
+            return self._session is not None
+        
+        with self._lock:
+            if self._loaded:
+                return self._session is not None
+            
+            try:
+                if onnxruntime is None:
+                    raise RuntimeError("onnxruntime and tokenizers are not installed")
+                
+                tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+                tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+                tokenizer.enable_padding()
+                
+                available = onnxruntime.get_available_providers()
+                providers = [
+                    provider
+                    for provider in ("CUDAExecutionProvider", "CPUExecutionProvider")
+                    if provider in available
+                ]
+                session = onnxruntime.InferenceSession(
+                    str(self.model_dir / "model.onnx"),
+                    providers=providers
+                )
+                
+                self._tokenizer = tokenizer
+                self._session = session
+                self._input_names = [model_input.name for model_input in session.get_inputs()]
+                logger.info(f"Loaded cross-encoder reranker from {self.model_dir} ({', '.join(providers)})")
+            except Exception as e:
+                logger.warning(f"Cross-encoder reranker unavailable, using heuristic reranking: {str(e)}")
+            
+            self._loaded = True
+            return self._session is not None
+    
+    def score(self, query: str, texts: List[str]) -> Optional[List[float]]:
+        """
+        Score each text's relevance to the query.
+        
+        Args:
+            query: User's question
+            texts: Candidate chunk texts
+        
+        Returns:
+            Relevance probabilities in [0, 1] in the order of texts, or None
+            if the reranker is disabled or unavailable
+        """
+        if not self.enabled or not texts or not self._load():
+            return None
+        
+        encodings = self._tokenizer.encode_batch([(query, text[:MAX_TEXT_CHARS]) for text in texts])
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        
+        logits = self._session.run(None, {name: inputs[name] for name in self._input_names})[0]
+        logits = np.asarray(logits, dtype=np.float32).reshape(len(texts), -1)[:, 0]
+        return (1.0 / (1.0 + np.exp(-logits))).tolist()
+
+
+# Global reranker instance
+cross_encoder_reranker = CrossEncoderReranker(
+    settings.RERANKER_MODEL_DIR,
+    enabled=settings.RERANKER_ENABLED
+)
@@ -154,6 +154,21 @@ class StorageService:
                 return f.read()
         return None
     
+    def open_file(self, relative_path: str) -> Optional[BinaryIO]:
+        """
+        Open a file for streaming reads.
+        
+        Args:
+            relative_path: Relative path from base_path
+            
+        Returns:
+            Binary file object (caller closes it), or None if file doesn't exist
+        """
+        file_path = self.get_file_path(relative_path)
+        if file_path.exists():
+            return open(file_path, "rb")
+        return None
+    
     def save_text(
         self,
         text_content: str,
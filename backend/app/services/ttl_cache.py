@@ -0,0 +1,63 @@
+"""
+Small in-process LRU cache with per-entry expiry.
+Used to answer repeated requests (e.g. a clicked follow-up suggestion or a
+duplicate UI request) without redoing retrieval or generation.
+"""
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+import threading
+import time
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire ttl_seconds after being stored.
+    
+    Values are returned as stored; callers that mutate them should store
+    and hand out copies.
+    """
+    
+    def __init__(self, max_items: int = 1024, ttl_seconds: float = 60):
+        """
+        Initialize TTL cache.
+        
+        Args:
+            max_items: Maximum number of entries; 0 disables the cache
+            ttl_seconds: Maximum age of an entry
+        """
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (expires_at, value)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the live value for key, or None on a miss."""
+        if self.max_items <= 0:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key: Hashable, value: Any):
+        """Store value under key, evicting the least recently used entries."""
+        if self.max_items <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
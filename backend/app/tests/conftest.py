@@ -2,6 +2,7 @@
 Pytest configuration and fixtures for testing.
 """
 import pytest
+from types import SimpleNamespace
 from typing import Generator
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -142,3 +143,23 @@ def admin_headers(admin_token) -> dict:
 def reviewer_headers(reviewer_token) -> dict:
     """Create authorization headers for reviewer."""
     return {"Authorization": f"Bearer {reviewer_token}"}
+
+
+class FakeClock:
+    """Controllable replacement for a time function."""
+    
+    def __init__(self, now: float):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="function")
+def fake_clock(monkeypatch):
+    """Patch a module's ``time`` with a clock the test advances by hand."""
+    def install(module, attr: str = "monotonic", start: float = 1000.0) -> FakeClock:
+        clock = FakeClock(start)
+        monkeypatch.setattr(module, "time", SimpleNamespace(**{attr: clock}))
+        return clock
+    return install
@@ -0,0 +1,68 @@
+"""
+Tests for the text chunking service.
+"""
+from app.services.chunking import ChunkingService
+
+
+def _texts(chunks):
+    """Chunk texts in order."""
+    return [chunk["text"] for chunk in chunks]
+
+
+class TestChunking:
+    """Tests for ChunkingService.chunk_text."""
+    
+    def test_empty_text(self):
+        """Blank input produces no chunks."""
+        assert ChunkingService(chunk_size=20, overlap=5).chunk_text("  \n\n ") == []
+    
+    def test_sections_fit_in_one_chunk(self):
+        """Short paragraphs are joined with the separator."""
+        chunks = ChunkingService(chunk_size=100, overlap=10).chunk_text("First.\n\nSecond.")
+        assert _texts(chunks) == ["First.\n\nSecond."]
+        assert chunks[0]["chunk_index"] == 0
+        assert chunks[0]["char_count"] == len("First.\n\nSecond.")
+    
+    def test_sentence_overlap(self):
+        """Chunks split by sentence carry the tail of the previous chunk."""
+        text = "One short sentence. Another short one. A third sentence here."
+        chunks = ChunkingService(chunk_size=24, overlap=6).chunk_text(text)
+        assert _texts(chunks) == [
+            "One short sentence.",
+            "ence. Another short one.",
+            "one. A third sentence here."
+        ]
+        assert [chunk["chunk_index"] for chunk in chunks] == [0, 1, 2]
+    
+    def test_section_overlap_within_separator(self):
+        """
+        An overlap no longer than the separator carries no text, but the
+        joining separator still counts toward the next chunk's size.
+        """
+        text = "AAAAAAAAAAA\n\nBBBB\n\nCCCC"
+        assert _texts(ChunkingService(chunk_size=13, overlap=1).chunk_text(text)) == [
+            "AAAAAAAAAAA", "BBBB", "CCCC"
+        ]
+        assert _texts(ChunkingService(chunk_size=13, overlap=2).chunk_text(text)) == [
+            "AAAAAAAAAAA", "BBBB", "CCCC"
+        ]
+        assert _texts(ChunkingService(chunk_size=13, overlap=0).chunk_text(text)) == [
+            "AAAAAAAAAAA", "BBBB\n\nCCCC"
+        ]
+    
+    def test_sentence_overlap_within_separator(self):
+        """Same as above for the sentence splitter's single-space separator."""
+        text = "Aaaaaaaaaa. Bbbb. Cccc."
+        assert _texts(ChunkingService(chunk_size=12, overlap=1).chunk_text(text)) == [
+            "Aaaaaaaaaa.", "Bbbb.", "Cccc."
+        ]
+        assert _texts(ChunkingService(chunk_size=12, overlap=0).chunk_text(text)) == [
+            "Aaaaaaaaaa.", "Bbbb. Cccc."
+        ]
+    
+    def test_chunks_are_stripped(self):
+        """No chunk starts or ends with whitespace."""
+        text = "Alpha beta gamma.\n\n  Delta epsilon.  \n\n\n\nZeta eta theta iota."
+        for overlap in range(0, 8):
+            for chunk in ChunkingService(chunk_size=20, overlap=overlap).chunk_text(text):
+                assert chunk["text"] == chunk["text"].strip()
@@ -0,0 +1,84 @@
+"""
+Tests for the SQLite embedding cache.
+"""
+import numpy as np
+import pytest
+
+from app.services import embed_cache as embed_cache_module
+from app.services.embed_cache import EmbedCache
+
+
+@pytest.fixture
+def clock(fake_clock):
+    """Controllable wall clock for the cache module."""
+    return fake_clock(embed_cache_module, attr="time", start=1_700_000_000.0)
+
+
+def _vector(value):
+    """Small float32 vector filled with value."""
+    return np.full(4, value, dtype=np.float32)
+
+
+class TestEmbedCache:
+    """Tests for EmbedCache."""
+    
+    def test_round_trip(self, tmp_path, clock):
+        """Stored vectors come back by position; unknown texts are misses."""
+        cache = EmbedCache(str(tmp_path / "cache" / "embeddings.sqlite3"), ttl_seconds=60)
+        cache.put_many("model", ["a", "b"], [_vector(1), _vector(2)])
+        
+        hits = cache.get_many("model", ["b", "c", "a"])
+        assert sorted(hits) == [0, 2]
+        np.testing.assert_array_equal(hits[0], _vector(2))
+        np.testing.assert_array_equal(hits[2], _vector(1))
+    
+    def test_keyed_by_model(self, tmp_path, clock):
+        """The same text under another model is a miss."""
+        cache = EmbedCache(str(tmp_path / "embeddings.sqlite3"), ttl_seconds=60)
+        cache.put_many("model", ["a"], [_vector(1)])
+        assert cache.get_many("other-model", ["a"]) == {}
+    
+    def test_expiry(self, tmp_path, clock):
+        """Vectors older than the TTL are misses."""
+        cache = EmbedCache(str(tmp_path / "embeddings.sqlite3"), ttl_seconds=60)
+        cache.put_many("model", ["a"], [_vector(1)])
+        
+        clock.now += 60
+        assert sorted(cache.get_many("model", ["a"])) == [0]
+        clock.now += 1
+        assert cache.get_many("model", ["a"]) == {}
+    
+    def test_opens_lazily(self, tmp_path, clock):
+        """Nothing is created until the cache is used."""
+        path = tmp_path / "embeddings.sqlite3"
+        cache = EmbedCache(str(path), ttl_seconds=60)
+        assert not path.exists()
+        cache.get_many("model", ["a"])
+        assert path.exists()
+    
+    def test_reconnects_after_fork(self, tmp_path, clock, monkeypatch):
+        """A new process id gets its own connection and keeps the data."""
+        cache = EmbedCache(str(tmp_path / "embeddings.sqlite3"), ttl_seconds=60)
+        cache.put_many("model", ["a"], [_vector(1)])
+        parent_conn = cache._conn
+        
+        monkeypatch.setattr(embed_cache_module.os, "getpid", lambda: -1)
+        assert sorted(cache.get_many("model", ["a"])) == [0]
+        assert cache._conn is not parent_conn
+        # The inherited connection is kept, not closed
+        assert cache._inherited == [parent_conn]
+        parent_conn.execute("SELECT 1")
+    
+    def test_disabled(self, clock):
+        """An empty path disables the cache."""
+        cache = EmbedCache("", ttl_seconds=60)
+        cache.put_many("model", ["a"], [_vector(1)])
+        assert cache.get_many("model", ["a"]) == {}
+    
+    def test_unusable_path_disables(self, tmp_path, clock):
+        """A path that can't be opened disables the cache instead of failing."""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        cache = EmbedCache(str(blocker / "embeddings.sqlite3"), ttl_seconds=60)
+        cache.put_many("model", ["a"], [_vector(1)])
+        assert cache.get_many("model", ["a"]) == {}
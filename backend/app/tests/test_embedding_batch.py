@@ -0,0 +1,142 @@
+"""
+Tests for query embedding micro-batching.
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.embedding_batch import EmbeddingBatcher
+
+
+class FakeEmbedder:
+    """Records each batch call and returns one vector per text."""
+    
+    def __init__(self, result=None, error=None, delay=0.0):
+        self.calls = []
+        self.result = result
+        self.error = error
+        self.delay = delay
+    
+    async def generate_embeddings_batch(self, texts):
+        self.calls.append(list(texts))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        if self.result is not None:
+            return self.result
+        return [np.array([float(len(text))], dtype=np.float32) for text in texts]
+
+
+class TestEmbeddingBatcher:
+    """Tests for EmbeddingBatcher."""
+    
+    @pytest.mark.asyncio
+    async def test_coalesces_concurrent_calls(self):
+        """Concurrent calls share one request and get their own vectors."""
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_batch=16, max_wait=0.01)
+        
+        results = await asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "ccc"]))
+        
+        assert embedder.calls == [["a", "bb", "ccc"]]
+        assert results == [[1.0], [2.0], [3.0]]
+    
+    @pytest.mark.asyncio
+    async def test_flushes_at_max_batch(self):
+        """A full queue is sent without waiting for the timer."""
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_batch=2, max_wait=10)
+        
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a"), batcher.embed("bb")),
+            timeout=1
+        )
+        
+        assert embedder.calls == [["a", "bb"]]
+        assert results == [[1.0], [2.0]]
+    
+    @pytest.mark.asyncio
+    async def test_empty_text(self):
+        """Blank text is rejected without a request."""
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder)
+        
+        assert await batcher.embed("  ") is None
+        assert embedder.calls == []
+    
+    @pytest.mark.asyncio
+    async def test_failure_resolves_every_caller(self):
+        """A failed request resolves all waiting callers with None."""
+        embedder = FakeEmbedder(error=RuntimeError("boom"))
+        batcher = EmbeddingBatcher(embedder, max_wait=0.01)
+        
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a"), batcher.embed("b")),
+            timeout=1
+        )
+        
+        assert results == [None, None]
+    
+    @pytest.mark.asyncio
+    async def test_short_result_resolves_leftovers(self):
+        """Callers without a returned vector get None instead of hanging."""
+        embedder = FakeEmbedder(result=[np.array([1.0], dtype=np.float32)])
+        batcher = EmbeddingBatcher(embedder, max_wait=0.01)
+        
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a"), batcher.embed("b"), batcher.embed("c")),
+            timeout=1
+        )
+        
+        assert results == [[1.0], None, None]
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_caller(self):
+        """A cancelled caller doesn't break the batch for the others."""
+        embedder = FakeEmbedder(delay=0.02)
+        batcher = EmbeddingBatcher(embedder, max_wait=0.01)
+        
+        cancelled = asyncio.ensure_future(batcher.embed("a"))
+        kept = asyncio.ensure_future(batcher.embed("bb"))
+        await asyncio.sleep(0.015)
+        cancelled.cancel()
+        
+        assert await asyncio.wait_for(kept, timeout=1) == [2.0]
+        assert cancelled.cancelled()
+        assert embedder.calls == [["a", "bb"]]
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_batch_resolves_callers(self):
+        """Cancelling the batch request itself resolves callers with None."""
+        embedder = FakeEmbedder(delay=10)
+        batcher = EmbeddingBatcher(embedder, max_wait=0.01)
+        
+        waiter = asyncio.ensure_future(batcher.embed("a"))
+        await asyncio.sleep(0.02)
+        for task in list(batcher._tasks):
+            task.cancel()
+        
+        assert await asyncio.wait_for(waiter, timeout=1) is None
+    
+    def test_new_event_loop_resets_queue(self):
+        """State left by a previous loop doesn't leak into the next one."""
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_wait=0.01)
+        
+        first = asyncio.new_event_loop()
+        # Queue a text and stop the loop before the timer fires
+        stranded = first.create_task(batcher.embed("a"))
+        first.run_until_complete(asyncio.sleep(0))
+        assert batcher._pending and batcher._timer is not None
+        
+        second = asyncio.new_event_loop()
+        try:
+            assert second.run_until_complete(batcher.embed("bb")) == [2.0]
+            assert embedder.calls == [["bb"]]
+            # The stranded caller is woken with None on its own loop
+            assert first.run_until_complete(stranded) is None
+        finally:
+            first.close()
+            second.close()
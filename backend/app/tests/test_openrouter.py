@@ -0,0 +1,170 @@
+"""
+Tests for OpenRouter client helpers.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import openrouter as openrouter_module
+from app.services.openrouter import OpenRouterClient, _TokenBucket, _extract_json, _iter_sse_data
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake clock whose sleep() advances time instead of waiting."""
+    fake = SimpleNamespace(now=1000.0, sleeps=[])
+    
+    async def sleep(seconds):
+        fake.sleeps.append(seconds)
+        fake.now += seconds
+    
+    monkeypatch.setattr(openrouter_module, "time", SimpleNamespace(monotonic=lambda: fake.now))
+    monkeypatch.setattr(openrouter_module, "asyncio", SimpleNamespace(sleep=sleep))
+    return fake
+
+
+class TestTokenBucket:
+    """Tests for the embedding rate limiter."""
+    
+    @pytest.mark.asyncio
+    async def test_burst_up_to_capacity(self, clock):
+        """A full bucket lets capacity requests through without waiting."""
+        bucket = _TokenBucket(requests_per_minute=60, capacity=3)
+        for _ in range(3):
+            await bucket.acquire()
+        assert clock.sleeps == []
+    
+    @pytest.mark.asyncio
+    async def test_waits_for_refill(self, clock):
+        """An empty bucket waits until one token has been refilled."""
+        bucket = _TokenBucket(requests_per_minute=60, capacity=1)
+        await bucket.acquire()
+        await bucket.acquire()
+        assert clock.sleeps == [pytest.approx(1.0)]
+    
+    @pytest.mark.asyncio
+    async def test_partial_refill(self, clock):
+        """Only the missing fraction of a token is waited for."""
+        bucket = _TokenBucket(requests_per_minute=120, capacity=1)
+        await bucket.acquire()
+        clock.now += 0.25
+        await bucket.acquire()
+        assert clock.sleeps == [pytest.approx(0.25)]
+    
+    @pytest.mark.asyncio
+    async def test_refill_is_capped(self, clock):
+        """A long idle period refills no more than capacity tokens."""
+        bucket = _TokenBucket(requests_per_minute=60, capacity=2)
+        await bucket.acquire()
+        await bucket.acquire()
+        clock.now += 3600
+        for _ in range(3):
+            await bucket.acquire()
+        assert clock.sleeps == [pytest.approx(1.0)]
+
+
+class TestExtractJson:
+    """Tests for pulling the JSON object out of a model response."""
+    
+    def test_plain_object(self):
+        """A bare object is returned as is."""
+        assert _extract_json('{"a": 1}') == '{"a": 1}'
+    
+    def test_code_fence_and_prose(self):
+        """Fences and surrounding text are dropped."""
+        text = 'Here you go:\n```json\n{"a": {"b": [1, 2]}}\n```\nDone.'
+        assert _extract_json(text) == '{"a": {"b": [1, 2]}}'
+    
+    def test_braces_inside_strings(self):
+        """Braces and escaped quotes inside strings don't end the object."""
+        obj = '{"clause": "see {Exhibit A} and \\"}\\"", "n": 1}'
+        assert _extract_json("x " + obj + " y") == obj
+    
+    def test_first_object_only(self):
+        """Only the first complete object is returned."""
+        assert _extract_json('{"a": 1} {"b": 2}') == '{"a": 1}'
+    
+    def test_no_complete_object(self):
+        """Text without a complete object comes back unchanged."""
+        assert _extract_json("no json here") == "no json here"
+        assert _extract_json('{"a": {"b": 1}') == '{"a": {"b": 1}'
+
+
+class FakeStream:
+    """Response stand-in that delivers its body in the given pieces."""
+    
+    def __init__(self, *pieces):
+        self.pieces = pieces
+    
+    async def aiter_bytes(self):
+        for piece in self.pieces:
+            yield piece
+
+
+async def _collect(response):
+    """All payloads yielded for a response."""
+    return [data async for data in _iter_sse_data(response)]
+
+
+class TestIterSseData:
+    """Tests for server-sent event parsing."""
+    
+    @pytest.mark.asyncio
+    async def test_data_lines(self):
+        """Each data line's payload is yielded; other lines are skipped."""
+        body = b': OPENROUTER PROCESSING\n\ndata: {"a": 1}\n\nevent: x\ndata: [DONE]\n\n'
+        assert await _collect(FakeStream(body)) == [b'{"a": 1}', b"[DONE]"]
+    
+    @pytest.mark.asyncio
+    async def test_lines_split_across_reads(self):
+        """A line cut between network reads is reassembled."""
+        stream = FakeStream(b"da", b'ta: {"content": "he', b'llo"}\n', b"\ndata: [DONE]\n")
+        assert await _collect(stream) == [b'{"content": "hello"}', b"[DONE]"]
+    
+    @pytest.mark.asyncio
+    async def test_crlf_and_unterminated_last_line(self):
+        """CRLF endings are trimmed and a final line without newline is kept."""
+        stream = FakeStream(b'data: {"a": 1}\r\n\r\n', b"data: [DONE]")
+        assert await _collect(stream) == [b'{"a": 1}', b"[DONE]"]
+    
+    @pytest.mark.asyncio
+    async def test_multibyte_text_split_across_reads(self):
+        """UTF-8 characters split between reads come through intact."""
+        payload = '{"content": "§ 4.2 — Zahlung"}'.encode("utf-8")
+        cut = payload.index("—".encode("utf-8")) + 1
+        stream = FakeStream(b"data: " + payload[:cut], payload[cut:] + b"\n")
+        assert await _collect(stream) == [payload]
+
+
+class TestGetEmbeddingsBatch:
+    """Tests for concurrent batch embedding."""
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_cancels_the_rest(self, monkeypatch):
+        """A batch that fails for good stops the batches still in flight."""
+        monkeypatch.setattr(openrouter_module, "embed_cache", SimpleNamespace(
+            get_many=lambda model, texts: {},
+            put_many=lambda model, texts, embeddings: None
+        ))
+        client = OpenRouterClient()
+        cancelled = []
+        
+        async def post(payload, timeout):
+            text = payload["input"][0]
+            if text == "bad":
+                request = httpx.Request("POST", "https://openrouter.test/embeddings")
+                response = httpx.Response(400, request=request)
+                raise httpx.HTTPStatusError("Bad Request", request=request, response=response)
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(text)
+                raise
+        
+        monkeypatch.setattr(client, "_post_embeddings", post)
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_embeddings_batch(["a", "bad", "b"], batch_size=1)
+        await asyncio.sleep(0)
+        assert sorted(cancelled) == ["a", "b"]
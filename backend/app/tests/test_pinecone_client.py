@@ -0,0 +1,83 @@
+"""
+Tests for replacing a document's vectors in Pinecone.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import pinecone_client as pinecone_client_module
+from app.services.pinecone_client import PineconeClient
+
+
+class FakeIndex:
+    """In-memory index recording each delete request."""
+    
+    def __init__(self, ids=()):
+        self.ids = set(ids)
+        self.deletes = []
+    
+    def upsert(self, vectors, namespace, async_req):
+        self.ids.update(vector["id"] for vector in vectors)
+        return SimpleNamespace(get=lambda: None)
+    
+    def delete(self, ids=None, filter=None, namespace=None):
+        self.deletes.append(ids if ids is not None else filter)
+        if ids is not None:
+            self.ids.difference_update(ids)
+
+
+def _ids(count, file_id="f"):
+    return {f"{file_id}_chunk_{i}" for i in range(count)}
+
+
+def _vectors(indexes, file_id="f"):
+    return [
+        {"id": f"{file_id}_chunk_{i}", "values": [0.1], "metadata": {"file_id": file_id, "chunk_index": i}}
+        for i in indexes
+    ]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Client on a fake serverless index, with the query cache stubbed."""
+    monkeypatch.setattr(pinecone_client_module, "query_cache", SimpleNamespace(invalidate=lambda: None))
+    client = PineconeClient()
+    client.index = FakeIndex()
+    yield client
+    client.close()
+
+
+class TestReplaceDocument:
+    """Tests for PineconeClient.replace_document."""
+    
+    def test_first_index_deletes_nothing(self, client):
+        """A file without a previous index sends no delete requests."""
+        assert client.replace_document("f", _vectors(range(3)), chunk_count=3)
+        assert client.index.ids == _ids(3)
+        assert client.index.deletes == []
+    
+    def test_shrunk_document_drops_stale_chunks(self, client):
+        """Only the previous version's indexes past the new count are deleted."""
+        client.index.ids = _ids(5)
+        assert client.replace_document("f", _vectors(range(3)), chunk_count=3, previous_count=5)
+        assert client.index.ids == _ids(3)
+        assert client.index.deletes == [["f_chunk_3", "f_chunk_4"]]
+    
+    def test_skipped_chunks_are_deleted(self, client):
+        """Previous vectors at indexes the new set skipped are removed."""
+        client.index.ids = _ids(3)
+        assert client.replace_document("f", _vectors([0, 2]), chunk_count=3, previous_count=3)
+        assert client.index.ids == {"f_chunk_0", "f_chunk_2"}
+    
+    def test_large_skipped_delete_is_batched(self, client):
+        """Deletes stay within Pinecone's 1000 IDs per request."""
+        client.index.ids = _ids(2500)
+        assert client.replace_document("f", _vectors([0]), chunk_count=2500, previous_count=2500)
+        assert client.index.ids == {"f_chunk_0"}
+        assert max(len(ids) for ids in client.index.deletes) <= pinecone_client_module.DELETE_BATCH_SIZE
+    
+    def test_filtered_delete(self, client):
+        """Pod indexes drop stale chunks with one bounded filter."""
+        client.supports_filtered_delete = True
+        assert client.replace_document("f", _vectors(range(2)), chunk_count=2, previous_count=4)
+        assert client.index.deletes == [{"file_id": {"$eq": "f"}, "chunk_index": {"$gte": 2}}]
@@ -0,0 +1,198 @@
+"""
+Tests for the Pinecone query result cache and the shared index generation.
+"""
+import pytest
+import redis
+
+from app.services import index_generation as index_generation_module
+from app.services import query_cache as query_cache_module
+from app.services.index_generation import IndexGeneration
+from app.services.query_cache import QueryCache
+
+
+class FakeGeneration:
+    """Stand-in for IndexGeneration shared by several caches."""
+    
+    def __init__(self):
+        self.value = (0, 0)
+        self.available = True
+    
+    def current(self):
+        return self.value if self.available else None
+    
+    def bump(self):
+        self.value = (self.value[0], self.value[1] + 1)
+
+
+@pytest.fixture
+def clock(fake_clock):
+    """Controllable monotonic clock for the cache module."""
+    return fake_clock(query_cache_module)
+
+
+def _cache(generation, **kwargs):
+    """Query cache with test defaults."""
+    options = {"max_size": 10, "ttl_seconds": 60, "similarity_threshold": 0.97}
+    options.update(kwargs)
+    return QueryCache(generation=generation, **options)
+
+
+MATCHES = [{"id": "v1", "score": 0.9, "metadata": {"text": "clause"}}]
+
+
+def _store(cache, vector, scope, matches=MATCHES):
+    """Miss then store, the way PineconeClient.query_vectors uses the cache."""
+    assert cache.get(vector, scope) is None
+    cache.put(vector, scope, matches)
+
+
+class TestQueryCache:
+    """Tests for QueryCache."""
+    
+    def test_hit_returns_copies(self, clock):
+        """Stored matches are served as copies."""
+        cache = _cache(FakeGeneration())
+        scope = cache.scope(5, None, "", True)
+        _store(cache, [1.0, 0.0], scope)
+        
+        hit = cache.get([1.0, 0.0], scope)
+        assert hit == MATCHES
+        hit[0]["score"] = 0.1
+        assert cache.get([1.0, 0.0], scope) == MATCHES
+    
+    def test_scope_separates_entries(self, clock):
+        """A different top_k or filter is a miss."""
+        cache = _cache(FakeGeneration())
+        _store(cache, [1.0, 0.0], cache.scope(5, None, "", True))
+        
+        assert cache.get([1.0, 0.0], cache.scope(6, None, "", True)) is None
+        assert cache.get([1.0, 0.0], cache.scope(5, {"file_id": "a"}, "", True)) is None
+    
+    def test_semantic_hit(self, clock):
+        """A near-identical vector is served; a different one is not."""
+        cache = _cache(FakeGeneration())
+        scope = cache.scope(5, None, "", True)
+        _store(cache, [1.0, 0.0, 0.0], scope)
+        
+        assert cache.get([1.0, 0.05, 0.0], scope) == MATCHES
+        assert cache.get([0.0, 1.0, 0.0], scope) is None
+    
+    def test_expiry(self, clock):
+        """Entries expire after ttl_seconds, for exact and semantic lookups."""
+        cache = _cache(FakeGeneration(), ttl_seconds=60)
+        scope = cache.scope(5, None, "", True)
+        _store(cache, [1.0, 0.0], scope)
+        
+        clock.now += 59
+        assert cache.get([1.0, 0.0], scope) == MATCHES
+        clock.now += 2
+        assert cache.get([1.0, 0.0], scope) is None
+        assert cache.get([1.0, 0.01], scope) is None
+    
+    def test_lru_eviction(self, clock):
+        """The least recently used entry is evicted past max_size."""
+        cache = _cache(FakeGeneration(), max_size=2, similarity_threshold=1.1)
+        scope = cache.scope(5, None, "", True)
+        _store(cache, [1.0, 0.0, 0.0], scope)
+        _store(cache, [0.0, 1.0, 0.0], scope)
+        cache.get([1.0, 0.0, 0.0], scope)
+        _store(cache, [0.0, 0.0, 1.0], scope)
+        
+        assert cache.get([1.0, 0.0, 0.0], scope) == MATCHES
+        assert cache.get([0.0, 1.0, 0.0], scope) is None
+    
+    def test_invalidate_reaches_other_caches(self, clock):
+        """invalidate() in one process clears the others via the generation."""
+        generation = FakeGeneration()
+        here = _cache(generation)
+        there = _cache(generation)
+        old_scope = there.scope(5, None, "", True)
+        _store(there, [1.0, 0.0], old_scope)
+        
+        here.invalidate()
+        
+        new_scope = there.scope(5, None, "", True)
+        assert there.get([1.0, 0.0], new_scope) is None
+        # A result fetched under the old generation is not kept or served
+        there.put([1.0, 0.0], old_scope, MATCHES)
+        assert there.get([1.0, 0.0], old_scope) is None
+        assert there.get([1.0, 0.0], new_scope) is None
+    
+    def test_bypassed_without_generation(self, clock):
+        """With Redis unreachable the cache neither stores nor serves."""
+        generation = FakeGeneration()
+        cache = _cache(generation)
+        _store(cache, [1.0, 0.0], cache.scope(5, None, "", True))
+        
+        generation.available = False
+        assert cache.scope(5, None, "", True) is None
+        assert cache.get([1.0, 0.0], None) is None
+        cache.put([0.0, 1.0], None, MATCHES)
+        
+        generation.available = True
+        assert cache.get([0.0, 1.0], cache.scope(5, None, "", True)) is None
+    
+    def test_disabled(self, clock):
+        """max_size 0 disables the cache."""
+        cache = _cache(FakeGeneration(), max_size=0)
+        assert cache.scope(5, None, "", True) is None
+
+
+class FakeRedis:
+    """Minimal Redis client holding one counter."""
+    
+    def __init__(self):
+        self.value = None
+        self.down = False
+    
+    def get(self, key):
+        if self.down:
+            raise redis.ConnectionError("down")
+        return self.value
+    
+    def incr(self, key):
+        if self.down:
+            raise redis.ConnectionError("down")
+        self.value = str(int(self.value or 0) + 1).encode()
+
+
+class TestIndexGeneration:
+    """Tests for IndexGeneration."""
+    
+    @pytest.fixture
+    def clock(self, fake_clock):
+        """Controllable monotonic clock for the generation module."""
+        return fake_clock(index_generation_module)
+    
+    @pytest.fixture
+    def generation(self, clock):
+        """Generation backed by an in-memory counter."""
+        generation = IndexGeneration("redis://localhost:6379/0")
+        generation._redis = FakeRedis()
+        return generation
+    
+    def test_bump(self, generation):
+        """bump() makes current() newer."""
+        before = generation.current()
+        generation.bump()
+        assert generation.current() > before
+    
+    def test_unavailable_backs_off_and_retires_tokens(self, generation, clock):
+        """A Redis error reports no generation, then a newer token."""
+        before = generation.current()
+        generation._redis.down = True
+        assert generation.current() is None
+        
+        generation._redis.down = False
+        # Still backing off
+        assert generation.current() is None
+        clock.now += index_generation_module.RETRY_AFTER_SECONDS
+        assert generation.current() > before
+    
+    def test_counter_reset_moves_forward(self, generation):
+        """A flushed Redis counter still yields a newer token."""
+        generation.bump()
+        generation.bump()
+        before = generation.current()
+        generation._redis.value = None
+        assert generation.current() > before
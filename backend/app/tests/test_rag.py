@@ -0,0 +1,86 @@
+"""
+Tests for the RAG service's answer assembly.
+"""
+import asyncio
+import gc
+
+import pytest
+
+from app.services import rag as rag_module
+from app.services.rag import EnhancedRAGService
+
+
+class TestPreviewSources:
+    """Tests for the default source payload."""
+    
+    def test_text_is_cut_and_kept(self):
+        """Sources keep a cut text next to the short preview."""
+        chunk = {"text": "x" * 1000, "score": 0.9, "filename": "a.pdf"}
+        [source] = EnhancedRAGService._preview_sources([chunk])
+        assert source["text"] == "x" * rag_module.SOURCE_TEXT_CHARS
+        assert source["text_preview"] == "x" * rag_module.SOURCE_PREVIEW_CHARS
+        assert source["filename"] == "a.pdf"
+        assert len(chunk["text"]) == 1000
+
+
+class TestContextBudget:
+    """Tests for answers built from budget-trimmed context."""
+    
+    @pytest.mark.asyncio
+    async def test_sources_match_the_prompt(self, monkeypatch):
+        """Chunks cut by the budget are not cited, counted or scored."""
+        service = EnhancedRAGService()
+        
+        async def chat_completion(messages, **kwargs):
+            return {"choices": [{"message": {"content": "Answer [Source 1]."}}]}
+        
+        monkeypatch.setattr(service.llm, "chat_completion", chat_completion)
+        monkeypatch.setattr(rag_module, "CONTEXT_CHAR_BUDGET", 150)
+        chunks = [
+            {"text": "a" * 100, "score": 0.9},
+            {"text": "b" * 100, "score": 0.1}
+        ]
+        result = await service.generate_answer(
+            "question", chunks, include_follow_ups=False, include_clause_analysis=False
+        )
+        assert [source["text"] for source in result["sources"]] == ["a" * 100]
+        assert result["retrieved_chunks"] == 1
+        assert result["confidence"] == "high"
+
+
+class TestAnswerCancellation:
+    """Tests for cancelling an answer while its follow-ups are generated."""
+    
+    @pytest.mark.asyncio
+    async def test_failed_analysis_is_retrieved(self, monkeypatch):
+        """A cancelled answer leaves no analysis error unretrieved."""
+        service = EnhancedRAGService()
+        following_up = asyncio.Event()
+        
+        async def chat_completion(messages, **kwargs):
+            if "follow-up" in messages[-1]["content"]:
+                following_up.set()
+                await asyncio.Event().wait()
+            return {"choices": [{"message": {"content": "Answer [Source 1]."}}]}
+        
+        def fail(text):
+            raise ValueError("analysis failed")
+        
+        monkeypatch.setattr(service.llm, "chat_completion", chat_completion)
+        monkeypatch.setattr(service, "_extract_clauses", fail)
+        
+        loop = asyncio.get_running_loop()
+        errors = []
+        loop.set_exception_handler(lambda loop, context: errors.append(context))
+        
+        task = asyncio.create_task(service.generate_answer("question", [{"text": "clause", "score": 0.9}]))
+        await following_up.wait()
+        # Let the analysis threads finish and fail
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.wait([task])
+        assert task.cancelled()
+        del task
+        gc.collect()
+        
+        assert errors == []
@@ -0,0 +1,163 @@
+"""
+Tests for the in-process TTL cache.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ttl_cache as ttl_cache_module
+from app.services.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def clock(fake_clock):
+    """Controllable monotonic clock for the cache module."""
+    return fake_clock(ttl_cache_module)
+
+
+class TestTTLCache:
+    """Tests for TTLCache."""
+    
+    def test_get_set(self, clock):
+        """Stored values are returned until they expire."""
+        cache = TTLCache(max_items=4, ttl_seconds=60)
+        assert cache.get("a") is None
+        cache.set("a", [1, 2])
+        assert cache.get("a") == [1, 2]
+    
+    def test_expiry(self, clock):
+        """Entries expire ttl_seconds after being stored."""
+        cache = TTLCache(max_items=4, ttl_seconds=60)
+        cache.set("a", 1)
+        
+        clock.now += 59
+        assert cache.get("a") == 1
+        clock.now += 1
+        assert cache.get("a") is None
+    
+    def test_set_refreshes_expiry(self, clock):
+        """Storing a key again restarts its TTL."""
+        cache = TTLCache(max_items=4, ttl_seconds=60)
+        cache.set("a", 1)
+        clock.now += 50
+        cache.set("a", 2)
+        clock.now += 50
+        assert cache.get("a") == 2
+    
+    def test_lru_eviction(self, clock):
+        """The least recently used entry is evicted past max_items."""
+        cache = TTLCache(max_items=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+    
+    def test_clear(self, clock):
+        """clear() drops every entry."""
+        cache = TTLCache(max_items=4, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.clear()
+        assert cache.get("a") is None
+    
+    def test_disabled(self, clock):
+        """max_items 0 disables the cache."""
+        cache = TTLCache(max_items=0, ttl_seconds=60)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+
+class TestRetrievalCache:
+    """Tests for the enhanced RAG retrieval cache built on TTLCache."""
+    
+    @pytest.fixture
+    def service(self, monkeypatch):
+        """Service with Pinecone, embeddings and the generation stubbed."""
+        from app.services import rag_enhanced
+        
+        service = rag_enhanced.EnhancedRAGService()
+        calls = []
+        
+        def query_vectors(**kwargs):
+            calls.append(kwargs)
+            return [{
+                "id": "v1",
+                "score": 0.9,
+                "metadata": {"text": "Payment is due in 30 days.", "file_id": "f1", "chunk_index": 0}
+            }]
+        
+        async def embed(text):
+            return [0.1] * 1536
+        
+        generation = SimpleNamespace(value=(0, 0))
+        monkeypatch.setattr(service.pinecone, "query_vectors", query_vectors)
+        monkeypatch.setattr(rag_enhanced.embedding_batcher, "embed", embed)
+        monkeypatch.setattr(rag_enhanced.index_generation, "current", lambda: generation.value)
+        monkeypatch.setattr(rag_enhanced.cross_encoder_reranker, "enabled", False)
+        return SimpleNamespace(service=service, calls=calls, generation=generation)
+    
+    @pytest.mark.asyncio
+    async def test_repeat_is_cached(self, service):
+        """A repeated retrieval is served without querying Pinecone."""
+        first = await service.service.retrieve_context_enhanced("payment terms")
+        second = await service.service.retrieve_context_enhanced("  Payment terms ")
+        assert second == first
+        assert len(service.calls) == 1
+        # Working state from boosting and reranking stays off the chunks
+        assert all(not key.startswith("_") for chunk in first for key in chunk)
+    
+    @pytest.mark.asyncio
+    async def test_index_change_invalidates(self, service):
+        """A newer index generation misses the cache."""
+        await service.service.retrieve_context_enhanced("payment terms")
+        service.generation.value = (0, 1)
+        await service.service.retrieve_context_enhanced("payment terms")
+        assert len(service.calls) == 2
+    
+    @pytest.mark.asyncio
+    async def test_bypassed_without_generation(self, service):
+        """Nothing is cached while the generation can't be read."""
+        service.generation.value = None
+        await service.service.retrieve_context_enhanced("payment terms")
+        await service.service.retrieve_context_enhanced("payment terms")
+        assert len(service.calls) == 2
+
+
+class TestAnswerCache:
+    """Tests for the grounded answer cache built on TTLCache."""
+    
+    CHUNKS = [{"text": "Payment is due in 30 days.", "score": 0.9, "file_id": "f1", "chunk_index": 0}]
+    
+    @pytest.fixture
+    def service(self, monkeypatch):
+        """Service whose LLM returns a draft and then the given verification."""
+        from app.services import rag_enhanced
+        
+        service = rag_enhanced.EnhancedRAGService()
+        state = SimpleNamespace(calls=0, verification='{"verification_status": "all_grounded"}')
+        
+        async def chat_completion(messages, **kwargs):
+            state.calls += 1
+            content = state.verification if "fact-checker" in messages[0]["content"] else "Due in 30 days [Source 1]."
+            return {"choices": [{"message": {"content": content}}]}
+        
+        monkeypatch.setattr(service.llm, "chat_completion", chat_completion)
+        return SimpleNamespace(service=service, state=state)
+    
+    @pytest.mark.asyncio
+    async def test_verified_answer_is_cached(self, service):
+        """A repeat of a verified answer skips both LLM calls."""
+        await service.service.generate_grounded_answer("when is payment due", self.CHUNKS)
+        await service.service.generate_grounded_answer("when is payment due", self.CHUNKS)
+        assert service.state.calls == 2
+    
+    @pytest.mark.asyncio
+    async def test_unverified_answer_is_not_cached(self, service):
+        """A draft the verifier gave no verdict on is generated again."""
+        service.state.verification = "no verdict"
+        await service.service.generate_grounded_answer("when is payment due", self.CHUNKS)
+        await service.service.generate_grounded_answer("when is payment due", self.CHUNKS)
+        assert service.state.calls == 4
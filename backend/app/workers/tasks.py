@@ -13,6 +13,7 @@ from app.db.models.upload import ExtractionStatus
 from app.db.models.proposal import ValidationStatus, RiskLevel
 from app.db.models.audit import AuditAction
 from app.services.indexing import index_file_to_pinecone
+from app.services.openrouter import openrouter_client
 from app.services.validation import validation_service
 
 logger = logging.getLogger(__name__)
@@ -79,6 +80,9 @@ async def process_file_upload(upload_id: str, user_id: str):
         return {"success": False, "error": str(e)}
     finally:
         db.close()
+        # RQ runs each job on a fresh event loop; close pooled connections
+        # while this one can still shut them down
+        await openrouter_client.aclose()
 
 
 async def validate_contract_background(
@@ -178,6 +182,9 @@ async def validate_contract_background(
         return {"success": False, "error": str(e)}
     finally:
         db.close()
+        # RQ runs each job on a fresh event loop; close pooled connections
+        # while this one can still shut them down
+        await openrouter_client.aclose()
 
 
 def cleanup_old_files(days: int = 90):